@@ -0,0 +1,10 @@
+#!/bin/bash -l
+#run daily after the new data comes in, only new or changed sqlite files get queried
+
+source /home/verif/.bash_profile
+
+conda activate verification
+
+cd /home/verif/verif-post-process/src/
+
+python3 update-catalog.py > log/catalog.log
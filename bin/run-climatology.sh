@@ -0,0 +1,10 @@
+#!/bin/bash -l
+#run monthly after the obs archive is updated, works out the heavy precip thresholds for each station and month
+
+source /home/verif/.bash_profile
+
+conda activate verification
+
+cd /home/verif/verif-post-process/src/
+
+python3 update-climatology.py > log/climatology.log
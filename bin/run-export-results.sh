@@ -0,0 +1,11 @@
+#!/bin/bash -l
+#rewrites all of the stats text files for the website from the results store (the weekly/monthly runs already
+#rewrite the ones they change), run once with --import first to add the existing text files to the store
+
+source /home/verif/.bash_profile
+
+conda activate verification
+
+cd /home/verif/verif-post-process/src/
+
+python3 export-results.py > log/export_results.log
@@ -0,0 +1,13 @@
+#!/bin/bash -l
+#run daily, adds the last couple weeks of init dates to the fcst cubes (only new dates get read)
+
+source /home/verif/.bash_profile
+
+start_date=`date --date="-14 days" +%y%m%d`
+end_date=`date --date="-1 days" +%y%m%d`
+
+conda activate verification
+
+cd /home/verif/verif-post-process/src/
+
+python3 update-fcst-cache.py $start_date $end_date > log/fcst_cache.log
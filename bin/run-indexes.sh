@@ -0,0 +1,10 @@
+#!/bin/bash -l
+#run weekly, adds the covering indexes to any new sqlite files, re-runs ANALYZE and reports table scans
+
+source /home/verif/.bash_profile
+
+conda activate verification
+
+cd /home/verif/verif-post-process/src/
+
+python3 maintain-indexes.py --workers 16 > log/indexes.log
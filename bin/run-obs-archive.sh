@@ -0,0 +1,12 @@
+#!/bin/bash -l
+#run daily, adds any new obs to the obs archive (only days from the last obs at each station get read)
+
+source /home/verif/.bash_profile
+
+end_date=`date --date="-1 days" +%y%m%d`
+
+conda activate verification
+
+cd /home/verif/verif-post-process/src/
+
+python3 update-obs-archive.py $end_date > log/obs_archive.log
@@ -0,0 +1,12 @@
+#!/bin/bash -l
+#run daily after the obs come in, checks the new obs at every station and saves the flags (see src/utl/qc.py)
+
+source /home/verif/.bash_profile
+
+end_date=`date --date="-1 days" +%y%m%d`
+
+conda activate verification
+
+cd /home/verif/verif-post-process/src/
+
+python3 update-qc-flags.py $end_date > log/qc_flags.log
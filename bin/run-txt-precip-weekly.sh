@@ -10,17 +10,7 @@ conda activate verification
 cd /home/verif/verif-post-process/src/
 
 start_date='211001'
-end_date='211007'
+end_date='230803'
 
-while [ $((start_date)) -lt 230731 ] 
-do
-
-        python3 leaderboards-txt-sqlite2.py $start_date $end_date PCPT6 small > log/lb_txt_PCPT6_sm.log
-	python3 leaderboards-txt-sqlite2.py $start_date $end_date PCPT24 small > log/lb_txt_PCPT24_sm.log
-
-        python3 leaderboards-txt-sqlite2.py $start_date $end_date PCPT6 large > log/lb_txt_PCPT6_lrg.log
-        python3 leaderboards-txt-sqlite2.py $start_date $end_date PCPT24 large > log/lb_txt_PCPT24_lrg.log
-
-	start_date=$(date -d $start_date"+7 days" +%y%m%d)
-	end_date=$(date -d $end_date"+7 days" +%y%m%d)
-done
+# every week from the start date (and every calendar month) in one process, see run-txt-weekly-batch.sh
+python3 leaderboards-backfill.py $start_date $end_date PCPT6,PCPT24 small,large --workers 4 > log/lb_txt_precip_backfill.log
@@ -21,6 +21,10 @@ from scipy import stats
 import sqlite3
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from utl.obs_archive import update_obs_archive, read_obs_archive
+from utl.qc import read_qc_flags, BOUNDS, SPIKE, FLATLINE, precip_threshold, wind_threshold, temp_min, temp_max
+
 import warnings
 warnings.filterwarnings("ignore",category=RuntimeWarning)
 
@@ -51,11 +55,6 @@ textfile_folder = '/verification/Statistics/'
 domain = 'small' # choose small or large domain
 variables = ['SFCTC', 'SFCWSPD', 'PCPTOT']
 
-precip_threshold = 250 #recorded at Buffalo Gap 1961 https://www.canada.ca/en/environment-climate-change/services/water-overview/quantity/floods/events-prairie-provinces.html
-wind_threshold = 400 #recorded Edmonton, AB 1987 http://wayback.archive-it.org/7084/20170925152846/https://www.ec.gc.ca/meteo-weather/default.asp?lang=En&n=6A4A3AC5-1#tab5
-temp_min = -63 #recorded in Snag, YT 1947 http://wayback.archive-it.org/7084/20170925152846/https://www.ec.gc.ca/meteo-weather/default.asp?lang=En&n=6A4A3AC5-1#tab5
-temp_max = 49.6 #recorded in Lytton, BC 2021 https://www.canada.ca/en/environment-climate-change/services/top-ten-weather-stories/2021.html#toc2
-
 station_df = pd.read_csv(station_file)
 
 stations_with_SFCTC = np.array(station_df.query("SFCTC==1")["Station ID"],dtype=str)
@@ -86,21 +85,21 @@ def get_station_data(variable):
     elif variable == "PCPTOT":
         station_list = copy.deepcopy(stations_with_PCPTOT)  
     
-    for station in station_list:
-        
-        if int(station) < 1000:
-            station = '0' + str(station)
-
-        sql_path = obs_filepath + variable + '/' + station + '.sqlite'
-        sql_con = sqlite3.connect(sql_path)
+    # the whole history for every station from the obs archive (adds anything new to it first)
+    stations = [station if int(station) >= 1000 else '0' + str(station) for station in station_list]
+    yesterday = (today - timedelta(days=1)).strftime('%y%m%d')
+    update_obs_archive(variable, stations, yesterday)
+    archive_obs, _ = read_obs_archive(variable, stations, start.strftime('%y%m%d'), tot_hours)
+    flags = read_qc_flags(variable, stations, start.strftime('%y%m%d'), tot_hours)
+    
+    for i in range(len(stations)):
         
-        sql_query = "SELECT * from 'All'"
-        obs = pd.read_sql_query(sql_query, sql_con)
-        len_data = len(obs)
+        vals = archive_obs[i][~np.isnan(archive_obs[i])]
+        len_data = len(vals)
     
-        obs_all.append(obs['Val'])
+        obs_all.append(vals)
         len_all.append(len_data)
-    return(obs_all, station_list, len_all)
+    return(obs_all, station_list, len_all, flags)
 
 def plot_station_data(obs_all, variable, station_list):
 
@@ -126,34 +125,22 @@ def data_quantity(station_list, len_all):
         if percent_of_data < 90:
             print(station_list[x] + " contains " + str(percent_of_data) + "% data")
 
-def contains_outliers(station_list, variable, obs_all):
+# prints the stations with obs that fail the quality control checks in utl/qc.py
+def contains_outliers(station_list, variable, flags):
     
-    for x in range(len(obs_all)):
-        for i in range(len(obs_all[x])):
-            if variable == 'SFCTC':
-                
-                if obs_all[x][i] > temp_max:
-                    print(station_list[x] + " recorded a temperature of " + str(obs_all[x][i]) + " which exceeds the threshold")
-
-                elif obs_all[x][i] < temp_min:
-                    print(station_list[x] + " recorded a temperature of " + str(obs_all[x][i]) + " which exceeds the threshold")
-            
-            elif variable == 'SFCWSPD':
-                if obs_all[x][i] > wind_threshold:
-                    print(station_list[x] + " recorded a wind speed of " + str(obs_all[x][i]) + " which exceeds the threshold")
-
-            elif variable == 'PCPTOT':
-                if obs_all[x][i] > precip_threshold:
-                    print(station_list[x] + " recorded a precipitation total of " + str(obs_all[x][i]) + " which exceeds the threshold")
+    for bit, description in [(BOUNDS, "obs outside the physical bounds"), (SPIKE, "spikes"), (FLATLINE, "flatlined obs")]:
+        counts = np.sum((flags & bit) != 0, axis=1)
+        for x in np.nonzero(counts)[0]:
+            print(station_list[x] + " has " + str(counts[x]) + " " + variable + " " + description)
 
 def main(args):
 
     for variable in variables:
         print("Now on ...... " + variable)
-        obs_all, station_list, len_all = get_station_data(variable)
+        obs_all, station_list, len_all, flags = get_station_data(variable)
         plot_station_data(obs_all, variable, station_list)
         data_quantity(station_list, len_all)
-        contains_outliers(station_list, variable, obs_all)
+        contains_outliers(station_list, variable, flags)
 
 if __name__ == "__main__":
     main(sys.argv)
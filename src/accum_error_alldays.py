@@ -17,6 +17,7 @@ import datetime
 import sys
 import time
 import math
+from utl.catalog import has_station_files
 import warnings
 
 #import matplotlib.cbook
@@ -316,10 +317,13 @@ def check_data_exists(filepath, station, variable):
     if variable == "APCP":
         variable = "PCPTOT"
         
-    flag = False
-    for all_files in os.listdir(filepath):    
-        if station + "." + variable in all_files:
-            flag=True
+    # catalog lookup, only lists the folder if nothing under it has been catalogued
+    flag = has_station_files(filepath, station if len(station) >= 4 else "0" + station, variable)
+    if flag is None:
+        flag = False
+        for all_files in os.listdir(filepath):    
+            if station + "." + variable in all_files:
+                flag=True
     return(flag)
       
         
@@ -14,6 +14,7 @@ import os
 import numpy as np
 import datetime #import datetime, timedelta
 import sys
+from utl.results_store import read_results
 
 
 import warnings
@@ -145,23 +146,24 @@ def get_rankings(variable,time_domain):
             
             print("Now on.. " + model + gridname + "   " + variable)
             
-            if os.path.isfile(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "CAT_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt"):
-                #open the CAT file
-                with open(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "CAT_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt") as f:
-                    CAT_lines = f.readlines()
+            # every result for the model/time_domain (none if the time_domain doesn't exist for this model)
+            results = read_results('categorical', model, grid, input_domain, variable, savetype, time_domain)
+            
+            if len(results) > 0:
         
                 data_check = False
-                #find the line for the given dates
-                for CAT_line in CAT_lines:
-                    if date_entry1 in CAT_line and date_entry2 in CAT_line:
-                        POD = CAT_line.split("   ")[5]
-                        POFD = CAT_line.split("   ")[6]
-                        PSS = CAT_line.split("   ")[7]
-                        HSS = CAT_line.split("   ")[8]
-                        CSI = CAT_line.split("   ")[9]
-                        GSS = CAT_line.split("   ")[10]
-                        dataratio = CAT_line.split("   ")[11]
-                        numstations = CAT_line.split("   ")[12].strip()
+                #find the result for the given dates
+                for result in results:
+                    if result['start_date'] == date_entry1 and result['end_date'] == date_entry2:
+                        # rounded the same as the old text files
+                        POD = round(result['POD'], 3)
+                        POFD = round(result['POFD'], 3)
+                        PSS = round(result['PSS'], 3)
+                        HSS = round(result['HSS'], 3)
+                        CSI = round(result['CSI'], 3)
+                        GSS = round(result['GSS'], 3)
+                        dataratio = result['len_fcst']
+                        numstations = result['numstations']
                         data_check = True
 
 
@@ -0,0 +1,53 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: --import (optional)
+
+Rewrites every MAE_/RMSE_/spcorr_/CAT_ text file for the website from the results store (see
+utl/results_store.py). The leaderboard scripts already rewrite the files for the results they save, so this is
+only needed to regenerate all of them (after the store was changed by hand etc).
+
+--import adds every existing text file to the store first. This only needs to be done once, before the first
+leaderboard run that uses the store (the runs rewrite the text files from the store alone, so any older lines
+that weren't imported would be dropped).
+"""
+import sys
+from utl.results_store import import_textfiles, export_textfiles, tables
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#folder where the stats save
+textfile_folder = '/verification/Statistics/'
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+if len(sys.argv) == 1:
+    import_files = False
+elif len(sys.argv) == 2 and sys.argv[1] == "--import":
+    import_files = True
+else:
+    raise Exception("Invalid input entries. Only option is --import")
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    for table in tables:
+        if import_files:
+            num_keys, num_rows = import_textfiles(textfile_folder, table)
+            print("Imported " + str(num_rows) + " " + table + " results from " + str(num_keys) + " sets of text files")
+
+        num_keys = export_textfiles(textfile_folder, table)
+        print("Wrote " + str(num_keys) + " sets of " + table + " text files")
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -12,6 +12,7 @@ This script is for the weekly leadership board
 import matplotlib.pyplot as plt
 import numpy as np
 import sys
+from utl.results_store import read_results
 import os
 import pandas as pd
 import warnings
@@ -90,10 +91,11 @@ for i in range(len(model_names)):
 #colors to plot, must be same length (or longer) than models list
 model_colors = ['C0','C1','C2','C3','C4','C5','C6','C7','C8','C9','#ffc219','#CDB7F6','#65fe08','#fc3232','#754200','#00FFFF','#fc23ba','#a1a1a1','#000000','#000000','#000000','#000000']
 
-date_test_file = textfile_folder + 'ENS/small/SFCTC/MAE_' + str(savetype) + '_SFCTC_60hr_' + input_domain + '.txt'
+# the dates the averages go from and to (ENS SFCTC 60hr has every week/month)
+date_test_results = read_results('continuous', 'ENS', '', input_domain, 'SFCTC', savetype, '60hr')
 
-startdate = np.loadtxt(date_test_file,usecols=0,dtype='str')
-enddate = np.loadtxt(date_test_file,usecols=1,dtype='str')
+startdate = date_test_results[0]['start_date']
+enddate = date_test_results[-1]['end_date']
 
 input_startdate = datetime.datetime.strptime(str(startdate), "%y%m%d").date()
 print_startdate = datetime.datetime.strftime(input_startdate,"%m/%d/%y")
@@ -124,28 +126,21 @@ def get_rankings(variable,time_domain):
             else:
                 modelpath = model + '/' + grid + '/'+ input_domain +  '/' + variable + '/'
                 
-            MAE_file = textfile_folder +  modelpath + "MAE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt"
-            print(MAE_file)           
+            # every result for the model/time_domain, in order (none if the time_domain doesn't exist for this model)
+            results = read_results('continuous', model, grid, input_domain, variable, savetype, time_domain)
+            
             #skips time_domains that dont exist for this model
-            if os.path.isfile(MAE_file):
+            if len(results) > 0:
 
-                MAE_list = np.loadtxt(MAE_file,usecols=2,dtype=float)
-    
-                #counts lines in file
-                with open(MAE_file, 'r') as fp:
-                    for count, line in enumerate(fp):
-                        pass
-
-                if count+1 > 1:
-
-                    RMSE_file = textfile_folder +  modelpath  + "RMSE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt"
-                    RMSE_list = np.loadtxt(RMSE_file,usecols=2,dtype=float)
-                    
-                    corr_file = textfile_folder +  modelpath + "spcorr_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt"
-                    corr_list = np.loadtxt(corr_file,usecols=2,dtype=float)
+                if len(results) > 1:
+
+                    # rounded the same as the old text files
+                    MAE_list = np.array([round(result['MAE'], 3) for result in results])
+                    RMSE_list = np.array([round(result['RMSE'], 3) for result in results])
+                    corr_list = np.array([round(result['spcorr'], 3) for result in results])
                       
                     # the ratios are the same for each statistic, so only checked once
-                    dataratio = np.loadtxt(MAE_file,usecols=3,dtype=str)
+                    dataratio = [result['len_fcst'] for result in results]
     
                     expected = [i.split('/')[1] for i in dataratio]
                     actual = [i.split('/')[0] for i in dataratio]
@@ -0,0 +1,279 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: start date (YYMMDD), end date (YYMMDD), variables (optional, comma separated), domains (optional, comma separated) [--workers N] [--immutable]
+    variable options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD (SFCTC, SFCTC_KF, SFCWSPD, SFCWSPD_KF, PCPTOT by default)
+    domain options: large, small (both by default)
+    --workers N runs N model/grid windows at once in separate processes (default 1)
+    --immutable opens the sqlite files as immutable (see utl/sql_pool.py), only for runs that won't overlap the
+      collection job (backfills of old dates run outside of the collection hours)
+
+Runs the same stats as leaderboards-txt-matrix.py for every weekly window (7 days at a time from the start date)
+and every calendar month between the start and end date, in place of running the week by week loop in
+run-txt-weekly-batch.sh (which started a new process for every week and read the obs for each week again, even
+though they overlap the next week's by 7 days):
+    - the obs for each variable are read once for the whole span, and each window uses its piece of the cube
+    - the fcst cube for every model/grid is filled for the whole span first (see utl/fcst_cache.py), so each
+      station file is read once and the windows read from the cube
+    - windows that already have their results saved are skipped (see utl/planner.py), and the results are saved
+      as soon as each window is done, so running it again after it was stopped carries on where it left off
+"""
+import os
+import pandas as pd
+import numpy as np
+import datetime
+import sys
+from utl.funcs import *
+from utl.fcst_cache import update_fcst_cache
+from utl.planner import plan_rankings
+from utl import sql_pool
+from multiprocessing import get_context
+import warnings
+warnings.filterwarnings("ignore",category=RuntimeWarning)
+
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#description file for stations
+station_file = '/home/verif/verif-post-process/input/station_list_master.txt'
+
+#description file for models
+models_file = '/home/verif/verif-post-process/input/model_list.txt'
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+# optional --workers N, the number of model/grid windows to run at once (in separate processes)
+workers = 1
+if "--workers" in sys.argv:
+    i = sys.argv.index("--workers")
+    workers = int(sys.argv[i+1])
+    sys.argv = sys.argv[:i] + sys.argv[i+2:]
+
+# optional --immutable, skips the sqlite locking and change checks (set before any files are opened)
+if "--immutable" in sys.argv:
+    sql_pool.immutable = True
+    sys.argv.remove("--immutable")
+
+if len(sys.argv) >= 3 and len(sys.argv) <= 5:
+    date_entry1 = sys.argv[1]    #input date YYMMDD
+    start_date = str(date_entry1)
+    input_startdate = datetime.datetime.strptime(start_date, "%y%m%d").date()
+
+    date_entry2 = sys.argv[2]    #input date YYMMDD
+    end_date = str(date_entry2)
+    input_enddate = datetime.datetime.strptime(end_date, "%y%m%d").date()
+
+    if input_enddate < input_startdate + datetime.timedelta(days=6):
+        raise Exception("Invalid date input entries. Needs at least 7 days between the start and end date")
+
+    if len(sys.argv) >= 4:
+        input_variables = sys.argv[3].split(",")
+    else:
+        input_variables = ['SFCTC', 'SFCTC_KF', 'SFCWSPD', 'SFCWSPD_KF', 'PCPTOT']
+    for input_variable in input_variables:
+        if input_variable not in ['SFCTC_KF', 'SFCTC', 'PCPTOT', 'PCPT6', 'PCPT24', 'SFCWSPD_KF', 'SFCWSPD']:
+            raise Exception("Invalid variable input entries. Current options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD. Case sensitive.")
+
+    if len(sys.argv) == 5:
+        input_domains = sys.argv[4].split(",")
+    else:
+        input_domains = ['small', 'large']
+    for input_domain in input_domains:
+        if input_domain not in ['large','small']:
+            raise Exception("Invalid domain input entries. Current options: large, small. Case sensitive.")
+
+else:
+    raise Exception("Invalid input entries. Needs 2 YYMMDD entries for start and end dates, and optionally the variables and domains")
+
+#subtract 6 to match boreas time, might need to change in future
+today = datetime.datetime.now() - datetime.timedelta(hours=6)
+needed_date = (today - datetime.timedelta(days=8)).date()
+
+# list of model names as strings (names as they are saved in www_oper and my output folders)
+models = np.loadtxt(models_file,usecols=0,dtype='str')
+grids = np.loadtxt(models_file,usecols=1,dtype='str') #list of grid sizings (g1, g2, g3 etc) for each model
+gridres = np.loadtxt(models_file,usecols=2,dtype='str') #list of grid resolution in km for each model
+hours = np.loadtxt(models_file,usecols=3,dtype='str') #list of max hours for each model
+
+station_df = pd.read_csv(station_file)
+
+stations_with_SFCTC = np.array(station_df.query("SFCTC==1")["Station ID"],dtype=str)
+stations_with_SFCWSPD = np.array(station_df.query("SFCWSPD==1")["Station ID"],dtype=str)
+stations_with_PCPTOT = np.array(station_df.query("PCPTOT==1")["Station ID"],dtype=str)
+stations_with_PCPT6 = np.array(station_df.query("PCPT6==1")["Station ID"],dtype=str)
+stations_with_PCPT24 = np.array(station_df.query("PCPT24==1")["Station ID"],dtype=str)
+
+domain_stations = {}
+for input_domain in input_domains:
+    if input_domain == "large":
+        domain_stations[input_domain] = np.array(station_df.query("`All stations`==1")["Station ID"],dtype=str)
+    else:
+        domain_stations[input_domain] = np.array(station_df.query("`Small domain`==1")["Station ID"],dtype=str)
+
+# the obs are read once for every station in any of the domains
+obs_all_stations = np.unique(np.concatenate(list(domain_stations.values())))
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# (savetype, start date, end date) for every week from the start date and every calendar month in the span
+# (only windows that start at least 8 days ago, same as leaderboards-txt-sqlite2.py)
+def get_windows():
+
+    windows = []
+
+    week_start = input_startdate
+    while week_start + datetime.timedelta(days=6) <= input_enddate:
+        windows.append(("weekly", week_start, week_start + datetime.timedelta(days=6)))
+        week_start = week_start + datetime.timedelta(days=7)
+
+    month_start = input_startdate if input_startdate.day == 1 else (input_startdate.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    while True:
+        month_end = (month_start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+        if month_end > input_enddate:
+            break
+        windows.append(("monthly", month_start, month_end))
+        month_start = month_end + datetime.timedelta(days=1)
+
+    too_recent = [window for window in windows if window[1] > needed_date]
+    if len(too_recent) > 0:
+        print("Skipping " + str(len(too_recent)) + " windows that start less than 8 days ago")
+
+    return([window for window in windows if window[1] <= needed_date])
+
+# variables grouped by the obs they use (KF variables use the raw obs), in the order they were entered
+def group_variables(input_variables):
+
+    obs_variables = {}
+    for input_variable in input_variables:
+        obs_variable = input_variable[:-3] if "_KF" in input_variable else input_variable
+        obs_variables.setdefault(obs_variable, []).append(input_variable)
+
+    return(obs_variables)
+
+# obs cube for every init date in the span
+def get_obs(obs_variable):
+
+    delta = (input_enddate-input_startdate).days
+    date_list_obs = listofdates(start_date, end_date, obs=True)
+
+    if obs_variable == "PCPT6":
+        return(PCPT_obs_df_6(date_list_obs, delta, obs_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6,\
+                  stations_with_PCPT24, obs_all_stations, start_date, end_date))
+    elif obs_variable == "PCPT24":
+        return(PCPT_obs_df_24(date_list_obs, delta, obs_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, \
+                   stations_with_PCPT24, obs_all_stations, start_date, end_date))
+    else:
+        return(get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, obs_all_stations, obs_variable, start_date, end_date, date_list_obs))
+
+# get_rankings arguments (without the obs) for every model/grid, domain and window for the variable
+def get_rankings_args(input_variable, windows):
+
+    rankings_args = []
+    for savetype, window_start, window_end in windows:
+        window_entry1, window_entry2 = window_start.strftime("%y%m%d"), window_end.strftime("%y%m%d")
+        delta = (window_end-window_start).days
+        date_list = listofdates(window_entry1, window_entry2, obs=False)
+
+        for i in range(len(models)):
+           model = models[i] #loops through each model
+
+           for grid_i in range(len(grids[i].split(","))): #loops through each grid size for each model
+
+               grid = grids[i].split(",")[grid_i]
+               maxhour = hours[i].split(",")[grid_i] # the max hours that are in the current model/grid
+
+               filehours = get_filehours(1, int(maxhour))
+               filepath, gridname = get_filepath(model, grid, input_variable)
+
+               if check_dates(window_entry1, delta, filepath, input_variable, station='3510') == False:
+                   continue
+
+               # if it can't find the folder for the model/grid pair
+               if not os.path.isdir(filepath):
+                   raise Exception("Missing grid/model pair (or wrong base filepath for" + model + gridname)
+
+               for input_domain in input_domains:
+                   rankings_args.append(dict(filepath=filepath, delta=delta, input_domain=input_domain, date_entry1=window_entry1, date_entry2=window_entry2, savetype=savetype, \
+                        all_stations=domain_stations[input_domain], station_df=station_df, variable=input_variable, date_list=date_list, model=model, grid=grid, maxhour=maxhour, \
+                        gridname=gridname, filehours=filehours, stations_with_SFCTC=stations_with_SFCTC, stations_with_SFCWSPD=stations_with_SFCWSPD, stations_with_PCPTOT=stations_with_PCPTOT, \
+                        stations_with_PCPT6=stations_with_PCPT6, stations_with_PCPT24=stations_with_PCPT24))
+
+    return(rankings_args)
+
+# reads the init dates of the model/grid's windows into its fcst cube (same stations as get_rankings)
+def fill_fcst_cache(args):
+
+    filepath, model_df_name, date1, date2 = args
+    stations_in_domain = np.array(station_df.query(model_df_name+"==1")["Station ID"],dtype='str')
+    update_fcst_cache(filepath, [station if len(station) >= 4 else "0" + station for station in stations_in_domain], listofdates(date1, date2, obs=False))
+
+    return(filepath)
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    windows = get_windows()
+    print("Backfilling " + str(len(windows)) + " windows from " + start_date + " to " + end_date)
+
+    for obs_variable, variables in group_variables(input_variables).items():
+
+        rankings_args = []
+        for input_variable in variables:
+            rankings_args = rankings_args + get_rankings_args(input_variable, windows)
+
+        # the windows that are already saved (from an earlier run that was stopped) are skipped
+        rankings_args = [args for args, reason in plan_rankings('continuous', rankings_args) if reason is not None]
+        print(str(len(rankings_args)) + " model/grid windows left to run for " + ",".join(variables))
+        if len(rankings_args) == 0:
+            continue
+
+        # every station file is read once for the span of the windows left to run (not past the last one, the
+        # windows that start too recently were dropped in get_windows)
+        if use_fcst_cache:
+            spans = {}
+            for args in rankings_args:
+                key = (args['filepath'], args['model'] + args['gridname'])
+                span = spans.get(key, (args['date_entry1'], args['date_entry2']))
+                spans[key] = (min(span[0], args['date_entry1']), max(span[1], args['date_entry2']))
+            cache_args = sorted(key + span for key, span in spans.items())
+            with get_context("fork").Pool(workers, initializer=forget_connections) as pool:
+                for filepath in pool.imap_unordered(fill_fcst_cache, cache_args):
+                    print("   Filled fcst cube for " + filepath)
+
+        obs_cube, obs_stations = get_obs(obs_variable)
+
+        # where each window's first init date is in the obs cube
+        window_args = [((datetime.datetime.strptime(args['date_entry1'], "%y%m%d").date() - input_startdate).days, args) for args in rankings_args]
+
+        if workers > 1:
+            # same as leaderboards-txt-sqlite2.py, the workers send back their stats to be written here
+            with get_context("fork").Pool(workers, initializer=set_shared_obs, initargs=(obs_cube, obs_stations)) as pool:
+                for i, writes in enumerate(pool.imap(get_window_deferred, window_args)):
+                    write_deferred(writes)
+                    print("   Done " + str(i+1) + "/" + str(len(window_args)))
+        else:
+            for i, (day, args) in enumerate(window_args):
+                get_rankings(**args, obs_cube=obs_cube[:, day:day+args['delta']+1], obs_stations=obs_stations)
+                print("   Done " + str(i+1) + "/" + str(len(window_args)))
+
+    # the website still reads the text files, so they're written from the results store
+    for savetype in ["weekly", "monthly"]:
+        write_textfiles(input_domains, input_variables, savetype)
+
+    # the stations that took the longest to read
+    print_query_times()
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,118 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: start date (YYMMDD), end date (YYMMDD), variable, domain size, save type (optional)
+    variable options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD
+    domain options: large, small
+    save type: name used in the stats files (weekly or monthly by default, depending on the date range), can
+        be anything for other date ranges (seasonal etc)
+
+Puts the MAE, RMSE and spearman correlation together for any date range from the stats store (utl/stats_store.py)
+and saves them the same way as leaderboards-txt-sqlite2.py. Nothing is read from the fcst or obs files, so the
+init dates in the range need to have been run by leaderboards-txt-sqlite2.py (or leaderboards-txt-matrix.py) first.
+"""
+import os
+import sys
+import datetime
+import numpy as np
+from utl.funcs import make_textfile, model_not_available, get_filepath, write_textfiles
+from utl.stats_store import read_window_stats
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#description file for models
+models_file = '/home/verif/verif-post-process/input/model_list.txt'
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+if len(sys.argv) == 5 or len(sys.argv) == 6:
+    date_entry1 = sys.argv[1]    #input date YYMMDD
+    date_entry2 = sys.argv[2]    #input date YYMMDD
+
+    delta = (datetime.datetime.strptime(date_entry2, "%y%m%d").date() - datetime.datetime.strptime(date_entry1, "%y%m%d").date()).days
+    if delta < 0:
+        raise Exception("Invalid date input entries. End date is before the start date")
+
+    input_variable = sys.argv[3]
+    if input_variable not in ['SFCTC_KF', 'SFCTC', 'PCPTOT', 'PCPT6', 'PCPT24', 'SFCWSPD_KF', 'SFCWSPD']:
+        raise Exception("Invalid variable input entries. Current options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD. Case sensitive.")
+
+    input_domain = sys.argv[4]
+    if input_domain not in ['large','small']:
+        raise Exception("Invalid domain input entries. Current options: large, small. Case sensitive.")
+
+    if len(sys.argv) == 6:
+        savetype = sys.argv[5]
+    elif delta == 6:
+        savetype = "weekly"
+    elif delta == 27 or delta == 28 or delta == 29 or delta == 30:
+        savetype = "monthly"
+    else:
+        raise Exception("Need a save type for a range of " + str(delta+1) + " days (only 7 and 28-31 days have one by default)")
+
+else:
+    raise Exception("Invalid input entries. Needs 2 YYMMDD entries for start and end dates, a variable name, domain size and optionally the save type")
+
+# list of model names as strings (names as they are saved in www_oper and my output folders)
+models = np.loadtxt(models_file,usecols=0,dtype='str')
+grids = np.loadtxt(models_file,usecols=1,dtype='str') #list of grid sizings (g1, g2, g3 etc) for each model
+hours = np.loadtxt(models_file,usecols=3,dtype='str') #list of max hours for each model
+
+# time windows and the lead hour they go out to
+time_domains = [('180hr',180), ('120hr',120), ('84hr',84), ('60hr',60), ('day7',168), ('day6',144), ('day5',120), \
+                ('day4',96), ('day3',72), ('day2',48), ('day1',24)]
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    for i in range(len(models)):
+       model = models[i] #loops through each model
+
+       for grid_i in range(len(grids[i].split(","))): #loops through each grid size for each model
+
+           grid = grids[i].split(",")[grid_i]
+           maxhour = hours[i].split(",")[grid_i] # the max hours that are in the current model/grid
+           filepath, gridname = get_filepath(model, grid, input_variable)
+
+           for time_domain, hour in time_domains:
+               if int(maxhour) < hour or (input_variable == "PCPT24" and "hr" in time_domain):
+                   continue
+
+               window_stats = read_window_stats(model, grid, input_variable, input_domain, time_domain, date_entry1, date_entry2)
+
+               if window_stats is None:
+                   print("   Skipping " + model + gridname + " " + time_domain + " (not in the stats store)")
+                   continue
+
+               if window_stats['num_days'] < delta+1:
+                   print("   " + model + gridname + " " + time_domain + " only has " + str(window_stats['num_days']) + "/" + str(delta+1) + " days in the stats store")
+
+               if window_stats['count'] == 0:
+                   # length in hours (model_not_available does the PCPT6/PCPT24 division itself)
+                   length = hour if "hr" in time_domain else 24
+                   model_not_available(model, grid, delta, input_domain, date_entry1, date_entry2, savetype, maxhour, hour, \
+                                       length, window_stats['total_stations'], time_domain, input_variable, filepath)
+                   continue
+
+               len_fcst = str(window_stats['count']) + "/" + str(window_stats['length'])
+               numstations = str(window_stats['num_stations']) + "/" + str(window_stats['total_stations'])
+
+               make_textfile(model, grid, input_domain, savetype, date_entry1, date_entry2, time_domain, input_variable, filepath, \
+                             window_stats['MAE'], window_stats['RMSE'], window_stats['corr'], len_fcst, numstations, \
+                             window_stats['bias'], window_stats['pearson'], window_stats['sd_ratio'])
+
+    # the website still reads the text files, so they're written from the results store
+    write_textfiles([input_domain], [input_variable], savetype)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -14,6 +14,7 @@ import os
 import numpy as np
 import datetime #import datetime, timedelta
 import sys
+from utl.results_store import read_results
 
 
 import warnings
@@ -144,18 +145,21 @@ def get_rankings(variable,time_domain):
             
             print("Now on.. " + model + gridname + "   " + variable)
             
-            if os.path.isfile(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "MAE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt"):
-                #open the MAE file
-                with open(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "MAE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt") as f:
-                    MAE_lines = f.readlines()
+            # every result for the model/time_domain (none if the time_domain doesn't exist for this model)
+            results = read_results('continuous', model, grid, input_domain, variable, savetype, time_domain)
+            
+            if len(results) > 0:
         
                 data_check = False
-                #find the line for the given dates
-                for MAE_line in MAE_lines:
-                    if date_entry1 in MAE_line and date_entry2 in MAE_line:
-                        MAE = MAE_line.split("   ")[1]
-                        dataratio = MAE_line.split("   ")[2]
-                        numstations = MAE_line.split("   ")[3].strip()
+                #find the result for the given dates
+                for result in results:
+                    if result['start_date'] == date_entry1 and result['end_date'] == date_entry2:
+                        # rounded the same as the old text files
+                        MAE = round(result['MAE'], 3)
+                        RMSE = round(result['RMSE'], 3)
+                        spcorr = round(result['spcorr'], 3)
+                        dataratio = result['len_fcst']
+                        numstations = result['numstations']
                         data_check = True
 
 
@@ -164,25 +168,6 @@ def get_rankings(variable,time_domain):
                     skipped_modelnames.append(legend_labels[leg_count] + ":  (none)")
                     leg_count = leg_count+1
                     continue
-                    
-                    
-                #open the RMSE file
-                with open(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "RMSE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt") as f:
-                    RMSE_lines = f.readlines()
-        
-                #find the line for the given dates
-                for RMSE_line in RMSE_lines:
-                    if date_entry1 in RMSE_line and date_entry2 in RMSE_line:
-                        RMSE = RMSE_line.split("   ")[1]
-                  
-                #open the MAE file
-                with open(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "spcorr_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt") as f:
-                    spcorr_lines = f.readlines()
-        
-                #find the line for the given dates
-                for spcorr_line in spcorr_lines:
-                    if date_entry1 in spcorr_line and date_entry2 in spcorr_line:
-                        spcorr = spcorr_line.split("   ")[1]
         
                 #this removes models if more than half of data points are missing
                 if int(dataratio.split("/")[0]) < int(dataratio.split("/")[1])/2: 
@@ -0,0 +1,250 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: start date (YYMMDD), end date (YYMMDD), variables (optional, comma separated), domains (optional, comma separated) [--workers N] [--batch] [--dry-run]
+    Start and end date must be 7 or 28-31 day stretch
+    variable options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD (SFCTC, SFCTC_KF, SFCWSPD, SFCWSPD_KF, PCPTOT by default)
+    domain options: large, small (both by default)
+    --workers N runs N model/grid pairs at once in separate processes (default 1)
+    --batch reads every model/grid first and then works out the stats for all of them (every time window) in
+        one go (see save_rankings_batch in utl/funcs.py), instead of one model/grid at a time
+    --dry-run prints which model/grid pairs would be run (and how much they would read) without running them
+
+Runs the same stats as leaderboards-txt-sqlite2.py for the whole variable x domain matrix in one process, instead
+of starting the script once for every variable and domain. The obs for each variable are only read once:
+    - the KF variables use the same obs as the raw ones (SFCTC and SFCTC_KF share one obs cube)
+    - the obs are read for every station in any of the domains (the small domain is a subset of the large one)
+      and get_rankings picks out the stations in its domain, so both domains use the same obs cube
+Model/grid pairs that already have their results saved for every time window are skipped before anything is
+read (see utl/planner.py), and the obs for a variable aren't read at all if there is nothing left to run for it.
+"""
+import os
+import pandas as pd
+import numpy as np
+import datetime
+import sys
+from utl.funcs import *
+from utl.planner import plan_rankings, print_plan
+from multiprocessing import get_context
+import warnings
+warnings.filterwarnings("ignore",category=RuntimeWarning)
+
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#description file for stations
+station_file = '/home/verif/verif-post-process/input/station_list_master.txt'
+
+#description file for models
+models_file = '/home/verif/verif-post-process/input/model_list.txt'
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+# optional --workers N, the number of model/grid pairs to run at once (in separate processes)
+workers = 1
+if "--workers" in sys.argv:
+    i = sys.argv.index("--workers")
+    workers = int(sys.argv[i+1])
+    sys.argv = sys.argv[:i] + sys.argv[i+2:]
+
+# optional --batch, the stats for every model/grid at once
+batch = "--batch" in sys.argv
+if batch:
+    sys.argv.remove("--batch")
+
+# optional --dry-run, only prints the plan
+dry_run = "--dry-run" in sys.argv
+if dry_run:
+    sys.argv.remove("--dry-run")
+
+# takes an input date for the first and last day you want calculations for, must be a range of 7 or 30 days apart
+if len(sys.argv) >= 3 and len(sys.argv) <= 5:
+    date_entry1 = sys.argv[1]    #input date YYMMDD
+    start_date = str(date_entry1)
+    input_startdate = datetime.datetime.strptime(start_date, "%y%m%d").date()
+
+    date_entry2 = sys.argv[2]    #input date YYMMDD
+    end_date = str(date_entry2)
+    input_enddate = datetime.datetime.strptime(end_date, "%y%m%d").date()
+
+    #subtract 6 to match boreas time, might need to change in future
+    today = datetime.datetime.now() - datetime.timedelta(hours=6)
+    needed_date = today - datetime.timedelta(days=8) #might need to change to 7
+    if input_startdate > needed_date.date():
+        raise Exception("Date too recent. Need start date to be at least 8 days ago.")
+
+    delta = (input_enddate-input_startdate).days
+
+    if delta == 6: # 6 is weekly bc it includes the start and end date (making 7)
+        print("Performing WEEKLY calculation for " + start_date + " to " + end_date)
+        savetype = "weekly"
+
+    elif delta == 27 or delta == 28 or delta == 29 or delta == 30: #27 or 28 for feb
+        print("Performing MONTHLY calculation for " + start_date + " to " + end_date)
+        savetype = "monthly"
+
+    else:
+        raise Exception("Invalid date input entries. Start and end date must be 7 or 28-31 days apart (for weekly and monthly stats) Entered range was: " + str(delta+1) + " days")
+
+    if len(sys.argv) >= 4:
+        input_variables = sys.argv[3].split(",")
+    else:
+        input_variables = ['SFCTC', 'SFCTC_KF', 'SFCWSPD', 'SFCWSPD_KF', 'PCPTOT']
+    for input_variable in input_variables:
+        if input_variable not in ['SFCTC_KF', 'SFCTC', 'PCPTOT', 'PCPT6', 'PCPT24', 'SFCWSPD_KF', 'SFCWSPD']:
+            raise Exception("Invalid variable input entries. Current options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD. Case sensitive.")
+
+    if len(sys.argv) == 5:
+        input_domains = sys.argv[4].split(",")
+    else:
+        input_domains = ['small', 'large']
+    for input_domain in input_domains:
+        if input_domain not in ['large','small']:
+            raise Exception("Invalid domain input entries. Current options: large, small. Case sensitive.")
+
+else:
+    raise Exception("Invalid input entries. Needs 2 YYMMDD entries for start and end dates, and optionally the variables and domains")
+
+# list of model names as strings (names as they are saved in www_oper and my output folders)
+models = np.loadtxt(models_file,usecols=0,dtype='str')
+grids = np.loadtxt(models_file,usecols=1,dtype='str') #list of grid sizings (g1, g2, g3 etc) for each model
+gridres = np.loadtxt(models_file,usecols=2,dtype='str') #list of grid resolution in km for each model
+hours = np.loadtxt(models_file,usecols=3,dtype='str') #list of max hours for each model
+
+station_df = pd.read_csv(station_file)
+
+stations_with_SFCTC = np.array(station_df.query("SFCTC==1")["Station ID"],dtype=str)
+stations_with_SFCWSPD = np.array(station_df.query("SFCWSPD==1")["Station ID"],dtype=str)
+stations_with_PCPTOT = np.array(station_df.query("PCPTOT==1")["Station ID"],dtype=str)
+stations_with_PCPT6 = np.array(station_df.query("PCPT6==1")["Station ID"],dtype=str)
+stations_with_PCPT24 = np.array(station_df.query("PCPT24==1")["Station ID"],dtype=str)
+
+domain_stations = {}
+for input_domain in input_domains:
+    if input_domain == "large":
+        domain_stations[input_domain] = np.array(station_df.query("`All stations`==1")["Station ID"],dtype=str)
+    else:
+        domain_stations[input_domain] = np.array(station_df.query("`Small domain`==1")["Station ID"],dtype=str)
+
+# the obs are read once for every station in any of the domains
+obs_all_stations = np.unique(np.concatenate(list(domain_stations.values())))
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# variables grouped by the obs they use (KF variables use the raw obs), in the order they were entered
+def group_variables(input_variables):
+
+    obs_variables = {}
+    for input_variable in input_variables:
+        obs_variable = input_variable[:-3] if "_KF" in input_variable else input_variable
+        obs_variables.setdefault(obs_variable, []).append(input_variable)
+
+    return(obs_variables)
+
+def get_obs(obs_variable, date_list_obs):
+
+    if obs_variable == "PCPT6":
+        return(PCPT_obs_df_6(date_list_obs, delta, obs_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6,\
+                  stations_with_PCPT24, obs_all_stations, start_date, end_date))
+    elif obs_variable == "PCPT24":
+        return(PCPT_obs_df_24(date_list_obs, delta, obs_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, \
+                   stations_with_PCPT24, obs_all_stations, start_date, end_date))
+    else:
+        return(get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, obs_all_stations, obs_variable, start_date, end_date, date_list_obs))
+
+# get_rankings arguments (without the obs) for every model/grid and domain for the variable
+def get_rankings_args(input_variable, date_list):
+
+    rankings_args = []
+    for i in range(len(models)):
+       model = models[i] #loops through each model
+
+       for grid_i in range(len(grids[i].split(","))): #loops through each grid size for each model
+
+           grid = grids[i].split(",")[grid_i]
+           maxhour = hours[i].split(",")[grid_i] # the max hours that are in the current model/grid
+
+           filehours = get_filehours(1, int(maxhour))
+           filepath, gridname = get_filepath(model, grid, input_variable)
+
+           if check_dates(start_date, delta, filepath, input_variable, station='3510') == False:
+               print("   Skipping model " + model + gridname + " (check_dates flag)")
+               continue
+
+           # if it can't find the folder for the model/grid pair
+           if not os.path.isdir(filepath):
+               raise Exception("Missing grid/model pair (or wrong base filepath for" + model + gridname)
+
+           for input_domain in input_domains:
+               print("Now on.. " + model + gridname + " for " + input_variable + " (" + input_domain + ")")
+
+               rankings_args.append(dict(filepath=filepath, delta=delta, input_domain=input_domain, date_entry1=date_entry1, date_entry2=date_entry2, savetype=savetype, \
+                    all_stations=domain_stations[input_domain], station_df=station_df, variable=input_variable, date_list=date_list, model=model, grid=grid, maxhour=maxhour, \
+                    gridname=gridname, filehours=filehours, stations_with_SFCTC=stations_with_SFCTC, stations_with_SFCWSPD=stations_with_SFCWSPD, stations_with_PCPTOT=stations_with_PCPTOT, \
+                    stations_with_PCPT6=stations_with_PCPT6, stations_with_PCPT24=stations_with_PCPT24))
+
+    return(rankings_args)
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    date_list = listofdates(start_date, end_date, obs=False)
+    date_list_obs = listofdates(start_date, end_date, obs=True)
+
+    for obs_variable, variables in group_variables(input_variables).items():
+
+        rankings_args = []
+        for input_variable in variables:
+            rankings_args = rankings_args + get_rankings_args(input_variable, date_list)
+
+        # skips the model/grid pairs that are already done
+        plan = plan_rankings('continuous', rankings_args)
+        if dry_run:
+            print_plan(plan)
+            continue
+
+        rankings_args = [args for args, reason in plan if reason is not None]
+        if len(rankings_args) == 0:
+            print("All results for " + ",".join(variables) + " are already saved")
+            continue
+
+        obs_cube, obs_stations = get_obs(obs_variable, date_list_obs)
+
+        if batch and workers > 1:
+            # the workers only read and station average the fcst, the stats are all worked out here
+            with get_context("fork").Pool(workers, initializer=set_shared_obs, initargs=(obs_cube, obs_stations)) as pool:
+                save_rankings_batch(rankings_args, list(pool.imap(get_model_sums_shared, rankings_args)))
+        elif batch:
+            get_rankings_batch(rankings_args, obs_cube, obs_stations)
+        elif workers > 1:
+            # same as leaderboards-txt-sqlite2.py, the workers send back their stats to be written here
+            with get_context("fork").Pool(workers, initializer=set_shared_obs, initargs=(obs_cube, obs_stations)) as pool:
+                for writes in pool.imap(get_rankings_deferred, rankings_args):
+                    write_deferred(writes)
+        else:
+            for args in rankings_args:
+                get_rankings(**args, obs_cube=obs_cube, obs_stations=obs_stations)
+
+    if dry_run:
+        return
+
+    # the website still reads the text files, so they're written from the results store
+    write_textfiles(input_domains, input_variables, savetype)
+
+    # the stations that took the longest to read
+    print_query_times()
+
+if __name__ == "__main__":
+    main(sys.argv)
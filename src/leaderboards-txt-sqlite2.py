@@ -4,10 +4,18 @@
 Created in 2023 adapted from code by Eva Gnegy (2021)
 @author: Reagan McKinney
 
-Input: start date (YYMMDD), end date (YYMMDD), variable, domain size
+Input: start date (YYMMDD), end date (YYMMDD), variable, domain size [--workers N] [--batch] [--dry-run]
     Start and end date must be 7 or 28-31 day stretch
     variable options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD
     domain options: large, small
+    --workers N runs N model/grid pairs at once in separate processes (default 1), the stats files are still
+        written by the main process in the same order
+    --batch reads every model/grid first and then works out the stats for all of them (every time window) in
+        one go (see save_rankings_batch in utl/funcs.py), instead of one model/grid at a time
+    --dry-run prints which model/grid pairs would be run (and how much they would read) without running them
+
+Model/grid pairs that already have their results saved for every time window are skipped before anything is
+read (see utl/planner.py).
     
 The stats round the obs and forecasts to one decimal before doing statistics 
     - this can be changed in the (get_statistics) function
@@ -27,6 +35,8 @@ from sklearn.metrics import mean_absolute_error
 from scipy import stats
 import sqlite3
 from utl.funcs import *
+from utl.planner import plan_rankings, print_plan
+from multiprocessing import get_context
 import warnings
 warnings.filterwarnings("ignore",category=RuntimeWarning)
 
@@ -54,6 +64,23 @@ textfile_folder = '/verification/Statistics/'
 ### -------------------- INPUT ----------------------------
 ###########################################################
 
+# optional --workers N, the number of model/grid pairs to run at once (in separate processes)
+workers = 1
+if "--workers" in sys.argv:
+    i = sys.argv.index("--workers")
+    workers = int(sys.argv[i+1])
+    sys.argv = sys.argv[:i] + sys.argv[i+2:]
+
+# optional --batch, the stats for every model/grid at once
+batch = "--batch" in sys.argv
+if batch:
+    sys.argv.remove("--batch")
+
+# optional --dry-run, only prints the plan
+dry_run = "--dry-run" in sys.argv
+if dry_run:
+    sys.argv.remove("--dry-run")
+
 # takes an input date for the first and last day you want calculations for, must be a range of 7 or 30 days apart
 if len(sys.argv) == 5:
     date_entry1 = sys.argv[1]    #input date YYMMDD
@@ -125,17 +152,9 @@ def main(args):
 
     date_list = listofdates(start_date, end_date, obs=False)
     date_list_obs = listofdates(start_date, end_date, obs=True)
-    if input_variable == "PCPT6":       
-        obs_df_60hr,obs_df_84hr,obs_df_120hr,obs_df_180hr,obs_df_day1,obs_df_day2,obs_df_day3,obs_df_day4,obs_df_day5,obs_df_day6,obs_df_day7 = \
-            PCPT_obs_df_6(date_list_obs, delta, input_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6,\
-                  stations_with_PCPT24, all_stations, start_date, end_date)
-    elif input_variable == "PCPT24":       
-        obs_df_60hr,obs_df_84hr,obs_df_120hr,obs_df_180hr,obs_df_day1,obs_df_day2,obs_df_day3,obs_df_day4,obs_df_day5,obs_df_day6,obs_df_day7 = \
-            PCPT_obs_df_24(date_list_obs, delta, input_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, \
-                   stations_with_PCPT24,all_stations,start_date, end_date)
-    else:
-        obs_df_60hr,obs_df_84hr,obs_df_120hr,obs_df_180hr,obs_df_day1,obs_df_day2,obs_df_day3,obs_df_day4,obs_df_day5,obs_df_day6,obs_df_day7 = get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, input_variable, start_date, end_date, date_list_obs)
    
+    # get_rankings arguments for each model/grid (without the obs)
+    rankings_args = []
     for i in range(len(models)):
        model = models[i] #loops through each model
        
@@ -144,43 +163,8 @@ def main(args):
            grid = grids[i].split(",")[grid_i]
            maxhour = hours[i].split(",")[grid_i] # the max hours that are in the current model/grid
            
-           if "_KF" in input_variable:
-              file_var = input_variable[:-3]
-           else:
-               file_var = input_variable
-
            filehours = get_filehours(1, int(maxhour))
-           #ENS only has one grid (and its not saved in a g folder)
-           if model == 'ENS' and '_KF' in input_variable:    
-               filepath = fcst_filepath + model + '/' + file_var + '/fcst.KF_MH.t/'
-               gridname = ''
-           elif model == 'ENS':
-               filepath = fcst_filepath + model + '/' + file_var + '/fcst.t/'
-               gridname = ''
-           elif model == "ENS_LR" and "_KF" in input_variable:
-               filepath = fcst_filepath +model[:-3] + '/' + file_var + '/fcst.LR.KF_MH.t/'
-               gridname = ''
-           elif model == "ENS_lr" and "_KF" in input_variable:
-               filepath = fcst_filepath+model[:-3] + '/' + file_var + '/fcst.lr.KF_MH.t/'
-               gridname = ''
-           elif model == "ENS_hr" and "_KF" in input_variable:
-               filepath = fcst_filepath +model[:-3] + '/' + file_var + '/fcst.hr.KF_MH.t/'
-               gridname = ''
-           elif model =="ENS_hr":
-               filepath = fcst_filepath +model[:-3] + '/' + file_var + "/fcst.hr.t/"
-               gridname = ''
-           elif model =="ENS_lr":
-               filepath = fcst_filepath +model[:-3] + '/' + file_var + "/fcst.lr.t/"
-               gridname = ''
-           elif model =="ENS_LR":
-               filepath = fcst_filepath +model[:-3] + '/' + file_var + "/fcst.LR.t/"
-               gridname = ''
-           elif "_KF" in input_variable:
-               filepath = fcst_filepath +model + '/' + grid + '/' + file_var + "/fcst.KF_MH/"          
-               gridname = "_" + grid
-           else:
-               filepath = fcst_filepath + model + '/' + grid + '/' + file_var + '/fcst.t/'
-               gridname = "_" + grid
+           filepath, gridname = get_filepath(model, grid, input_variable)
            
            if check_dates(start_date, delta, filepath, input_variable, station='3510') == False:
                print("   Skipping model " + model + gridname + " (check_dates flag)")
@@ -193,7 +177,54 @@ def main(args):
            print("Now on.. " + model + gridname + " for " + input_variable)
 
            
-           get_rankings(filepath, delta, input_domain, date_entry1, date_entry2, savetype, all_stations, station_df, input_variable, date_list, model, grid, maxhour, gridname, filehours, obs_df_60hr,obs_df_84hr,obs_df_120hr,obs_df_180hr,obs_df_day1,obs_df_day2,obs_df_day3,obs_df_day4,obs_df_day5,obs_df_day6,obs_df_day7, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24)
+           rankings_args.append(dict(filepath=filepath, delta=delta, input_domain=input_domain, date_entry1=date_entry1, date_entry2=date_entry2, savetype=savetype, \
+                all_stations=all_stations, station_df=station_df, variable=input_variable, date_list=date_list, model=model, grid=grid, maxhour=maxhour, \
+                gridname=gridname, filehours=filehours, stations_with_SFCTC=stations_with_SFCTC, stations_with_SFCWSPD=stations_with_SFCWSPD, stations_with_PCPTOT=stations_with_PCPTOT, \
+                stations_with_PCPT6=stations_with_PCPT6, stations_with_PCPT24=stations_with_PCPT24))
+    
+    # skips the model/grid pairs that are already done
+    plan = plan_rankings('continuous', rankings_args)
+    if dry_run:
+        print_plan(plan)
+        return
+
+    rankings_args = [args for args, reason in plan if reason is not None]
+    if len(rankings_args) == 0:
+        print("All results for " + input_variable + " (" + input_domain + ") are already saved")
+        return
+
+    if input_variable == "PCPT6":       
+        obs_cube, obs_stations = \
+            PCPT_obs_df_6(date_list_obs, delta, input_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6,\
+                  stations_with_PCPT24, all_stations, start_date, end_date)
+    elif input_variable == "PCPT24":       
+        obs_cube, obs_stations = \
+            PCPT_obs_df_24(date_list_obs, delta, input_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, \
+                   stations_with_PCPT24,all_stations,start_date, end_date)
+    else:
+        obs_cube, obs_stations = get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, input_variable, start_date, end_date, date_list_obs)
+
+    if batch and workers > 1:
+        # the workers only read and station average the fcst, the stats are all worked out here
+        with get_context("fork").Pool(workers, initializer=set_shared_obs, initargs=(obs_cube, obs_stations)) as pool:
+            save_rankings_batch(rankings_args, list(pool.imap(get_model_sums_shared, rankings_args)))
+    elif batch:
+        get_rankings_batch(rankings_args, obs_cube, obs_stations)
+    elif workers > 1:
+        # the obs are handed to each worker once when it starts (fork, so they aren't copied), the workers send
+        # back their stats and they're written here in model order so the files never interleave
+        with get_context("fork").Pool(workers, initializer=set_shared_obs, initargs=(obs_cube, obs_stations)) as pool:
+            for writes in pool.imap(get_rankings_deferred, rankings_args):
+                write_deferred(writes)
+    else:
+        for args in rankings_args:
+            get_rankings(**args, obs_cube=obs_cube, obs_stations=obs_stations)
+
+    # the website still reads the text files, so they're written from the results store
+    write_textfiles([input_domain], [input_variable], savetype)
+
+    # the stations that took the longest to read
+    print_query_times()
 
 if __name__ == "__main__":
     main(sys.argv)
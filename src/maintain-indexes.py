@@ -0,0 +1,135 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: [--check] [--workers N] [folders to scan, /verification/Forecasts/ and /verification/Observations/ by default]
+
+Makes sure every station sqlite file has a covering index for the queries the scripts run on it:
+    - obs (Date, Time, Val) and fcst (Date, Offset, Val), so reading a date range, SELECT DISTINCT Date and
+      the catalog's GROUP BY Date only touch the index instead of scanning the whole table
+then runs ANALYZE and checks the query plans. Any file where a query still scans the table is reported.
+--check only reports (no indexes are made). The files are done in parallel (all cores by default).
+"""
+import os
+import time
+import sqlite3
+import argparse
+from multiprocessing import Pool
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#location where obs files are (all sql databases should be in this directory)
+obs_filepath = "/verification/Observations/"
+
+#location where forecast files are (immediately within this directory should be model folders, then grid folders, then the sql databases)
+fcst_filepath = "/verification/Forecasts/"
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+parser = argparse.ArgumentParser(description="Makes the covering indexes on the station sqlite files and checks the query plans")
+parser.add_argument('folders', nargs='*', default=[fcst_filepath, obs_filepath])
+parser.add_argument('--check', action='store_true', help="only report the query plans, don't make any indexes")
+parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of files to do at once")
+args = parser.parse_args()
+
+# queries the scripts run on the files (the plans are checked with 0 for the dates)
+queries = ["SELECT Date, {col}, Val from 'All' WHERE Date BETWEEN ? AND ?",
+           "SELECT DISTINCT Date from 'All'",
+           "SELECT Date, COUNT(*) from 'All' GROUP BY Date"]
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+def find_files(folders):
+
+    sql_paths = []
+    for filepath in folders:
+        for folder, _, files in os.walk(filepath):
+            sql_paths = sql_paths + [os.path.join(folder, name) for name in files if name.endswith(".sqlite")]
+
+    return(sorted(sql_paths))
+
+# the query plans that scan the table instead of using an index
+def check_plans(sql_con, col):
+
+    bad_plans = []
+    for sql_query in queries:
+        sql_query = sql_query.format(col=col)
+        params = (0, 0) if "?" in sql_query else ()
+
+        plan = " ".join(row[-1] for row in sql_con.execute("EXPLAIN QUERY PLAN " + sql_query, params).fetchall())
+        if "SCAN" in plan and "INDEX" not in plan:
+            bad_plans.append(sql_query + "  ->  " + plan)
+
+    return(bad_plans)
+
+# makes the index (if it's missing) and runs ANALYZE, returns (path, made index, bad plans, seconds or error)
+def maintain_file(sql_path):
+
+    start = time.time()
+
+    try:
+        sql_con = sqlite3.connect(sql_path, timeout=60)
+        columns = [row[1] for row in sql_con.execute("PRAGMA table_info('All')").fetchall()]
+
+        # obs tables have Time, fcst tables have Offset
+        col = "Time" if "Time" in columns else "Offset"
+
+        made_index = False
+        if not args.check:
+            indexes = [row[0] for row in sql_con.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='All'").fetchall()]
+            if "All_Date_" + col not in indexes:
+                sql_con.execute("CREATE INDEX IF NOT EXISTS 'All_Date_" + col + "' ON 'All' (Date, " + col + ", Val)")
+                made_index = True
+
+            sql_con.execute("ANALYZE")
+            sql_con.commit()
+
+        bad_plans = check_plans(sql_con, col)
+        sql_con.close()
+
+    except sqlite3.Error as e:
+        return(sql_path, False, [], str(e))
+
+    return(sql_path, made_index, bad_plans, time.time() - start)
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    sql_paths = find_files(args.folders)
+    print("Found " + str(len(sql_paths)) + " files in " + ", ".join(args.folders))
+
+    start = time.time()
+    num_made, num_bad, num_errors = 0, 0, 0
+
+    with Pool(args.workers) as pool:
+        for sql_path, made_index, bad_plans, result in pool.imap_unordered(maintain_file, sql_paths, chunksize=16):
+
+            if isinstance(result, str):
+                print("   Error on " + sql_path + ": " + result)
+                num_errors = num_errors + 1
+                continue
+
+            if made_index:
+                num_made = num_made + 1
+
+            if len(bad_plans) > 0:
+                num_bad = num_bad + 1
+                print("   Query plan regression in " + sql_path)
+                for plan in bad_plans:
+                    print("        " + plan)
+
+    print("Made indexes on " + str(num_made) + " files, " + str(num_bad) + " files with table scans, " + str(num_errors) + " errors (%.1f s)" % (time.time() - start))
+
+if __name__ == "__main__":
+    main(args)
@@ -24,6 +24,11 @@ import copy
 import shutil
 import pandas as pd
 import sqlite3
+from utl.sql_reader import read_obs, read_fcst
+from utl.align import align_obs
+from utl.obs_archive import read_obs_archive
+from utl.qc import qc_flags, read_qc_flags, remove_flagged, sentinel_mask, SENTINEL, BOUNDS
+from utl.catalog import has_station_files
 
 ###########################################################
 ### -------------------- FILEPATHS ------------------------
@@ -123,6 +128,9 @@ precip6hrs_stations = ['597','604','583','600','606','601','607','610','612','60
 days = 8    
     
 end_date = pd.to_datetime(start_date, format='%y%m%d') + timedelta(days=days)
+
+# quality control checks that take obs off the plots (see utl/qc.py)
+obs_checks = BOUNDS
 ###########################################################
 ### -------------------- FUNCTIONS ------------------------
 ###########################################################
@@ -132,10 +140,11 @@ end_date = pd.to_datetime(start_date, format='%y%m%d') + timedelta(days=days)
 # also turns bad data (unnaturally large values) into NaNs
 def remove_missing_data(data):
 
-    for i in range(len(data)):
-        if data[i] == -999: 
-            print("      removing datapoint: " + str(data[i]))
-            data[i] = np.nan           
+    data = np.array(data, dtype=np.float64)
+    missing = sentinel_mask(data)
+    if missing.any():
+        print("      removing " + str(missing.sum()) + " datapoints")
+    data[missing] = np.nan
             
     return(data)
 
@@ -242,15 +251,7 @@ def get_data(filepath, station, variable, obs):
 
     end_date = (input_date + delta).strftime("%y%m%d%H")
     
-    sql_con = sqlite3.connect(filepath + station + ".sqlite")
-    sql_query = "SELECT *from 'All' WHERE date BETWEEN 20" + str(start_date) + " AND 20" + str(end_date)
-    fcst = pd.read_sql_query(sql_query, sql_con)
-
-    fcst['dateime'] = None
-    for x in range(len(fcst['Offset'])):
-        fcst.loc[x, 'datetime'] = pd.to_datetime(start_date, format='%y%m%d')+ timedelta(hours=int(x))
-    
-    fcst = fcst.set_index('datetime')
+    dates, offsets, fcst = read_fcst(filepath + station + ".sqlite", "20" + str(start_date), "20" + str(end_date)[:6])
 
     #removes bad/missing data data
     fcst = remove_missing_data(fcst)
@@ -280,26 +281,26 @@ def get_obs(filepath,station,variable):
     if 'PCPT' in variable:
         variable = "PCPTOT"
 
+    # hourly obs from the archive if it's been updated past the last day on the plot
+    archive_obs, covered = read_obs_archive(variable, [station if len(station) >= 4 else "0" + station], start_date, days*24)
+    if covered[0]:
+        flags = read_qc_flags(variable, [station if len(station) >= 4 else "0" + station], start_date, days*24)
+        return(np.arange(days*24), remove_flagged(np.array(archive_obs[0], dtype=np.float64), flags[0], obs_checks))
+    
     print(obs_filepath + variable + '/' + station + ".sqlite")
     
-    sql_con = sqlite3.connect(obs_filepath + variable + '/' + station + ".sqlite")
-    sql_query = "SELECT * from 'All' WHERE date BETWEEN 20" +str(start_date) + " AND 20" +str(end_date)
-    obs = pd.read_sql_query(sql_query, sql_con)
-
-    obs['datetime'] = None
-
-    for y in range(len(obs['Time'])):
-        hour = int(obs['Time'][y])/100
-        obs.loc[y,'datetime'] = pd.to_datetime(obs.loc[y,'Date'],format='%Y%m%d') + timedelta(hours=hour)
+    dates, times, vals = read_obs(obs_filepath + variable + '/' + station + ".sqlite", "20" + str(start_date), "20" + str(end_date)[:6])
 
-    obs = obs.set_index('datetime')
+    # hours from 00 UTC on the start date, the same as the archive obs
+    obs = align_obs(dates, times, vals, start_date, days)
+    obs = remove_flagged(obs, qc_flags(obs, variable, SENTINEL | obs_checks), SENTINEL | obs_checks)
      
     # this means the user picked a date to plot that there is no obs for (or it was the wrong format)
     #if start_date not in obs['Date']:
     #    raise Exception("Invalid start date: " + start_date  + " not in output data collected. Make sure it is YYMMDD.")
     
         
-    return(obs['Time'], obs['Val'])
+    return(np.arange(days*24), obs)
 
 
 # checks if station/var exists 
@@ -309,10 +310,13 @@ def check_data_exists(filepath, station, variable):
     if variable == "APCP":
         variable = "PCPTOT"
         
-    flag = False
-    for all_files in os.listdir(filepath):    
-        if station + "." + variable in all_files:
-            flag=True
+    # catalog lookup, only lists the folder if nothing under it has been catalogued
+    flag = has_station_files(filepath, station if len(station) >= 4 else "0" + station, variable)
+    if flag is None:
+        flag = False
+        for all_files in os.listdir(filepath):    
+            if station + "." + variable in all_files:
+                flag=True
     return(flag)
        
         
@@ -0,0 +1,96 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Benchmark of the old per window stats (dropping the missing pairs one value at a time, then sklearn MAE/RMSE and
+scipy spearman for each window, plus the bias, pearson and sd ratio) against utl/metrics.py, which does every
+stat for every window in one go. Uses fake station averaged fcst/obs so it can be run anywhere:
+
+    python3 testing/benchmark_metrics.py [number of windows] [number of pairs]
+
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from scipy import stats
+from sklearn.metrics import mean_squared_error
+from sklearn.metrics import mean_absolute_error
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utl.metrics import continuous_metrics
+
+###########################################################
+### ---------------------- INPUT --------------------------
+###########################################################
+
+num_windows = int(sys.argv[1]) if len(sys.argv) > 1 else 11*40 # every time window of 40 model/grids
+num_pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 7*180 # weekly 180hr window
+
+missing = 0.1
+
+###########################################################
+### ---------------------- FUNCTIONS ----------------------
+###########################################################
+
+# station averaged and rounded to one decimal, like get_statistics
+def make_pairs():
+
+    obs = np.round(np.random.normal(10, 5, (num_windows, num_pairs)), 1)
+    fcst = np.round(obs + np.random.normal(0.5, 2, (num_windows, num_pairs)), 1)
+
+    fcst[np.random.rand(num_windows, num_pairs) < missing] = np.nan
+    obs[np.random.rand(num_windows, num_pairs) < missing] = np.nan
+
+    return(fcst, obs)
+
+def old_metrics(fcst, obs):
+
+    metrics = {name: [] for name in ['bias', 'MAE', 'RMSE', 'pearson', 'spearman', 'sd_ratio']}
+    for row in range(len(fcst)):
+        fcst_row, obs_row = [], []
+        for i in range(len(fcst[row])):
+            if np.isnan(fcst[row][i]) or np.isnan(obs[row][i]):
+                continue
+            fcst_row.append(fcst[row][i])
+            obs_row.append(obs[row][i])
+
+        metrics['bias'].append(np.mean(np.array(fcst_row) - np.array(obs_row)))
+        metrics['MAE'].append(mean_absolute_error(obs_row, fcst_row))
+        metrics['RMSE'].append(mean_squared_error(obs_row, fcst_row)**0.5)
+        metrics['pearson'].append(stats.pearsonr(obs_row, fcst_row)[0])
+        metrics['spearman'].append(stats.spearmanr(obs_row, fcst_row)[0])
+        metrics['sd_ratio'].append(np.std(fcst_row)/np.std(obs_row))
+
+    return(metrics)
+
+def new_metrics(fcst, obs):
+    return(continuous_metrics(fcst, obs))
+
+def run(metrics, fcst, obs):
+    t = time.time()
+    out = metrics(fcst, obs)
+    return(time.time() - t, out)
+
+###########################################################
+### ------------------------ MAIN -------------------------
+###########################################################
+
+def main(args):
+    fcst, obs = make_pairs()
+
+    t_old, out_old = run(old_metrics, fcst, obs)
+    t_new, out_new = run(new_metrics, fcst, obs)
+
+    same = all(np.allclose(out_old[name], out_new[name]) for name in out_old)
+
+    print(str(num_windows) + " windows x " + str(num_pairs) + " pairs")
+    print("    per window path: %8.3f s" % t_old)
+    print("    batched path:    %8.3f s" % t_new)
+    print("    speedup:         %8.1f x   (same output: %s)" % (t_old/t_new, same))
+
+if __name__ == "__main__":
+    main(sys.argv)
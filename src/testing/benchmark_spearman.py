@@ -0,0 +1,107 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Benchmark of the spearman correlation for every time window of every model/grid the old way (dropping the
+missing pairs and calling scipy.stats.spearmanr for each one, so the same obs get ranked again for every model)
+against the batched ranks in utl/metrics.py (one argsort for all the fcst, each set of obs sorted once). Uses fake
+station averaged fcst/obs for a monthly run of the large domain, where the model/grids with the same stations have
+the same obs:
+
+    python3 testing/benchmark_spearman.py [number of model/grids] [number of days]
+
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from scipy import stats
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utl.metrics import rank_rows, correlate_rows, pad_rows
+
+###########################################################
+### ---------------------- INPUT --------------------------
+###########################################################
+
+num_models = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+num_days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+# number of different station lists (model/grids with the same list have the same obs)
+num_station_sets = 4
+
+missing = 0.1
+
+# fraction of the model/grids with missing fcst (the rest have a fcst wherever there's an obs)
+models_missing = 0.5
+
+# (start, end) lead hours of the 180hr, 120hr, 84hr, 60hr and day 1-7 windows
+windows = [(1, 181), (1, 121), (1, 85), (1, 61)] + [(day*24 + 1, day*24 + 25) for day in range(7)]
+
+###########################################################
+### ---------------------- FUNCTIONS ----------------------
+###########################################################
+
+# (init date, lead) station averaged fcst/obs rounded to one decimal, like get_statistics
+def make_leads():
+
+    station_obs = [np.round(np.random.normal(10, 5, (num_days, 181)), 1) for _ in range(num_station_sets)]
+    for obs in station_obs:
+        obs[np.random.rand(num_days, 181) < missing] = np.nan
+
+    all_fcst, all_obs = [], []
+    for model in range(num_models):
+        obs = station_obs[model % num_station_sets]
+        fcst = np.round(obs + np.random.normal(0.5, 2, (num_days, 181)), 1)
+        if np.random.rand() < models_missing:
+            fcst[np.random.rand(num_days, 181) < missing] = np.nan
+
+        all_fcst.append(fcst)
+        all_obs.append(obs)
+
+    return(all_fcst, all_obs)
+
+def old_spearman(all_fcst, all_obs):
+
+    corr = []
+    for fcst, obs in zip(all_fcst, all_obs):
+        for start, end in windows:
+            fcst_window, obs_window = fcst[:,start:end].flatten(), obs[:,start:end].flatten()
+            valid = ~np.isnan(fcst_window) & ~np.isnan(obs_window)
+            corr.append(stats.spearmanr(obs_window[valid], fcst_window[valid])[0])
+
+    return(np.array(corr))
+
+def new_spearman(all_fcst, all_obs):
+
+    fcst = pad_rows([fcst[:,start:end].flatten() for fcst in all_fcst for start, end in windows])
+    obs = pad_rows([obs[:,start:end].flatten() for obs in all_obs for start, end in windows])
+
+    valid = ~np.isnan(fcst) & ~np.isnan(obs)
+    return(correlate_rows(rank_rows(fcst, valid), rank_rows(obs, valid), valid, valid.sum(axis=1)))
+
+def run(spearman, all_fcst, all_obs):
+    t = time.time()
+    out = spearman(all_fcst, all_obs)
+    return(time.time() - t, out)
+
+###########################################################
+### ------------------------ MAIN -------------------------
+###########################################################
+
+def main(args):
+    all_fcst, all_obs = make_leads()
+
+    t_old, out_old = run(old_spearman, all_fcst, all_obs)
+    t_new, out_new = run(new_spearman, all_fcst, all_obs)
+
+    print(str(num_models) + " model/grids x " + str(len(windows)) + " windows, " + str(num_days) + " days")
+    print("    scipy loop:    %8.3f s" % t_old)
+    print("    batched ranks: %8.3f s" % t_new)
+    print("    speedup:       %8.1f x   (same output: %s)" % (t_old/t_new, np.allclose(out_old, out_new)))
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,135 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Benchmark of the old pandas obs/fcst readers (read_sql_query + row by row datetimes + make_df join) against
+utl/sql_reader.py. Makes fake station sqlite files in a temp folder so it can be run anywhere:
+
+    python3 testing/benchmark_sql_reader.py [number of stations] [number of days]
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import sqlite3
+import pandas as pd
+import numpy as np
+from datetime import timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utl.sql_reader import read_obs, read_fcst
+from utl.align import align_obs, fill_hourly
+
+###########################################################
+### ---------------------- INPUT --------------------------
+###########################################################
+
+num_stations = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+num_days = int(sys.argv[2]) if len(sys.argv) > 2 else 30 # monthly
+
+maxhour = 180
+start_date = '230601'
+
+###########################################################
+### ---------------------- FUNCTIONS ----------------------
+###########################################################
+
+def make_files(folder):
+
+    dates = pd.date_range(pd.to_datetime(start_date, format='%y%m%d'), periods=num_days+8, freq='D')
+    dates = np.array(dates.strftime('%Y%m%d'), dtype=np.int64)
+
+    obs_rows = [(int(d), int(h*100), float(np.random.rand())) for d in dates for h in range(24)]
+    fcst_rows = [(int(d), int(h), float(np.random.rand())) for d in dates[:num_days] for h in range(maxhour)]
+
+    for station in range(num_stations):
+        con = sqlite3.connect(folder + '/obs_' + str(station) + '.sqlite')
+        con.execute("CREATE TABLE 'All' (Date INTEGER, Time INTEGER, Val REAL)")
+        con.executemany("INSERT INTO 'All' VALUES (?,?,?)", obs_rows)
+        con.commit()
+        con.close()
+
+        con = sqlite3.connect(folder + '/fcst_' + str(station) + '.sqlite')
+        con.execute("CREATE TABLE 'All' (Date INTEGER, Offset INTEGER, Val REAL)")
+        con.executemany("INSERT INTO 'All' VALUES (?,?,?)", fcst_rows)
+        con.commit()
+        con.close()
+
+    return(dates)
+
+# the hourly index the old readers joined onto
+def make_df(dates):
+    df_new = pd.DataFrame()
+    for day in dates:
+        df = pd.DataFrame({'date': [str(day)[2:]] * 24, 'time': ["%02d" % h for h in range(24)]})
+        df['datetime'] = pd.to_datetime(df['date']+' '+df['time'], format = '%y%m%d %H')
+        df_new = pd.concat([df_new, df])
+    return(df_new.set_index('datetime'))
+
+def old_obs(sql_path, dates):
+    df_new = make_df(dates)
+
+    sql_con = sqlite3.connect(sql_path)
+    obs = pd.read_sql_query("SELECT * from 'All' WHERE date BETWEEN " + str(dates[0]) + " AND " + str(dates[-1]), sql_con)
+    obs['datetime'] = None
+    for y in range(len(obs['Time'])):
+        hour = int(obs['Time'][y])/100
+        obs.loc[y,'datetime'] = pd.to_datetime(obs.loc[y,'Date'], format='%Y%m%d') + timedelta(hours=hour)
+    obs = obs.set_index(pd.to_datetime(obs['datetime']))
+
+    return(np.array(df_new.join(obs[['Val']], on='datetime')['Val']))
+
+def old_fcst(sql_path, dates):
+    df_new = make_df(dates)
+
+    sql_con = sqlite3.connect(sql_path)
+    fcst = pd.read_sql_query("SELECT * from 'All' WHERE date BETWEEN " + str(dates[0]) + " AND " + str(dates[num_days-1]), sql_con)
+    fcst['datetime'] = None
+    for x in range(len(fcst['Offset'])):
+        fcst.loc[x, 'datetime'] = pd.to_datetime(start_date, format='%y%m%d') + timedelta(hours=int(x))
+    fcst = fcst.set_index(pd.to_datetime(fcst['datetime']))
+
+    return(np.array(df_new.join(fcst[['Val']], on='datetime')['Val']))
+
+def new_obs(sql_path, dates):
+    d, t, vals = read_obs(sql_path, dates[0], dates[-1])
+    return(align_obs(d, t, vals, start_date, len(dates)))
+
+def new_fcst(sql_path, dates):
+    _, _, vals = read_fcst(sql_path, dates[0], dates[num_days-1])
+    return(fill_hourly(np.arange(len(vals)), vals, len(dates)*24))
+
+def run(reader, folder, name, dates):
+    t = time.time()
+    out = [reader(folder + '/' + name + '_' + str(station) + '.sqlite', dates) for station in range(num_stations)]
+    return(time.time() - t, out)
+
+###########################################################
+### ------------------------ MAIN -------------------------
+###########################################################
+
+def main(args):
+    folder = tempfile.mkdtemp()
+    try:
+        dates = make_files(folder)
+
+        for name, old, new in [('obs', old_obs, new_obs), ('fcst', old_fcst, new_fcst)]:
+            t_old, out_old = run(old, folder, name, dates)
+            t_new, out_new = run(new, folder, name, dates)
+
+            same = all(np.allclose(a, b, equal_nan=True) for a, b in zip(out_old, out_new))
+
+            print(name + ": " + str(num_stations) + " stations x " + str(num_days) + " days")
+            print("    pandas path: %8.3f s" % t_old)
+            print("    numpy path:  %8.3f s" % t_new)
+            print("    speedup:     %8.1f x   (identical output: %s)" % (t_old/t_new, same))
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -4,76 +4,112 @@
 Created in 2023
 @author: Reagan McKinney
 
-Code to test out sklearn confusion_matrix package
+Benchmark of the old categorical stats (sorting every value into dry/light/heavy with a python loop, then the
+2x2 stats for each window) against utl/contingency.py, which counts the 3x3 table of every window with one
+np.bincount and also gives the 3 category HSS and Gerrity score. Uses fake station averaged precip so it can be
+run anywhere:
+
+    python3 testing/contingency_table.py [number of windows] [number of pairs]
 
 """
 
 import os
-import pandas as pd
-import numpy as np
-from datetime import timedelta
 import sys
-import math
-import copy
-from scipy import stats
-import sqlite3
+import time
+import numpy as np
 import warnings
-from sklearn.metrics import jaccard_score
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
-N = int(100000)
-
-tru = np.random.rand(N)
-pred = np.random.rand(N)
-print(tru)
-print(pred)
-threshold = np.percentile(tru, 66)
-
-for i in range(len(tru)):
-    if tru[i] < 0.2:
-        tru[i] = 0
-    elif tru[i] > 0.2 and tru[i] < threshold:
-        tru[i] = 1
-    elif tru[i] > threshold:
-        tru[i] = 2
-    else:
-        tru[i] = None
-
-for i in range(len(pred)):
-    if pred[i] < 0.2:
-        pred[i] = 0
-    elif pred[i] > 0.2 and pred[i] < threshold:
-        pred[i] = 1
-    elif pred[i] > threshold:
-        pred[i] = 2
-    else:
-        pred[i] = None
-print(tru)
-print(pred)
-FP = np.logical_and(tru != pred, pred != 0).sum()
-FN = np.logical_and(tru != pred, pred == 0).sum()
-TP = np.logical_and(tru == pred, tru != 0).sum()
-TN = np.logical_and(tru == pred, tru == 0).sum()
-
-POD = TP/(TP+FN)
-POFD = FP/(TN+FP)
-
-PSS = (TP/(TP+FN)) - (FP/(FP+TN))
-HSS = POD - POFD
-
-CSI = TP/(TP + FP + FN)
-
-C = (TP + FP)*(TP + FN)/N
-GSS = (TP - C)/(TP + FP + FN - C)
-
-
-print("TN: "+str(TN))
-print("FN: "+str(FN))
-print("TP: "+str(TP))
-print("FP: "+str(FP))
-print("POD: "+str(POD))
-print("POFD: "+str(POFD))
-print("PSS: "+str(PSS))
-print("HSS: "+str(HSS))
-print("CSI: "+str(CSI))
-print("GSS: "+str(GSS))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utl.contingency import categorical_metrics
+
+###########################################################
+### ---------------------- INPUT --------------------------
+###########################################################
+
+num_windows = int(sys.argv[1]) if len(sys.argv) > 1 else 11*40 # every time window of 40 model/grids
+num_pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 7*180 # weekly 180hr window
+
+dry = 0.2 #mm
+precip_percentile = 66
+
+stat_names = ['TN', 'FN', 'FP', 'TP', 'POD', 'POFD', 'PSS', 'HSS', 'CSI', 'GSS']
+
+###########################################################
+### ---------------------- FUNCTIONS ----------------------
+###########################################################
+
+# station averaged and rounded to one decimal, dry about half the time
+def make_pairs():
+
+    obs = np.round(np.random.exponential(2, (num_windows, num_pairs))*(np.random.rand(num_windows, num_pairs) > 0.5), 1)
+    fcst = np.round(np.abs(obs + np.random.normal(0, 1, (num_windows, num_pairs))), 1)
+
+    fcst[np.random.rand(num_windows, num_pairs) < 0.1] = np.nan
+    obs[np.isnan(fcst)] = np.nan
+
+    return(fcst, obs)
+
+def categorize(values, base, percentile):
+    for i in range(len(values)):
+        if values[i] < base:
+            values[i] = 0
+        elif values[i] > base and values[i] < percentile:
+            values[i] = 1
+        elif values[i] > percentile:
+            values[i] = 2
+        else:
+            values[i] = None
+
+def old_stats(fcst, obs):
+
+    stats = {name: [] for name in stat_names}
+    for row in range(len(fcst)):
+        valid = ~np.isnan(fcst[row])
+        fcst_cat, obs_cat = fcst[row][valid], obs[row][valid]
+        N = len(obs_cat)
+
+        percentile = np.percentile(obs_cat, precip_percentile)
+        categorize(obs_cat, dry, percentile)
+        categorize(fcst_cat, dry, percentile)
+
+        FP = np.logical_and(obs_cat != fcst_cat, fcst_cat != 0).sum()
+        FN = np.logical_and(obs_cat != fcst_cat, fcst_cat == 0).sum()
+        TP = np.logical_and(obs_cat == fcst_cat, obs_cat != 0).sum()
+        TN = np.logical_and(obs_cat == fcst_cat, obs_cat == 0).sum()
+
+        C = (TP + FP)*(TP + FN)/N
+        for name, value in zip(stat_names, [TN, FN, FP, TP, TP/(TP+FN), FP/(TN+FP), (TP/(TP+FN)) - (FP/(FP+TN)), \
+                                            TP/(TP+FN) - FP/(TN+FP), TP/(TP + FP + FN), (TP - C)/(TP + FP + FN - C)]):
+            stats[name].append(value)
+
+    return(stats)
+
+def new_stats(fcst, obs):
+    return(categorical_metrics(fcst, obs, np.full(len(obs), dry), np.nanpercentile(obs, precip_percentile, axis=1)))
+
+def run(stats, fcst, obs):
+    t = time.time()
+    out = stats(fcst, obs)
+    return(time.time() - t, out)
+
+###########################################################
+### ------------------------ MAIN -------------------------
+###########################################################
+
+def main(args):
+    fcst, obs = make_pairs()
+
+    t_old, out_old = run(old_stats, fcst.copy(), obs.copy())
+    t_new, out_new = run(new_stats, fcst, obs)
+
+    same = all(np.array_equal(out_old[name], out_new[name], equal_nan=True) for name in stat_names)
+
+    print(str(num_windows) + " windows x " + str(num_pairs) + " pairs")
+    print("    python loop path: %8.3f s" % t_old)
+    print("    bincount path:    %8.3f s" % t_new)
+    print("    speedup:          %8.1f x   (identical 2x2 stats: %s)" % (t_old/t_new, same))
+    print("    3 category HSS (first window): %6.3f   Gerrity: %6.3f" % (out_new['multi_HSS'][0], out_new['Gerrity'][0]))
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,36 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: none (or folders to scan, /verification/Forecasts/ and /verification/Observations/ by default)
+
+Refreshes the catalog of station sqlite files (see utl/catalog.py). Only files that are new or whose mtime
+has changed are queried, so this can be run every day after the new data comes in.
+"""
+import sys
+from utl.catalog import refresh_catalog, fcst_filepath, obs_filepath
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+if len(sys.argv) > 1:
+    filepaths = [filepath if filepath.endswith('/') else filepath + '/' for filepath in sys.argv[1:]]
+else:
+    filepaths = [fcst_filepath, obs_filepath]
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    for filepath in filepaths:
+        print("Now on.. " + filepath)
+        num_updated, num_removed = refresh_catalog([filepath])
+        print("    " + str(num_updated) + " files updated, " + str(num_removed) + " removed")
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,163 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: variables (optional, PCPTOT, PCPT6 and PCPT24 if left out) [--percentile N]
+    --percentile N is the percentile to save (the precip_percentile in utl/funcs2.py by default)
+
+Works out the climatological heavy precip threshold for every station and month from the whole obs archive
+(see utl/climatology.py), so update-obs-archive.py should be run first. The archive is read one month at a time.
+PCPT6 and PCPT24 use the same obs as the verification: stations with their own 6/24 hour accumulations use
+those, the other precip stations get their hourly obs added up (the last hours of each month are carried over
+to the next). Only the accumulations ending at 00, 06, 12 and 18 UTC (00 UTC for PCPT24) are counted, the same
+ones the lead hours line up with.
+
+Only needs to be run every so often (monthly), the verification reads the saved thresholds.
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+from utl.obs_archive import archive_filepath, load_chunk, month_range
+from utl.obs_cube import accumulate
+from utl.climatology import new_histograms, add_to_histograms, histogram_percentile, save_climatology
+from utl.qc import chunk_flags, remove_flagged
+from utl.funcs2 import precip_percentile, obs_checks
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#description file for stations
+station_file = '/home/verif/verif-post-process/input/station_list_master.txt'
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+variables = ['PCPTOT', 'PCPT6', 'PCPT24']
+
+# optional --percentile N
+percentile = precip_percentile
+if "--percentile" in sys.argv:
+    i = sys.argv.index("--percentile")
+    percentile = float(sys.argv[i+1])
+    sys.argv = sys.argv[:i] + sys.argv[i+2:]
+
+if len(sys.argv) > 1:
+    input_variables = sys.argv[1:]
+    for input_variable in input_variables:
+        if input_variable not in variables:
+            raise Exception("Invalid variable input entries. Current options: PCPTOT, PCPT6, PCPT24. Case sensitive.")
+else:
+    input_variables = variables
+
+station_df = pd.read_csv(station_file)
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+def station_list(variable):
+
+    stations = np.array(station_df.query(variable+"==1")["Station ID"],dtype='str')
+    return([station if len(station) >= 4 else "0" + station for station in stations])
+
+# [(archive variable, stations, hours to add up)] for the obs that make up the variable
+def get_sources(variable):
+
+    if variable == "PCPTOT":
+        return([("PCPTOT", station_list("PCPTOT"), 1)])
+
+    hours = 6 if variable == "PCPT6" else 24
+    accum_stations = station_list(variable)
+    hourly_stations = [station for station in station_list("PCPTOT") if station not in accum_stations]
+
+    return([("PCPTOT", hourly_stations, hours), (variable, accum_stations, 1)])
+
+# every month from the first to the last chunk in the archive folder (None if there aren't any)
+def archive_months(folder):
+
+    if not os.path.isdir(folder):
+        return(None)
+
+    chunks = sorted(name[:-4] for name in os.listdir(folder) if name.endswith('.npz'))
+    if len(chunks) == 0:
+        return(None)
+
+    return(month_range(int(chunks[0] + "01"), int(chunks[-1] + "01")))
+
+# (station x hour) obs of the stations for the month, NaN for stations that aren't in the chunk (and for the obs
+# the verification takes out, see utl/qc.py)
+def month_obs(folder, variable, month, stations):
+
+    chunk_stations, chunk_obs = load_chunk(folder, month)
+    rows = {station: row for row, station in enumerate(chunk_stations)}
+
+    flag_stations, flags = chunk_flags(variable, month)
+    flag_rows = {station: row for row, station in enumerate(flag_stations)}
+
+    obs = np.full((len(stations), np.shape(chunk_obs)[1]), np.nan)
+    for i, station in enumerate(stations):
+        if station in rows:
+            obs[i] = chunk_obs[rows[station]]
+        if station in flag_rows:
+            obs[i] = remove_flagged(obs[i], flags[flag_rows[station]], obs_checks)
+
+    return(obs)
+
+# counts the obs of the variable for every station and month, returns the stations and the histograms
+def count_variable(variable):
+
+    sources = get_sources(variable)
+    stations = sorted(set(station for _, source_stations, _ in sources for station in source_stations))
+    station_rows = {station: i for i, station in enumerate(stations)}
+
+    # only the accumulations that end on the lead hours
+    step = 1 if variable == "PCPTOT" else sources[0][2]
+
+    histograms = new_histograms(len(stations))
+    for archive_variable, source_stations, hours in sources:
+        folder = archive_filepath + archive_variable + '/'
+        months = archive_months(folder)
+        if months is None or len(source_stations) == 0:
+            print("    No " + archive_variable + " obs in the archive")
+            continue
+
+        rows = [station_rows[station] for station in source_stations]
+        carry = np.full((len(source_stations), hours-1), np.nan)
+
+        for month in months:
+            obs = month_obs(folder, archive_variable, month, source_stations)
+
+            if hours > 1:
+                # the first hours of the month need the last ones of the month before
+                with_carry = np.concatenate([carry, obs], axis=1)
+                carry = with_carry[:, np.shape(with_carry)[1]-(hours-1):]
+                obs = accumulate(with_carry, hours)[:, hours-1:]
+
+            add_to_histograms(histograms, rows, obs[:, ::step], int(str(month)[5:7]))
+
+        print("    " + archive_variable + ": " + str(len(months)) + " months, " + str(len(source_stations)) + " stations")
+
+    return(stations, histograms)
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    for input_variable in input_variables:
+        print("Now on.. " + input_variable)
+
+        stations, histograms = count_variable(input_variable)
+        thresholds, counts = histogram_percentile(histograms, percentile)
+        num_rows = save_climatology(input_variable, percentile, stations, thresholds, counts)
+
+        print("    " + str(num_rows) + " station/month thresholds saved")
+
+if __name__ == "__main__":
+    main(sys.argv)
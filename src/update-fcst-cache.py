@@ -0,0 +1,84 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: start date (YYMMDD), end date (YYMMDD), variables (optional, all of them if left out)
+    variable options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD
+
+Adds the init dates between the start and end date to the memory mapped fcst cubes (see utl/fcst_cache.py)
+for every model/grid in the model list. Only the init dates that aren't in the cubes yet are read from the
+sqlite files, so this can be run every day to keep the cubes up to date before the weekly/monthly runs.
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+from utl.funcs import listofdates, get_filepath
+from utl.fcst_cache import update_fcst_cache
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#description file for stations
+station_file = '/home/verif/verif-post-process/input/station_list_master.txt'
+
+#description file for models
+models_file = '/home/verif/verif-post-process/input/model_list.txt'
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+variables = ['SFCTC_KF', 'SFCTC', 'PCPTOT', 'PCPT6', 'PCPT24', 'SFCWSPD_KF', 'SFCWSPD']
+
+if len(sys.argv) >= 3:
+    start_date = str(sys.argv[1])    #input date YYMMDD
+    end_date = str(sys.argv[2])    #input date YYMMDD
+
+    if len(sys.argv) > 3:
+        input_variables = sys.argv[3:]
+        for input_variable in input_variables:
+            if input_variable not in variables:
+                raise Exception("Invalid variable input entries. Current options: SFCTC_KF, SFCTC, PCPTOT, PCPT6, PCPT24, SFCWSPD_KF, SFCWSPD. Case sensitive.")
+    else:
+        input_variables = variables
+
+else:
+    raise Exception("Invalid input entries. Needs 2 YYMMDD entries for start and end dates (and optionally variable names)")
+
+models = np.loadtxt(models_file,usecols=0,dtype='str')
+grids = np.loadtxt(models_file,usecols=1,dtype='str') #list of grid sizings (g1, g2, g3 etc) for each model
+
+station_df = pd.read_csv(station_file)
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    date_list = listofdates(start_date, end_date, obs=False)
+
+    for input_variable in input_variables:
+        for i in range(len(models)):
+            model = models[i] #loops through each model
+
+            for grid in grids[i].split(","): #loops through each grid size for each model
+
+                filepath, gridname = get_filepath(model, grid, input_variable)
+
+                if not os.path.isdir(filepath):
+                    print("   Skipping " + model + gridname + " for " + input_variable + " (no fcst folder)")
+                    continue
+
+                stations = np.array(station_df.query(model+gridname+"==1")["Station ID"],dtype='str')
+                stations = [station if len(station) >= 4 else "0" + station for station in stations]
+
+                print("Now on.. " + model + gridname + " for " + input_variable)
+                update_fcst_cache(filepath, stations, date_list)
+
+if __name__ == "__main__":
+    main(sys.argv)
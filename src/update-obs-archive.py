@@ -0,0 +1,63 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: end date (YYMMDD), variables (optional, all of them if left out)
+    variable options: SFCTC, SFCWSPD, PCPTOT, PCPT6, PCPT24
+
+Adds the obs up to the end date to the obs archive (see utl/obs_archive.py) for every station in the station
+list. Only the days from the last date with data onwards are read from the sqlite files, so this can be run
+every day to keep the archive up to date.
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+from utl.obs_archive import update_obs_archive
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#description file for stations
+station_file = '/home/verif/verif-post-process/input/station_list_master.txt'
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+variables = ['SFCTC', 'SFCWSPD', 'PCPTOT', 'PCPT6', 'PCPT24']
+
+if len(sys.argv) >= 2:
+    end_date = str(sys.argv[1])    #input date YYMMDD
+
+    if len(sys.argv) > 2:
+        input_variables = sys.argv[2:]
+        for input_variable in input_variables:
+            if input_variable not in variables:
+                raise Exception("Invalid variable input entries. Current options: SFCTC, SFCWSPD, PCPTOT, PCPT6, PCPT24. Case sensitive.")
+    else:
+        input_variables = variables
+
+else:
+    raise Exception("Invalid input entries. Needs a YYMMDD entry for the end date (and optionally variable names)")
+
+station_df = pd.read_csv(station_file)
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    for input_variable in input_variables:
+        stations = np.array(station_df.query(input_variable+"==1")["Station ID"],dtype='str')
+        stations = [station if len(station) >= 4 else "0" + station for station in stations]
+
+        print("Now on.. " + input_variable + " (" + str(len(stations)) + " stations)")
+        update_obs_archive(input_variable, stations, end_date)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,70 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Input: end date (YYMMDD), variables (optional, all of them if left out)
+    variable options: SFCTC, SFCWSPD, PCPTOT, PCPT6, PCPT24
+
+Runs the quality control checks in utl/qc.py (physical bounds, spikes, stuck sensors and steps) on the obs that
+came in since the last run, for every station in the station list at once, and saves the flags to the flag
+table. Any new obs up to the end date are added to the obs archive first. Only the hours after the last obs that
+was checked at each station get checked (plus the hours before them that the new obs can change), so this can be
+run every day. The leaderboards read the flags from the table instead of going through the history again.
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from utl.obs_archive import update_obs_archive
+from utl.qc import update_flag_table
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#description file for stations
+station_file = '/home/verif/verif-post-process/input/station_list_master.txt'
+
+###########################################################
+### -------------------- INPUT ----------------------------
+###########################################################
+
+variables = ['SFCTC', 'SFCWSPD', 'PCPTOT', 'PCPT6', 'PCPT24']
+
+if len(sys.argv) >= 2:
+    end_date = str(sys.argv[1])    #input date YYMMDD
+
+    if len(sys.argv) > 2:
+        input_variables = sys.argv[2:]
+        for input_variable in input_variables:
+            if input_variable not in variables:
+                raise Exception("Invalid variable input entries. Current options: SFCTC, SFCWSPD, PCPTOT, PCPT6, PCPT24. Case sensitive.")
+    else:
+        input_variables = variables
+
+else:
+    raise Exception("Invalid input entries. Needs a YYMMDD entry for the end date (and optionally variable names)")
+
+station_df = pd.read_csv(station_file)
+
+###########################################################
+### -------------------- MAIN FUNCTION --------------------
+###########################################################
+
+def main(args):
+
+    for input_variable in input_variables:
+        stations = np.array(station_df.query(input_variable+"==1")["Station ID"],dtype='str')
+        stations = [station if len(station) >= 4 else "0" + station for station in stations]
+
+        print("Now on.. " + input_variable + " (" + str(len(stations)) + " stations)")
+        update_obs_archive(input_variable, stations, end_date)
+
+        t = time.time()
+        num_hours, num_flags = update_flag_table(input_variable, stations, end_date)
+        print("    checked " + str(num_hours) + " hours, " + str(num_flags) + " flags saved (%.1f s)" % (time.time() - t))
+
+if __name__ == "__main__":
+    main(sys.argv)
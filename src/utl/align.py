@@ -0,0 +1,101 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Lines the obs and fcst rows up in time without any dataframes or joins. Every row is turned into an integer
+slot with numpy arithmetic and the values are scattered into preallocated NaN arrays, so missing rows just
+stay NaN:
+    - obs (Date, Time) -> hour slot, where slot 0 is 00 UTC on the start date
+    - fcst (Date, Offset) -> (init date, lead hour)
+
+The dates in a date range are only worked out once (date_lookup is cached), after that each file's dates
+are found with a binary search.
+"""
+import numpy as np
+from functools import lru_cache
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# converts YYYYMMDD integers to numpy dates without going through strings
+def to_datetime64(dates):
+
+    dates = np.asarray(dates, dtype=np.int64)
+
+    years = (dates // 10000 - 1970).astype('datetime64[Y]')
+    months = years.astype('datetime64[M]') + (dates // 100 % 100 - 1)
+
+    return(months.astype('datetime64[D]') + (dates % 100 - 1))
+
+# number of days from start_date (YYMMDD) to each YYYYMMDD date
+def days_since(dates, start_date):
+
+    start = to_datetime64(int("20" + str(start_date)))
+
+    return((to_datetime64(dates) - start).astype(np.int64))
+
+# the YYYYMMDD dates from start_date (YYMMDD) for num_days, made once for each date range
+@lru_cache(maxsize=64)
+def date_lookup(start_date, num_days):
+
+    days = to_datetime64(int("20" + str(start_date))) + np.arange(num_days)
+    dates = np.array([str(day).replace('-', '') for day in days], dtype=np.int64)
+    dates.flags.writeable = False
+
+    return(dates)
+
+# day of each YYYYMMDD date in the range (-1 if it's outside of the range)
+def day_slots(dates, start_date, num_days):
+
+    lookup = date_lookup(str(start_date), int(num_days))
+    dates = np.asarray(dates, dtype=np.int64)
+
+    days = np.searchsorted(lookup, dates)
+    inside = days < num_days
+    inside[inside] = lookup[days[inside]] == dates[inside]
+
+    return(np.where(inside, days, -1))
+
+# hour slot of every obs, where slot 0 is 00 UTC on start_date (YYMMDD), -1 if it's outside of the
+# num_days or isn't on the hour (HH30 obs etc can't line up with the fcst)
+def obs_hour_slots(dates, times, start_date, num_days):
+
+    days = day_slots(dates, start_date, num_days)
+    times = np.asarray(times, dtype=np.int64)
+
+    slots = days*24 + times // 100
+    valid = (days >= 0) & (times % 100 == 0) & (times >= 0) & (times <= 2400)
+
+    return(np.where(valid, slots, -1))
+
+# puts vals into an hourly array of length num_hours at the given slots (NaN where there is no data)
+# slots outside of the array are dropped
+def fill_hourly(slots, vals, num_hours):
+
+    hourly = np.full(num_hours, np.nan)
+
+    inside = (slots >= 0) & (slots < num_hours)
+    hourly[slots[inside]] = vals[inside]
+
+    return(hourly)
+
+# hourly obs from 00 UTC on start_date (YYMMDD) for num_days
+def align_obs(dates, times, vals, start_date, num_days):
+
+    return(fill_hourly(obs_hour_slots(dates, times, start_date, num_days), vals, num_days*24))
+
+# (init date, lead hour) fcst for the num_days init dates from start_date (YYMMDD)
+def align_fcst(dates, offsets, vals, start_date, num_days, lead_hours):
+
+    days = day_slots(dates, start_date, num_days)
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    inside = (days >= 0) & (offsets >= 0) & (offsets < lead_hours)
+
+    fcst = np.full((num_days, lead_hours), np.nan)
+    fcst[days[inside], offsets[inside]] = vals[inside]
+
+    return(fcst)
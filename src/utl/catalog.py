@@ -0,0 +1,180 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Catalog of the station sqlite files in /verification/Forecasts/ and /verification/Observations/. Every file
+gets one row with its first and last date, number of dates, number of rows and mtime, so the checks that
+used to query every file (check_dates) or list whole folders (check_data_exists) are one lookup.
+
+A file is only queried again when its mtime changes. The catalog is only written by update-catalog.py (which
+makes the table the first time), the lookups from the runs go through one read only connection for each
+process. A lookup that finds the file has changed since it was catalogued queries the file on its own
+connection and leaves the catalog row for the next refresh.
+"""
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#location where obs files are (all sql databases should be in this directory)
+obs_filepath = "/verification/Observations/"
+
+#location where forecast files are (immediately within this directory should be model folders, then grid folders, then the sql databases)
+fcst_filepath = "/verification/Forecasts/"
+
+#the catalog database
+catalog_file = "/verification/Cache/catalog.sqlite"
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# read only catalog connection and its lock for each process, keyed by pid (a forked worker opens its own)
+_read_connections = {}
+
+# connection for writing the catalog (makes the table if it isn't there yet), only used by refresh_catalog
+def connect_catalog():
+
+    if not os.path.isdir(os.path.dirname(catalog_file)):
+        os.makedirs(os.path.dirname(catalog_file))
+
+    sql_con = sqlite3.connect(catalog_file, timeout=60)
+    sql_con.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, folder TEXT, variable TEXT, station TEXT, \
+                     min_date INTEGER, max_date INTEGER, num_dates INTEGER, num_rows INTEGER, mtime REAL)")
+    sql_con.execute("CREATE INDEX IF NOT EXISTS files_station ON files (station, variable)")
+
+    return(sql_con)
+
+# runs the query on the read only catalog connection for this process and returns all the rows
+# returns None if the catalog hasn't been made yet
+def query_catalog(sql_query, params=()):
+
+    pid = os.getpid()
+    if pid not in _read_connections:
+        if not os.path.isfile(catalog_file):
+            return(None)
+
+        sql_con = sqlite3.connect("file:" + quote(catalog_file) + "?mode=ro", uri=True, check_same_thread=False, timeout=60)
+        _read_connections.setdefault(pid, (sql_con, threading.Lock()))
+
+    sql_con, lock = _read_connections[pid]
+    with lock:
+        return(sql_con.execute(sql_query, params).fetchall())
+
+# variable and station for a station sqlite file
+#   /verification/Forecasts/<model>/<grid>/<variable>/fcst.t/<station>.sqlite (ENS has no grid folder)
+#   /verification/Observations/<variable>/<station>.sqlite
+def parse_path(path):
+
+    folders = path.split('/')
+    station = folders[-1][:-len(".sqlite")]
+
+    if path.startswith(obs_filepath):
+        variable = folders[-2]
+    else:
+        variable = folders[-3]
+
+    return(variable, station)
+
+# queries the file for its first/last date, number of dates and rows
+# uses its own connection, so a shared one (utl/sql_pool.py) that another thread is using is never closed
+def query_file_info(path):
+
+    sql_con = sqlite3.connect("file:" + quote(path) + "?mode=ro", uri=True, timeout=60)
+    # rows for each date (GROUP BY can use the (Date, ...) covering index from maintain-indexes.py)
+    rows = sql_con.execute("SELECT Date, COUNT(*) from 'All' GROUP BY Date").fetchall()
+    sql_con.close()
+
+    if len(rows) > 0:
+        return({'min_date': rows[0][0], 'max_date': rows[-1][0], 'num_dates': len(rows), 'num_rows': sum(row[1] for row in rows)})
+
+    return({'min_date': None, 'max_date': None, 'num_dates': 0, 'num_rows': 0})
+
+# scans the folders and catalogs any files that are new or have changed, removes files that are gone
+def refresh_catalog(filepaths=[fcst_filepath, obs_filepath]):
+
+    sql_con = connect_catalog()
+    catalogued = dict(sql_con.execute("SELECT path, mtime FROM files").fetchall())
+
+    num_updated = 0
+    found = set()
+    for filepath in filepaths:
+        for folder, _, files in os.walk(filepath):
+            # rows for the files in the folder that are new or have changed, written all at once
+            new_rows = []
+            for name in files:
+                if not name.endswith(".sqlite"):
+                    continue
+
+                path = os.path.join(folder, name)
+                mtime = os.path.getmtime(path)
+                found.add(path)
+
+                if catalogued.get(path) != mtime:
+                    info = query_file_info(path)
+                    variable, station = parse_path(path)
+                    new_rows.append((path, os.path.dirname(path) + '/', variable, station, info['min_date'], info['max_date'], \
+                                     info['num_dates'], info['num_rows'], mtime))
+
+            sql_con.executemany("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?,?)", new_rows)
+            sql_con.commit()
+            num_updated = num_updated + len(new_rows)
+
+    removed = [path for path in catalogued if path not in found and any(path.startswith(filepath) for filepath in filepaths)]
+    sql_con.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+    sql_con.commit()
+    sql_con.close()
+
+    return(num_updated, len(removed))
+
+# first/last date, number of dates and rows for the file (None if it doesn't exist)
+def file_info(path):
+
+    if not os.path.isfile(path):
+        return(None)
+
+    mtime = os.path.getmtime(path)
+    rows = query_catalog("SELECT min_date, max_date, num_dates, num_rows, mtime FROM files WHERE path = ?", (path,))
+
+    # not catalogued or changed since, read from the file until the next refresh
+    if rows is None or len(rows) == 0 or rows[0][4] != mtime:
+        return(query_file_info(path))
+
+    return({'min_date': rows[0][0], 'max_date': rows[0][1], 'num_dates': rows[0][2], 'num_rows': rows[0][3]})
+
+# whether there are any files for the station/variable under filepath
+# returns None if nothing under filepath has been catalogued (so the caller can look for itself)
+def has_station_files(filepath, station, variable):
+
+    # every path that starts with filepath (a range on the primary key instead of a LIKE)
+    upper = filepath[:-1] + chr(ord(filepath[-1]) + 1)
+    rows = query_catalog("SELECT 1 FROM files WHERE path >= ? AND path < ? LIMIT 1", (filepath, upper))
+    if rows is None or len(rows) == 0:
+        return(None)
+
+    found = query_catalog("SELECT 1 FROM files WHERE station = ? AND variable = ? AND path >= ? AND path < ? LIMIT 1", \
+                          (station, variable, filepath, upper))
+
+    return(len(found) > 0)
+
+# newest mtime of the catalogued files under filepath (None if nothing under it has been catalogued)
+def newest_mtime(filepath):
+
+    upper = filepath[:-1] + chr(ord(filepath[-1]) + 1)
+    rows = query_catalog("SELECT MAX(mtime) FROM files WHERE path >= ? AND path < ?", (filepath, upper))
+
+    return(None if rows is None else rows[0][0])
+
+# number of dates and rows for each catalogued station file under filepath ({station: (num_dates, num_rows)})
+def station_rows(filepath):
+
+    upper = filepath[:-1] + chr(ord(filepath[-1]) + 1)
+    rows = query_catalog("SELECT station, num_dates, num_rows FROM files WHERE path >= ? AND path < ?", (filepath, upper))
+
+    return({} if rows is None else {row[0]: (row[1], row[2]) for row in rows})
@@ -0,0 +1,138 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Climatological precip thresholds for each station and month, so the heavy precip category in the categorical
+stats (utl/funcs2.py) is the same from week to week and model to model instead of the percentile of each
+window's obs. update-climatology.py goes through the obs archive (utl/obs_archive.py) one month at a time and
+counts every station's obs in tenths for each calendar month (histograms), then the percentiles are worked out
+from the counts. This gives the same value as np.percentile on all the obs (rounded to one decimal) without
+ever holding more than one month of them.
+
+The thresholds are saved in a small sqlite table and read into a dictionary once per process (again only if
+the file changes), so looking up a station/month during a run is a dictionary lookup.
+"""
+import os
+import time
+import sqlite3
+import numpy as np
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#the climatology database
+climatology_file = "/verification/Cache/climatology.sqlite"
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# largest value counted (in tenths), anything above goes in the last bin. precip over 250 mm is already
+# removed as erroneous in get_obs_hourly
+max_tenths = 2500
+
+# stations need at least this many obs in a month for a threshold
+min_count = 100
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# thresholds read this process ({(variable, percentile): (mtime of the file, {(station, month): threshold})})
+_loaded = {}
+
+def connect_climatology():
+
+    if not os.path.isdir(os.path.dirname(climatology_file)):
+        os.makedirs(os.path.dirname(climatology_file))
+
+    sql_con = sqlite3.connect(climatology_file, timeout=60)
+    sql_con.execute("CREATE TABLE IF NOT EXISTS climatology (variable, station, month, percentile, threshold, count, saved, \
+                     PRIMARY KEY (variable, station, month, percentile))")
+
+    return(sql_con)
+
+# empty (station, month, tenths) counts
+def new_histograms(num_stations):
+
+    return(np.zeros((num_stations, 12, max_tenths+1), dtype=np.int64))
+
+# adds the obs (station x hour, NaN where missing) for one month to the counts. rows is the histogram row of each
+# station, month is 1-12
+def add_to_histograms(histograms, rows, obs, month):
+
+    rows = np.asarray(rows, dtype=np.int64)
+    valid = ~np.isnan(obs)
+
+    tenths = np.clip(np.round(obs[valid]*10), 0, max_tenths).astype(np.int64)
+    row_index = np.broadcast_to(rows[:,None], np.shape(obs))[valid]
+
+    num_stations = len(histograms)
+    histograms[:, month-1] += np.bincount(row_index*(max_tenths+1) + tenths, minlength=num_stations*(max_tenths+1)).reshape(num_stations, max_tenths+1)
+
+# (station, month) percentile of the counted values and the number of values (NaN where there are none), same as
+# np.percentile (linear between the two closest values)
+def histogram_percentile(histograms, percentile):
+
+    cumulative = np.cumsum(histograms, axis=-1)
+    count = cumulative[..., -1]
+
+    position = percentile/100*(count - 1)
+    lower, upper = np.floor(position), np.ceil(position)
+
+    # the value at a position in the sorted values is the first bin that has more values before it
+    lower_value = np.sum(cumulative <= lower[..., None], axis=-1)
+    upper_value = np.sum(cumulative <= upper[..., None], axis=-1)
+
+    threshold = (lower_value + (position - lower)*(upper_value - lower_value))/10
+
+    return(np.where(count > 0, threshold, np.nan), count)
+
+# saves (or replaces) the thresholds for every station and month. thresholds and counts are (station, month)
+def save_climatology(variable, percentile, stations, thresholds, counts):
+
+    rows = []
+    for i, station in enumerate(stations):
+        for month in range(12):
+            if counts[i, month] > 0:
+                rows.append((variable, station, month+1, percentile, float(thresholds[i, month]), int(counts[i, month]), time.time()))
+
+    sql_con = connect_climatology()
+    sql_con.executemany("INSERT OR REPLACE INTO climatology VALUES (?,?,?,?,?,?,?)", rows)
+    sql_con.commit()
+    sql_con.close()
+
+    return(len(rows))
+
+# {(station, month): threshold} for the variable and percentile (only ones with enough obs), empty if there is no
+# climatology yet
+def read_climatology(variable, percentile):
+
+    if not os.path.isfile(climatology_file):
+        return({})
+
+    mtime = os.path.getmtime(climatology_file)
+    key = (variable, percentile)
+    if key not in _loaded or _loaded[key][0] != mtime:
+        sql_con = sqlite3.connect(climatology_file, timeout=60)
+        rows = sql_con.execute("SELECT station, month, threshold FROM climatology WHERE variable = ? AND percentile = ? AND count >= ?", \
+                               (variable, percentile, min_count)).fetchall()
+        sql_con.close()
+
+        _loaded[key] = (mtime, {(station, month): threshold for station, month, threshold in rows})
+
+    return(_loaded[key][1])
+
+# average of the stations' thresholds for the month (1-12), NaN if none of the stations have one
+def climatological_threshold(variable, percentile, stations, month):
+
+    climatology = read_climatology(variable, percentile)
+    thresholds = [climatology[(station, month)] for station in stations if (station, month) in climatology]
+
+    if len(thresholds) == 0:
+        return(np.nan)
+
+    return(float(np.mean(thresholds)))
@@ -0,0 +1,186 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+The categorical stats for many sets of fcst/obs pairs at once. fcst and obs are (rows, samples) arrays, one row
+for each model/time window etc, with NaN wherever there isn't a pair (rows with fewer pairs are padded with NaN).
+Each value is put in a category (0 below the lower threshold, 1 between the thresholds, 2 above the upper one, so
+dry/light/heavy precip or calm/light/strong wind) and the 3x3 contingency table of every row is counted with one
+np.bincount.
+
+The 2x2 stats are the same as get_statistics in utl/funcs2.py always worked them out: any fcst that isn't 0 is a
+"yes" forecast and it's only a hit if the category is right. Values that are exactly on a threshold (or a pair
+with no obs) don't have a category, so they're never a hit. They're kept in a 4th row/column of the tables for
+this (NO_CATEGORY) but left out of the multi-category HSS and Gerrity score, which only use the 3x3 table.
+
+threshold_metrics does the 2x2 table ("value >= threshold" for both the fcst and obs) of every row for a whole
+list of thresholds at once, for the ROC (POD against POFD) and performance diagram (POD against success ratio,
+with the CSI and frequency bias). The fcst, obs and the smaller of each pair are sorted once and the number at or
+above each threshold is counted from where the threshold falls in them (a pair is a hit when the smaller of the
+two is at or above the threshold).
+"""
+import numpy as np
+import warnings
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+num_categories = 3
+
+# category for values that are on a threshold or missing
+NO_CATEGORY = num_categories
+
+# stats returned by categorical_metrics
+metric_names = ['count', 'TN', 'FN', 'FP', 'TP', 'POD', 'POFD', 'PSS', 'HSS', 'CSI', 'GSS', 'multi_HSS', 'Gerrity']
+
+# stats returned by threshold_metrics
+threshold_names = ['count', 'hits', 'misses', 'false_alarms', 'correct_negatives', 'POD', 'POFD', 'SR', 'CSI', 'bias']
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# category of every value (lower and upper are the thresholds for each row). a value on a threshold doesn't
+# have a category, except when the upper threshold is below the lower one (then anything above the lower one is 2)
+def categorize(values, lower, upper):
+
+    lower = np.asarray(lower, dtype=np.float64)[:,None]
+    upper = np.asarray(upper, dtype=np.float64)[:,None]
+
+    # same as np.digitize with the bins [lower, max(lower, upper)] for each row
+    categories = (values >= lower).astype(np.int64) + (values >= np.maximum(lower, upper))
+
+    on_threshold = ((values == lower) & (upper >= lower)) | ((values == upper) & (upper > lower))
+
+    # with no upper threshold only category 0 is left
+    no_upper = np.isnan(upper) & (values >= lower)
+
+    categories[np.isnan(values) | on_threshold | no_upper] = NO_CATEGORY
+
+    return(categories)
+
+# (rows, 4, 4) counts of every (obs category, fcst category) for the pairs in each row (pairs with a fcst, the
+# last row/column is NO_CATEGORY)
+def contingency_tables(fcst, obs, lower, upper):
+
+    num_rows = len(fcst)
+    size = num_categories + 1
+
+    valid = ~np.isnan(fcst)
+    index = np.arange(num_rows)[:,None]*size*size + categorize(obs, lower, upper)*size + categorize(fcst, lower, upper)
+
+    return(np.bincount(index[valid], minlength=num_rows*size*size).reshape(num_rows, size, size))
+
+# the Gerrity scoring matrix for each row, from the obs frequency of each category (rows, 3)
+def gerrity_weights(obs_freq):
+
+    # odds of each of the first K-1 categories (or lower) not happening
+    cumulative = np.cumsum(obs_freq, axis=1)[:,:-1]
+    odds = (1 - cumulative)/cumulative
+
+    weights = np.zeros((len(obs_freq), num_categories, num_categories))
+    for i in range(num_categories):
+        for j in range(i, num_categories):
+            weights[:,i,j] = (np.sum(1/odds[:,:i], axis=1) - (j-i) + np.sum(odds[:,j:], axis=1))/(num_categories-1)
+            weights[:,j,i] = weights[:,i,j]
+
+    return(weights)
+
+# {stat: array with one value for each row} for the metric_names, from the contingency_tables
+def table_metrics(tables):
+
+    size = num_categories + 1
+    obs_category, fcst_category = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+    hit = (obs_category == fcst_category) & (obs_category != NO_CATEGORY)
+
+    TN = tables[:,0,0]
+    TP = np.sum(tables*(hit & (obs_category != 0)), axis=(1,2))
+    FN = np.sum(tables*(~hit & (fcst_category == 0)), axis=(1,2))
+    FP = np.sum(tables*(~hit & (fcst_category != 0)), axis=(1,2))
+    N = np.sum(tables, axis=(1,2))
+
+    # rows with no pairs (or no events) give NaN instead of a warning
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        metrics = {'count': N, 'TN': TN, 'FN': FN, 'FP': FP, 'TP': TP}
+
+        metrics['POD'] = TP/(TP+FN)
+        metrics['POFD'] = FP/(TN+FP)
+        metrics['PSS'] = (TP/(TP+FN)) - (FP/(FP+TN))
+        metrics['HSS'] = metrics['POD'] - metrics['POFD']
+        metrics['CSI'] = TP/(TP + FP + FN)
+
+        C = (TP + FP)*(TP + FN)/N
+        metrics['GSS'] = (TP - C)/(TP + FP + FN - C)
+
+        # the multi-category scores only use the pairs that both have a category
+        table = tables[:,:num_categories,:num_categories]
+        freq = table/np.sum(table, axis=(1,2))[:,None,None]
+        obs_freq, fcst_freq = np.sum(freq, axis=2), np.sum(freq, axis=1)
+
+        chance = np.sum(obs_freq*fcst_freq, axis=1)
+        metrics['multi_HSS'] = (np.trace(freq, axis1=1, axis2=2) - chance)/(1 - chance)
+        metrics['Gerrity'] = np.sum(freq*gerrity_weights(obs_freq), axis=(1,2))
+
+    return(metrics)
+
+# {stat: array with one value for each row} for the metric_names (NaN for rows with no pairs)
+def categorical_metrics(fcst, obs, lower, upper):
+
+    fcst = np.atleast_2d(np.asarray(fcst, dtype=np.float64))
+    obs = np.atleast_2d(np.asarray(obs, dtype=np.float64))
+
+    return(table_metrics(contingency_tables(fcst, obs, lower, upper)))
+
+# (rows, thresholds) number of valid values in each row that are at or above each threshold. every value is
+# swapped for its position among all the values and thresholds, so the rows can be told apart exactly and all
+# sorted at once
+def count_at_or_above(values, valid, thresholds):
+
+    num_rows = len(values)
+
+    levels = np.unique(np.concatenate([values[valid], thresholds]))
+    num_levels = len(levels)
+
+    row_index = np.broadcast_to(np.arange(num_rows)[:,None], np.shape(values))
+    keys = np.sort(row_index[valid]*num_levels + np.searchsorted(levels, values[valid]))
+
+    # where each row ends in the sorted keys, and where each threshold falls in its row
+    row_end = np.cumsum(np.sum(valid, axis=1))
+    threshold_keys = np.arange(num_rows)[:,None]*num_levels + np.searchsorted(levels, thresholds)[None,:]
+
+    return(row_end[:,None] - np.searchsorted(keys, threshold_keys, side='left'))
+
+# {stat: (rows, thresholds) array} for the threshold_names, the 2x2 table for "value >= threshold" at every
+# threshold (NaN for rows with no pairs, or no events for the stats that need them)
+def threshold_metrics(fcst, obs, thresholds):
+
+    fcst = np.atleast_2d(np.asarray(fcst, dtype=np.float64))
+    obs = np.atleast_2d(np.asarray(obs, dtype=np.float64))
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+
+    valid = ~np.isnan(fcst) & ~np.isnan(obs)
+    count = np.broadcast_to(np.sum(valid, axis=1)[:,None], (len(fcst), len(thresholds)))
+
+    fcst_yes = count_at_or_above(fcst, valid, thresholds)
+    obs_yes = count_at_or_above(obs, valid, thresholds)
+    hits = count_at_or_above(np.fmin(fcst, obs), valid, thresholds)
+
+    metrics = {'count': count, 'hits': hits, 'misses': obs_yes - hits, 'false_alarms': fcst_yes - hits}
+    metrics['correct_negatives'] = count - obs_yes - metrics['false_alarms']
+
+    # thresholds with no events (or no pairs) give NaN instead of a warning
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        metrics['POD'] = hits/obs_yes
+        metrics['POFD'] = metrics['false_alarms']/(count - obs_yes)
+        metrics['SR'] = hits/fcst_yes
+        metrics['CSI'] = hits/(obs_yes + metrics['false_alarms'])
+        metrics['bias'] = np.where(obs_yes > 0, fcst_yes/obs_yes, np.nan)
+
+    return(metrics)
@@ -0,0 +1,262 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+On disk forecast cubes, one for each model/grid/variable folder in /verification/Forecasts/. Each cube is a
+float32 .npy file laid out as (station, init date, lead hour) that is memory mapped when read, plus an
+index.json sidecar with the name of the cube file, the first init date, the number of init dates the file has
+room for, and the row, a bitmap of the ingested init dates and the mtime of the sqlite file for every station.
+
+New init dates are read from the station sqlite files and written into the spare room at the end of the file,
+the file is only rewritten when it runs out of room (it doubles) or a new station is added. A rewritten cube
+gets a new file name, so a reader always opens the cube that its index was written for. The -999 missing
+values are turned into NaNs when they are ingested so the readers never see them.
+
+An init date is only marked as ingested once the sqlite file has rows for it and it is older than the
+collection lag (the same 8 days as needed_date in the leaderboard scripts), so dates that haven't all come in
+yet (or were skipped over by an earlier run) get read again the next time they are asked for. When a station's
+sqlite file changes, all of its dates are unmarked and read again as they are asked for, and the readers go to
+the sqlite file for that station until then.
+"""
+import os
+import json
+import fcntl
+import datetime
+import numpy as np
+from utl.sql_reader import read_fcst
+from utl.align import days_since, day_slots, date_lookup
+from utl.obs_cube import lead_hours
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#location where forecast files are (immediately within this directory should be model folders, then grid folders, then the sql databases)
+fcst_filepath = "/verification/Forecasts/"
+
+#location of the cubes (same folder layout as fcst_filepath)
+cache_filepath = "/verification/Cache/Forecasts/"
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# number of init dates to leave room for when making a new cube
+min_capacity = 64
+
+# fcst are saved with two decimals, used to undo the float32 rounding
+fcst_decimals = 2
+
+# init dates newer than this many days ago can still be getting collected, so they're never marked as ingested
+collection_days = 8
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# open cubes for this process, keyed by folder (reloaded if the index changes)
+_open_cubes = {}
+
+# cache folder for the given fcst folder (/verification/Forecasts/WRF3GFS/g2/SFCTC/fcst.t/ etc)
+def cache_folder(filepath):
+
+    return(cache_filepath + os.path.relpath(filepath, fcst_filepath) + '/')
+
+# last init date (YYYYMMDD) that is done being collected
+def last_complete_date():
+
+    #subtract 6 to match boreas time, same as the leaderboard scripts
+    today = datetime.datetime.now() - datetime.timedelta(hours=6)
+
+    return(int((today - datetime.timedelta(days=collection_days)).strftime("%Y%m%d")))
+
+# name of the cube file for the index (indexes from before it was saved always used fcst.npy)
+def cube_name(index):
+
+    return(index.get('cube', 'fcst.npy'))
+
+def read_index(folder):
+
+    if not os.path.isfile(folder + 'index.json'):
+        return(None)
+
+    with open(folder + 'index.json') as f:
+        return(json.load(f))
+
+# bool array of the init dates (from the first date of the cube) that have been read for the station
+# (indexes from before the bitmap was saved have none, so everything is read again once)
+def ingested_days(entry, capacity):
+
+    days = np.zeros(capacity, dtype=bool)
+    bits = np.unpackbits(np.frombuffer(bytes.fromhex(entry.get('ingested', '')), dtype=np.uint8)).astype(bool)
+    days[:min(capacity, len(bits))] = bits[:capacity]
+
+    return(days)
+
+def set_ingested_days(entry, days):
+
+    entry['ingested'] = np.packbits(days).tobytes().hex()
+
+# groups the sorted day numbers into (first, last) runs of consecutive days
+def day_runs(days):
+
+    splits = np.flatnonzero(np.diff(days) != 1) + 1
+
+    return([(run[0], run[-1]) for run in np.split(days, splits) if len(run) > 0])
+
+# writes the index to a temp file first so readers never see a half written file
+def write_index(folder, index):
+
+    with open(folder + 'index.json.tmp', 'w') as f:
+        json.dump(index, f)
+
+    os.replace(folder + 'index.json.tmp', folder + 'index.json')
+
+# makes a new (bigger) cube starting at first_date (YYMMDD) and copies over anything in the old one
+# the new cube is written under its own name before the index points to it, then the old one is removed
+def resize_cube(folder, index, first_date, capacity, stations):
+
+    # every resize changes the first date, capacity or number of stations, so the name is always new
+    new_index = {'cube': 'fcst_' + first_date + '_' + str(capacity) + '_' + str(len(stations)) + '.npy', \
+                 'first_date': first_date, 'capacity': capacity, 'stations': {}}
+    for station in stations:
+        new_index['stations'][station] = {'row': len(new_index['stations'])}
+        set_ingested_days(new_index['stations'][station], np.zeros(capacity, dtype=bool))
+
+    cube = np.lib.format.open_memmap(folder + cube_name(new_index) + '.tmp', mode='w+', dtype=np.float32, shape=(len(stations), capacity, lead_hours))
+    cube[:] = np.nan
+
+    if index is not None:
+        old_cube = np.load(folder + cube_name(index), mmap_mode='r')
+        shift = int(days_since(int("20" + index['first_date']), first_date))
+
+        for station in index['stations']:
+            old = index['stations'][station]
+            days = np.zeros(capacity, dtype=bool)
+            days[shift:shift+index['capacity']] = ingested_days(old, index['capacity'])
+            set_ingested_days(new_index['stations'][station], days)
+            if 'mtime' in old:
+                new_index['stations'][station]['mtime'] = old['mtime']
+            cube[new_index['stations'][station]['row'], shift:shift+index['capacity']] = old_cube[old['row']]
+
+        del old_cube
+
+    cube.flush()
+    del cube
+
+    os.replace(folder + cube_name(new_index) + '.tmp', folder + cube_name(new_index))
+    write_index(folder, new_index)
+
+    # readers that already have the old cube open keep their memory map
+    if index is not None and os.path.isfile(folder + cube_name(index)):
+        os.remove(folder + cube_name(index))
+
+    return(new_index)
+
+# reads any init dates in date_list (YYMMDD) that aren't in the cube yet for the given stations
+def update_fcst_cache(filepath, stations, date_list):
+
+    folder = cache_folder(filepath)
+    if not os.path.isdir(folder):
+        os.makedirs(folder, exist_ok=True) # another worker process might make it first
+
+    # one writer at a time for each cube
+    lock = open(folder + '.lock', 'w')
+    fcntl.flock(lock, fcntl.LOCK_EX)
+
+    try:
+        index = read_index(folder)
+
+        first_date = date_list[0] if index is None else min(index['first_date'], date_list[0])
+        num_days = int(days_since(int("20" + date_list[-1]), first_date)) + 1
+        all_stations = [] if index is None else list(index['stations'])
+        all_stations = all_stations + [station for station in stations if station not in all_stations]
+
+        if index is None or first_date != index['first_date'] or num_days > index['capacity'] or len(all_stations) > len(index['stations']):
+            capacity = max(min_capacity, num_days)
+            if index is not None:
+                shift = int(days_since(int("20" + index['first_date']), first_date))
+                capacity = max(capacity, 2*index['capacity'], shift + index['capacity'])
+            index = resize_cube(folder, index, first_date, capacity, all_stations)
+
+        cube = np.load(folder + cube_name(index), mmap_mode='r+')
+        day1 = int(days_since(int("20" + date_list[0]), first_date))
+        requested = np.arange(day1, day1 + len(date_list))
+        dates = date_lookup(first_date, index['capacity'])
+        complete_date = last_complete_date()
+
+        for station in stations:
+            entry = index['stations'][station]
+            sql_path = filepath + station + ".sqlite"
+            if not os.path.isfile(sql_path):
+                continue
+
+            # taken before reading, so rows added while it's being read get picked up next time
+            mtime = os.path.getmtime(sql_path)
+            ingested = ingested_days(entry, index['capacity'])
+            if entry.get('mtime') != mtime:
+                ingested[:] = False
+
+            # every requested init date that hasn't been read yet, including any gaps left by earlier runs
+            for start, end in day_runs(requested[~ingested[requested]]):
+                fcst_dates, offsets, vals = read_fcst(sql_path, int(dates[start]), int(dates[end]))
+                vals[vals == -999] = np.nan
+
+                days = day_slots(fcst_dates, first_date, index['capacity'])
+                inside = (days >= 0) & (offsets >= 0) & (offsets < lead_hours)
+                cube[entry['row'], start:end+1] = np.nan
+                cube[entry['row'], days[inside], offsets[inside]] = vals[inside]
+
+                # only mark dates that have data and are done being collected, the rest get read next time
+                ingested[days[(days >= 0) & (fcst_dates <= complete_date)]] = True
+
+            set_ingested_days(entry, ingested)
+            entry['mtime'] = mtime
+
+        cube.flush()
+        del cube
+        write_index(folder, index)
+
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+# returns the (init date, lead hour) fcst for the station from the cube, or None if the cube doesn't have
+# every init date in date_list (YYMMDD) yet or the station's sqlite file has changed since it was read
+def read_fcst_cache(filepath, station, date_list):
+
+    folder = cache_folder(filepath)
+    if not os.path.isfile(folder + 'index.json'):
+        return(None)
+
+    mtime = os.path.getmtime(folder + 'index.json')
+    if folder not in _open_cubes or _open_cubes[folder][0] != mtime:
+        index = read_index(folder)
+        try:
+            _open_cubes[folder] = (mtime, index, np.load(folder + cube_name(index), mmap_mode='r'))
+        except FileNotFoundError:
+            return(None) # resized since the index was read, it's picked up on the next call
+
+    _, index, cube = _open_cubes[folder]
+
+    # the cube has to be laid out the way the index says
+    if np.shape(cube) != (len(index['stations']), index['capacity'], lead_hours):
+        return(None)
+
+    if station not in index['stations'] or not os.path.isfile(filepath + station + ".sqlite"):
+        return(None)
+
+    if index['stations'][station].get('mtime') != os.path.getmtime(filepath + station + ".sqlite"):
+        return(None)
+
+    day1 = int(days_since(int("20" + date_list[0]), index['first_date']))
+    if day1 < 0 or day1 + len(date_list) > index['capacity']:
+        return(None)
+
+    entry = index['stations'][station]
+    if not ingested_days(entry, index['capacity'])[day1:day1+len(date_list)].all():
+        return(None)
+
+    return(np.round(np.array(cube[entry['row'], day1:day1+len(date_list)], dtype=np.float64), fcst_decimals))
@@ -20,6 +20,18 @@ from sklearn.metrics import mean_absolute_error
 from scipy import stats
 import sqlite3
 from utl.funcs import *
+from utl.sql_reader import read_obs, read_fcst
+from utl.align import align_obs, align_fcst
+from utl.obs_cube import lead_hours, make_obs_cube, accumulate
+from utl.fcst_cache import update_fcst_cache, read_fcst_cache
+from utl.obs_archive import update_obs_archive, read_obs_archive
+from utl.qc import qc_flags, read_qc_flags, remove_flagged, BOUNDS
+from utl.catalog import file_info
+from utl.results_store import save_results, saved_keys, save_lead_curve, export_textfiles
+from utl.stats_store import save_daily_stats
+from utl.lead_stats import get_time_domains, station_leads, lead_range, model_windows, lead_sums, window_metrics, lead_curve
+from utl.sql_pool import print_query_times, forget_connections
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 warnings.filterwarnings("ignore",category=RuntimeWarning)
 
@@ -49,11 +61,34 @@ wm = 'a'
 ### -------------------- INPUTS -- ------------------------
 ###########################################################
 
-# thresholds for discluding erroneous data 
-precip_threshold = 250 #recorded at Buffalo Gap 1961 https://www.canada.ca/en/environment-climate-change/services/water-overview/quantity/floods/events-prairie-provinces.html
-wind_threshold = 400 #recorded Edmonton, AB 1987 http://wayback.archive-it.org/7084/20170925152846/https://www.ec.gc.ca/meteo-weather/default.asp?lang=En&n=6A4A3AC5-1#tab5
-temp_min = -63 #recorded in Snag, YT 1947 http://wayback.archive-it.org/7084/20170925152846/https://www.ec.gc.ca/meteo-weather/default.asp?lang=En&n=6A4A3AC5-1#tab5
-temp_max = 49.6 #recorded in Lytton, BC 2021 https://www.canada.ca/en/environment-climate-change/services/top-ten-weather-stories/2021.html#toc2
+# quality control checks that take obs out (see utl/qc.py, e.g. BOUNDS | SPIKE | FLATLINE). only the physical
+# bounds (higher than the verified records for Canada) so the stats match the ones already published
+obs_checks = BOUNDS
+
+# read the fcst from the memory mapped cubes in utl/fcst_cache.py instead of the sqlite files
+# (any init dates that aren't in the cubes yet get added at the start of get_rankings)
+use_fcst_cache = True
+
+# read the obs from the archive in utl/obs_archive.py instead of the sqlite files
+# (any days that aren't in the archive yet get added at the start of get_obs_hourly)
+use_obs_archive = True
+
+# number of stations to read at once in get_rankings (1 reads them one at a time)
+station_workers = 16
+
+# save the stats for every init date to the store in utl/stats_store.py (so any date range can be put together later)
+use_stats_store = True
+
+###########################################################
+### ----------------- WORKER PROCESSES --------------------
+###########################################################
+
+# obs for the worker processes, set once in each process by the Pool initializer (with fork it's inherited
+# instead of pickled for every model/grid)
+shared_obs = None
+
+# stats files a worker process would have written (None when the process writes its own files)
+deferred_writes = None
 
 ###########################################################
 ### -------------------- FUNCTIONS ------------------------
@@ -91,9 +126,51 @@ def get_filehours(hour1,hour2):
         else:
             hour = str(i)
         hours_list.append(hour)
-        
+
     return(hours_list)
 
+# folder with the fcst sqlite files for the model/grid/variable, and the gridname used in the station list columns
+def get_filepath(model, grid, input_variable):
+
+    if "_KF" in input_variable:
+       file_var = input_variable[:-3]
+    else:
+        file_var = input_variable
+
+    #ENS only has one grid (and its not saved in a g folder)
+    if model == 'ENS' and '_KF' in input_variable:
+        filepath = fcst_filepath + model + '/' + file_var + '/fcst.KF_MH.t/'
+        gridname = ''
+    elif model == 'ENS':
+        filepath = fcst_filepath + model + '/' + file_var + '/fcst.t/'
+        gridname = ''
+    elif model == "ENS_LR" and "_KF" in input_variable:
+        filepath = fcst_filepath +model[:-3] + '/' + file_var + '/fcst.LR.KF_MH.t/'
+        gridname = ''
+    elif model == "ENS_lr" and "_KF" in input_variable:
+        filepath = fcst_filepath+model[:-3] + '/' + file_var + '/fcst.lr.KF_MH.t/'
+        gridname = ''
+    elif model == "ENS_hr" and "_KF" in input_variable:
+        filepath = fcst_filepath +model[:-3] + '/' + file_var + '/fcst.hr.KF_MH.t/'
+        gridname = ''
+    elif model =="ENS_hr":
+        filepath = fcst_filepath +model[:-3] + '/' + file_var + "/fcst.hr.t/"
+        gridname = ''
+    elif model =="ENS_lr":
+        filepath = fcst_filepath +model[:-3] + '/' + file_var + "/fcst.lr.t/"
+        gridname = ''
+    elif model =="ENS_LR":
+        filepath = fcst_filepath +model[:-3] + '/' + file_var + "/fcst.LR.t/"
+        gridname = ''
+    elif "_KF" in input_variable:
+        filepath = fcst_filepath +model + '/' + grid + '/' + file_var + "/fcst.KF_MH/"
+        gridname = "_" + grid
+    else:
+        filepath = fcst_filepath + model + '/' + grid + '/' + file_var + '/fcst.t/'
+        gridname = "_" + grid
+
+    return(filepath, gridname)
+
 
 def check_variable(variable, station, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24):
 
@@ -136,56 +213,31 @@ def check_dates(start_date, delta, filepath, variable, station):
     if "PCPT" in variable:
         variable = "PCPTOT"
     
-    sql_path = filepath + station + ".sqlite"
-    sql_con = sqlite3.connect(sql_path)
-
-    cursor = sql_con.cursor()
-    cursor.execute("SELECT DISTINCT Date from 'All'")
-    sql_result = cursor.fetchall()
-    sql_result = [x[0] for x in sql_result]
+    # number of dates and first date in the file from the catalog (only queries the file if it has changed)
+    info = file_info(filepath + station + ".sqlite")
     
-    if len(sql_result) < delta+1:
+    if info is None or info['num_dates'] < delta+1:
         print( "  Not enough dates available for this model/station/variable")
         flag = False
-    elif int("20" + start_date) < int(sql_result[0]):
-        print("    Model collection started " + str(sql_result[0]) + ", which is after input start_date")
+    elif int("20" + start_date) < int(info['min_date']):
+        print("    Model collection started " + str(info['min_date']) + ", which is after input start_date")
         flag = False
-    cursor.close()
     
     return(flag)
 
-def make_df(date_list_obs, start_date, end_date):
-    date_list_obs = listofdates(start_date, end_date, obs=True)
-    df_new = pd.DataFrame()
-    for day in date_list_obs:
-        dates = [day] * 24
-        filehours_obs = get_filehours(1, 24)
-        
-        df = pd.DataFrame({'date': dates, 'time': filehours_obs})
-        df['datetime'] = pd.to_datetime(df['date']+' '+df['time'], format = '%y%m%d %H')
-        
-        df_new = pd.concat([df_new, df])
-    df_new = df_new.set_index('datetime') 
-    return(df_new)
-
-def get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, variable, start_date, end_date, date_list_obs):
+# reads the hourly obs (from 00 UTC on the start date to 23 UTC on the last obs date) for every station with
+# the variable. returns a station x hour float32 array and a dictionary of the row for each station
+def get_obs_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, variable, start_date, end_date, date_list_obs):
     
     print("Reading observational dataframe for " + variable + ".. ")
     
-    df_new = make_df(date_list_obs, start_date, end_date)
-    
     if variable == 'SFCTC_KF' or variable == 'SFCTC':
         station_list = copy.deepcopy(stations_with_SFCTC)              
     elif variable == 'SFCWSPD_KF' or variable == 'SFCWSPD':  
         station_list = copy.deepcopy(stations_with_SFCWSPD) 
     
     elif variable == "PCPTOT":
-        if variable == "PCPT6":
-            station_list = [st for st in stations_with_PCPTOT if st not in stations_with_PCPT6 ]
-        elif variable == "PCPT24":
-            station_list = [st for st in stations_with_PCPTOT if st not in stations_with_PCPT24 ]
-        else:
-            station_list = copy.deepcopy(stations_with_PCPTOT)        
+        station_list = copy.deepcopy(stations_with_PCPTOT)        
     
     elif variable == "PCPT6":
         station_list = copy.deepcopy(stations_with_PCPT6) 
@@ -196,20 +248,19 @@ def get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with
     #KF variables are the same as raw for obs
     if "_KF" in variable:
         variable = variable[:-3]
-        
-    filehours_obs = get_filehours(1,24)
-    
-    obs_df_60hr = pd.DataFrame()  
-    obs_df_84hr = pd.DataFrame()  
-    obs_df_120hr = pd.DataFrame() 
-    obs_df_180hr = pd.DataFrame() 
-    obs_df_day1 = pd.DataFrame()
-    obs_df_day2 = pd.DataFrame()
-    obs_df_day3 = pd.DataFrame()  
-    obs_df_day4 = pd.DataFrame()  
-    obs_df_day5 = pd.DataFrame()  
-    obs_df_day6 = pd.DataFrame()  
-    obs_df_day7 = pd.DataFrame() 
+    
+    obs_hourly = np.full((len(station_list), len(date_list_obs)*24), np.nan, dtype=np.float32)
+    obs_stations = {}
+    
+    # reads every station at once from the obs archive (stations that the archive doesn't cover yet get read
+    # from the sqlite files in the loop below)
+    archive_rows = {}
+    if use_obs_archive:
+        archive_stations = [station if len(station) >= 4 else "0" + station for station in station_list if station in all_stations]
+        update_obs_archive(variable, archive_stations, date_list_obs[-1])
+        archive_obs, covered = read_obs_archive(variable, archive_stations, start_date, len(date_list_obs)*24)
+        archive_rows = {station: i for i, station in enumerate(archive_stations) if covered[i]}
+        archive_flags = read_qc_flags(variable, archive_stations, start_date, len(date_list_obs)*24)
     
     for station in station_list:
         print( "    Now on station " + station) 
@@ -228,233 +279,92 @@ def get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with
             if check_dates(start_date, delta, fcst_filepath + 'ENS/' + variable + '/fcst.t/', variable, station) == False:
                 print("   Skipping station " + station + " (not enough dates yet)")
                 continue        
-        # for hour in filehours_obs:
-        #     if float(hour) < 1000:
-        #             hour = str(hour).lstrip('0')
-        sql_con = sqlite3.connect(obs_filepath + variable + "/" + station + ".sqlite")
-        sql_query = "SELECT * from 'All' WHERE date BETWEEN 20" +str(date_list_obs[0]) + " AND 20" + str(date_list_obs[len(date_list_obs)-1])       
-        obs = pd.read_sql_query(sql_query, sql_con)
-        obs['datetime'] = None
-        
-        for y in range(len(obs['Time'])):
-            hour = int(obs['Time'][y])/100
-            obs.loc[y,'datetime'] = pd.to_datetime(obs.loc[y,'Date'], format='%Y%m%d') + timedelta(hours=hour)
-        
-        obs = obs.set_index('datetime')
-        
-        df_all = df_new.join(obs, on='datetime')
-        
-        obs_all = df_all['Val']
-        # remove data that falls outside the physical bounds (higher than the verified records for Canada
-        for i in range(len(obs_all)):
-            
-            if variable == 'SFCTC_KF' or variable == 'SFCTC':
-                if obs_all[i] > temp_max:
-                    obs_all[i] = np.nan
-                if obs_all[i] < temp_min:
-                    obs_all[i] = np.nan
-            
-            if variable == 'SFCWSPD_KF' or variable == 'SFCWSPD':
-                if obs_all[i] > wind_threshold:
-                    obs_all[i] = np.nan
-            
-            if variable == 'PCPTOT':
-                if obs_all[i] > precip_threshold:
-                    obs_all[i] = np.nan
-
-        hr60_obs = obs_all[:60]     #84 x 7   (30) 
-        hr84_obs = obs_all[:84]     #84 x 7   (30)     
-        hr120_obs = obs_all[:120]   #120 x 7  (30) 
-        day1_obs = obs_all[:24]     #24 x 7   (30)   
-        day2_obs = obs_all[24:48]   #24 x 7   (30)   
-        day3_obs = obs_all[48:72]   #24 x 7   (30)     
-        day4_obs = obs_all[72:96]   #24 x 7   (30)  
-        day5_obs = obs_all[96:120]  #24 x 7   (30)  
-        day6_obs = obs_all[120:144] #24 x 7   (30)  
-        day7_obs = obs_all[144:168] #24 x 7   (30)  
+
+        if station in archive_rows:
+            obs_all = np.array(archive_obs[archive_rows[station]], dtype=np.float64)
+            flags = archive_flags[archive_rows[station]]
+        else:
+            dates, times, vals = read_obs(obs_filepath + variable + "/" + station + ".sqlite", "20" + str(date_list_obs[0]), "20" + str(date_list_obs[-1]))
+            vals[vals == -999] = np.nan
             
-        final_obs_180hr = np.array(obs_all).T
-        final_obs_60hr = np.array(hr60_obs).T
-        final_obs_84hr = np.array(hr84_obs).T
-        final_obs_120hr = np.array(hr120_obs).T
-        final_obs_day1 = np.array(day1_obs).T
-        final_obs_day2 = np.array(day2_obs).T
-        final_obs_day3 = np.array(day3_obs).T
-        final_obs_day4 = np.array(day4_obs).T
-        final_obs_day5 = np.array(day5_obs).T
-        final_obs_day6 = np.array(day6_obs).T
-        final_obs_day7 = np.array(day7_obs).T
-
-        obs_df_180hr[station] = final_obs_180hr.flatten() # 1260 (180x7) for each station for weekly
-        obs_df_60hr[station] = final_obs_60hr.flatten()
-        obs_df_84hr[station] = final_obs_84hr.flatten()   # 588 (84x7)
-        obs_df_120hr[station] = final_obs_120hr.flatten() # 840 (120x7)
-        obs_df_day1[station] = final_obs_day1.flatten()   # 168 (24x7) 
-        obs_df_day2[station] = final_obs_day2.flatten()   # 168 (24x7) 
-        obs_df_day3[station] = final_obs_day3.flatten()   # 168 (24x7) 
-        obs_df_day4[station] = final_obs_day4.flatten()   # 168 (24x7) 
-        obs_df_day5[station] = final_obs_day5.flatten()   # 168 (24x7) 
-        obs_df_day6[station] = final_obs_day6.flatten()   # 168 (24x7) 
-        obs_df_day7[station] = final_obs_day7.flatten()   # 168 (24x7) 
+            obs_all = align_obs(dates, times, vals, start_date, len(date_list_obs))
+            flags = qc_flags(obs_all, variable)
         
-        #extra_point_df[station] = np.array([extra_point])
-        # output is a dataframe with the column names as the station, with 420 rows for 60x7 or 60x30
-    return(obs_df_60hr,obs_df_84hr,obs_df_120hr,obs_df_180hr,obs_df_day1,obs_df_day2,obs_df_day3,obs_df_day4,obs_df_day5,obs_df_day6,obs_df_day7)
+        # remove data that fails the quality control (falls outside the physical bounds etc)
+        obs_all = remove_flagged(obs_all, flags, obs_checks)
 
-# returns the fcst data for the given model/grid
-def get_fcst(station, filepath, variable, date_list,filehours, start_date, end_date):
-    
-    df_new = make_df(date_list, start_date, end_date)
+        obs_stations[station] = len(obs_stations)
+        obs_hourly[obs_stations[station]] = obs_all
+        
+    return(obs_hourly[:len(obs_stations)], obs_stations)
 
-    if "PCPT" in variable:
-        variable = "PCPTOT"
-    # pulls out a list of the files for the given station+variable+hour wanted   
-    sql_con = sqlite3.connect(filepath + station + ".sqlite")
-    sql_query = "SELECT * from 'All' WHERE date BETWEEN 20" + str(date_list[0]) + " AND 20" + str(date_list[len(date_list)-1])
-    fcst = pd.read_sql_query(sql_query, sql_con)
+# hourly precip obs that have been read this run, so PCPTOT, PCPT6 and PCPT24 only read each file once
+# {(variable, start date, delta, number of days, stations in the domain): (obs_hourly, obs_stations)}
+precip_hourly = {}
+
+# hourly precip obs (PCPTOT, PCPT6 or PCPT24) for the given stations. every station with the variable is read
+# the first time, after that the rows are picked out of what was already read
+def get_precip_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, variable, start_date, end_date, date_list_obs, stations):
     
-    fcst['datetime'] = None 
-    for x in range(len(fcst['Offset'])):
-        fcst.loc[x, 'datetime'] = pd.to_datetime(start_date, format='%y%m%d') + timedelta(hours=int(x))
+    key = (variable, start_date, delta, len(date_list_obs), tuple(all_stations))
+    if key not in precip_hourly:
+        precip_hourly[key] = get_obs_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, variable, start_date, end_date, date_list_obs)
+    obs_hourly, obs_stations = precip_hourly[key]
     
-    fcst = fcst.set_index('datetime')
-    df_all = df_new.join(fcst, on='datetime')
+    stations = [station if len(station) >= 4 else "0" + station for station in stations]
+    stations = [station for station in stations if station in obs_stations]
+    rows = np.array([obs_stations[station] for station in stations], dtype=int)
     
-    return(df_all['Val'])
-
-# this removes (NaNs) any fcst data where the obs is not recorded, or fcst is -999
-def remove_missing_data(fcst, obs):
-    for i in range(len(fcst)):        
-        if math.isnan(obs[i]) == True:
-            fcst[i] = np.nan
-            
-        if fcst[i] == -999:
-            fcst[i] = np.nan
-            obs[i] = np.nan
-                
-    return(fcst,obs) 
+    return(obs_hourly[rows], {station: i for i, station in enumerate(stations)})
 
-def make_textfile(model, grid, input_domain, savetype, date_entry1, date_entry2, time_domain, variable, filepath, MAE, RMSE, corr, len_fcst, numstations):
-   
-    if "ENS" in model:
-        modelpath= model + '/'
+# returns the obs cube (station, init date, lead hour) and the dictionary of the row for each station
+# the time windows are views of the cube (obs_cube[:, :, 0:60] for 60hr, obs_cube[:, :, 24:48] for day2 etc)
+def get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, variable, start_date, end_date, date_list_obs):
+    
+    if variable == "PCPTOT":
+        obs_hourly, obs_stations = get_precip_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, variable, start_date, end_date, date_list_obs, stations_with_PCPTOT)
     else:
-        modelpath = model + '/' + grid + '/'
-    f1 = open(textfile_folder + modelpath + input_domain + '/' + variable + '/' + "MAE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",wm+"+")       
-    read_f1 = np.loadtxt(textfile_folder +  modelpath + input_domain + '/' + variable + '/' + "MAE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",dtype=str)  
-    if date_entry1 not in read_f1 and date_entry2 not in read_f1:
-        f1.write(str(date_entry1) + " " + str(date_entry2) + "   ")
+        obs_hourly, obs_stations = get_obs_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, variable, start_date, end_date, date_list_obs)
         
-        f1.write("%3.3f   " % (MAE))
-        f1.write(len_fcst + "   ")
-        f1.write(numstations + "\n")
+    return(make_obs_cube(obs_hourly, delta+1), obs_stations)
+
+# returns the fcst data for the given model/grid as an (init date, lead hour) array, lined up with the obs cube
+def get_fcst(station, filepath, variable, date_list,filehours, start_date, end_date):
     
-        f1.close()    
-            
+    if "PCPT" in variable:
+        variable = "PCPTOT"
     
-    f2 = open(textfile_folder +  modelpath + input_domain + '/' + variable + '/' + "RMSE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",wm+"+")       
-    read_f2 = np.loadtxt(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "RMSE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",dtype=str)  
-    if date_entry1 not in read_f2 and date_entry2 not in read_f2:
-        f2.write(str(date_entry1) + " " + str(date_entry2) + "   ")
-        
-        f2.write("%3.3f   " % (RMSE))
-        f2.write(len_fcst + "   ")
-        f2.write(numstations + "\n")
-        
-        f2.close()  
+    if use_fcst_cache:
+        fcst = read_fcst_cache(filepath, station, date_list)
+        if fcst is not None:
+            return(fcst)
     
+    # pulls out all the rows for the given station+variable between the start and end dates
+    dates, offsets, vals = read_fcst(filepath + station + ".sqlite", "20" + str(date_list[0]), "20" + str(date_list[-1]))
+    vals[vals == -999] = np.nan
     
-    f3 = open(textfile_folder +  modelpath + input_domain + '/' + variable + '/' + "spcorr_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",wm+"+") 
-    read_f3 = np.loadtxt(textfile_folder +  modelpath + input_domain + '/' + variable + '/' + "spcorr_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",dtype=str)  
-    if date_entry1 not in read_f3 and date_entry2 not in read_f3:
-        f3.write(str(date_entry1) + " " + str(date_entry2) + "   ")
-        
-        f3.write("%3.3f   " % (corr))
-        f3.write(len_fcst + "   ")
-        f3.write(numstations + "\n")
-        
-        f3.close()  
+    return(align_fcst(dates, offsets, vals, start_date, len(date_list), lead_hours))
 
+# bias, pearson and sd_ratio are only in the results store (not the text files)
+def make_textfile(model, grid, input_domain, savetype, date_entry1, date_entry2, time_domain, variable, filepath, MAE, RMSE, corr, len_fcst, numstations, bias=np.nan, pearson=np.nan, sd_ratio=np.nan):
 
-def trim_fcst(all_fcst,obs_df,station,start,end,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain):
-
-    if variable == "PCPT6":
-        if int(end)==int(maxhour):
-            trimmed_fcst = all_fcst[start+1:end-5] 
-        else:
-            trimmed_fcst = all_fcst[start+1:end+1]  
-    elif variable == "PCPT24":
-        if int(end)==int(maxhour):
-            trimmed_fcst = all_fcst[start+1:end-23] 
-        else:
-            trimmed_fcst = all_fcst[start+1:end+1] 
+    # in a worker process the stats are sent back to the parent process to write
+    if deferred_writes is not None:
+        deferred_writes.append((make_textfile, (model, grid, input_domain, savetype, date_entry1, date_entry2, time_domain, variable, filepath, MAE, RMSE, corr, len_fcst, numstations, bias, pearson, sd_ratio)))
+        return
    
-    else:
-        trimmed_fcst = all_fcst[start:end]   
-       
-    fcst_final = np.array(trimmed_fcst).T
-    fcst_flat = fcst_final.flatten() 
-    
-    if variable == "PCPT6":
-        fcst_flat = np.reshape(fcst_flat, (-1, 6)).sum(axis=-1) #must be divisible by 6
-    if variable == "PCPT24":
-        fcst_flat = np.reshape(fcst_flat, (-1, 24)).sum(axis=-1) #must be divisible by 6
-        
-    obs_flat = np.array(obs_df[station])
-    if len(np.shape(obs_flat)) > 1:
-        obs_flat = obs_flat[:,1]
-    
-    ''' was removing entire days from obs so I got rid of it............. 
-    f "PCPT" in variable:
-        #removes the last point from every day if its at the maxhour, since it doesnt exist for fcst
-        if int(end)==int(maxhour): 
-            
-            if end==180:    
-                oneday_length = int((len(obs_flat)+1)/(delta+1))
-                obs_flat = np.delete(obs_flat, np.arange(0, obs_flat.size, oneday_length)[1:]-1)
-            else:
-                oneday_length = int((len(obs_flat))/(delta+1))
-                obs_flat = np.delete(obs_flat, np.arange(0, obs_flat.size+oneday_length, oneday_length)[1:]-1)
-    '''
-    # removes (NaNs) fcst data where there is no obs
-    fcst_NaNs,obs_NaNs = remove_missing_data(fcst_flat, obs_flat)  
+    save_results('continuous', model, grid, input_domain, variable, savetype, time_domain, date_entry1, date_entry2, \
+                 {'MAE': MAE, 'RMSE': RMSE, 'spcorr': corr, 'bias': bias, 'pearson': pearson, 'sd_ratio': sd_ratio}, len_fcst, numstations)
 
-     
-    if input_domain == "small" and variable in ["SFCTC","SFCWSPD"] and all_fcst_KF.any():
-        trimmed_fcst_KF = all_fcst_KF[start:end]   
-        fcst_final_KF = np.array(trimmed_fcst_KF).T
-        fcst_flat_KF = fcst_final_KF.flatten() 
-        
-        fcst_NaNs,_ = remove_missing_data(fcst_flat, fcst_flat_KF) 
-    
 
-    return(fcst_NaNs, obs_NaNs)
-
-def get_statistics(delta, model,grid, input_domain, savetype, date_entry1, date_entry2, maxhour,hour,length,fcst_allstations,obs_allstations,num_stations,totalstations,time_domain,variable,filepath):
+# saves the stats for the time window. window is the time window's stats from window_metrics (utl/lead_stats.py)
+def get_statistics(delta, model,grid, input_domain, savetype, date_entry1, date_entry2, maxhour,hour,length,window,num_stations,totalstations,time_domain,variable,filepath):
     
     if int(maxhour) >= hour:
-        fcst_avg = np.nanmean(fcst_allstations,axis=0) 
-        obs_avg = np.nanmean(obs_allstations,axis=0)
-        fcst_noNaNs, obs_noNaNs = [],[]
-        
-        for l in range(len(fcst_avg)):
-            if np.isnan(fcst_avg[l]) == False:
-                fcst_noNaNs.append(fcst_avg[l])
-                obs_noNaNs.append(obs_avg[l])
-              
-        # rounds each forecast and obs to one decimal
-        obs_rounded = np.round(obs_noNaNs,1)
-        fcst_rounded = np.round(fcst_noNaNs,1)
-        
-        if len(fcst_rounded) == 0:
+        if window['count'] == 0:
             model_not_available(model, grid, delta, input_domain, date_entry1, date_entry2, savetype, maxhour,hour,length,totalstations,time_domain,variable,filepath)
         
         else:
-            MAE = mean_absolute_error(obs_rounded,fcst_rounded)
-            MSE = mean_squared_error(obs_rounded,fcst_rounded)
-            RMSE = math.sqrt(MSE)
-            corr = stats.spearmanr(obs_rounded,fcst_rounded)[0]
-            
             if variable == "PCPT6":
                 length = int(length/6)
             
@@ -463,17 +373,19 @@ def get_statistics(delta, model,grid, input_domain, savetype, date_entry1, date_
             else:
                 length = length            
             
-            len_fcst = str(len(fcst_noNaNs)) + "/" + str(length)   
+            len_fcst = str(window['count']) + "/" + str(length)   
             numstations = str(num_stations) + "/" + str(totalstations)
                 
-            make_textfile(model, grid, input_domain, savetype, date_entry1, date_entry2, time_domain, variable, filepath, MAE, RMSE, corr, len_fcst, numstations)
+            make_textfile(model, grid, input_domain, savetype, date_entry1, date_entry2, time_domain, variable, filepath, window['MAE'], window['RMSE'], window['spearman'], len_fcst, numstations, \
+                          window['bias'], window['pearson'], window['sd_ratio'])
 
 def model_not_available(model, grid, delta, input_domain, date_entry1, date_entry2, savetype, maxhour,hour,length,totalstations,time_domain,variable,filepath):
-    if "ENS" in model:
-        modelpath = model + '/'
-    else:
-        modelpath = model + '/' + grid + '/'
 
+    # in a worker process the stats are sent back to the parent process to write
+    if deferred_writes is not None:
+        deferred_writes.append((model_not_available, (model, grid, delta, input_domain, date_entry1, date_entry2, savetype, maxhour, hour, length, totalstations, time_domain, variable, filepath)))
+        return
+    
     if int(maxhour) >= hour:  
         if variable == "PCPT6":
             if int(maxhour) == int(hour):
@@ -491,68 +403,113 @@ def model_not_available(model, grid, delta, input_domain, date_entry1, date_entr
         len_fcst = "0/" + str(total_length)
         numstations = "0/" + str(totalstations)
         
-        
-        f1 = open(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "MAE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",wm+"+")       
-        read_f1 = np.loadtxt(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "MAE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",dtype=str)  
-        if date_entry1 not in read_f1 and date_entry2 not in read_f1:
-            f1.write(str(date_entry1) + " " + str(date_entry2) + "   ")
-            
-            f1.write("nan   ") #MAE
-            f1.write(len_fcst + "   ")
-            f1.write(numstations + "\n")
-        
-            f1.close()    
-                
-        
-        f2 = open(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "RMSE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",wm+"+")       
-        read_f2 = np.loadtxt(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "RMSE_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",dtype=str)  
-        if date_entry1 not in read_f2 and date_entry2 not in read_f2:
-            f2.write(str(date_entry1) + " " + str(date_entry2) + "   ")
-            
-            f2.write("nan   ") #RMSE
-            f2.write(len_fcst + "   ")
-            f2.write(numstations + "\n")
-            
-            f2.close()  
-            
-        
-        f3 = open(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "spcorr_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",wm+"+") 
-        read_f3 = np.loadtxt(textfile_folder +  modelpath  + input_domain + '/' + variable + '/' + "spcorr_" + savetype + "_" + variable + "_" + time_domain + "_" + input_domain + ".txt",dtype=str)  
-        if date_entry1 not in read_f3 and date_entry2 not in read_f3:
-            f3.write(str(date_entry1) + " " + str(date_entry2) + "   ")
-            
-            f3.write("nan   ") #corr
-            f3.write(len_fcst + "   ")
-            f3.write(numstations + "\n")
-            
-            f3.close()  
+        save_results('continuous', model, grid, input_domain, variable, savetype, time_domain, date_entry1, date_entry2, \
+                     {'MAE': np.nan, 'RMSE': np.nan, 'spcorr': np.nan, 'bias': np.nan, 'pearson': np.nan, 'sd_ratio': np.nan}, len_fcst, numstations)
 
-def get_rankings(filepath, delta, input_domain, date_entry1, date_entry2, savetype, all_stations, station_df, variable, date_list, model, grid, maxhour, gridname, filehours, obs_df_60hr,obs_df_84hr,obs_df_120hr,obs_df_180hr,obs_df_day1,obs_df_day2,obs_df_day3,obs_df_day4,obs_df_day5,obs_df_day6,obs_df_day7, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24):
+# rewrites the stats text files for the website from the results store (see utl/results_store.py), only the ones
+# for the results this run saved
+def write_textfiles(domains, variables, savetype):
+    
+    export_textfiles(textfile_folder, 'continuous', saved_keys('continuous', domains=domains, variables=variables, savetypes=[savetype]))
+
+# Pool initializer for the model/grid worker processes
+def set_shared_obs(obs_cube, obs_stations):
+    global shared_obs
+    
+    # the sqlite handles from the parent process can't be used after the fork
+    forget_connections()
+    shared_obs = (obs_cube, obs_stations)
+
+# runs get_rankings for one model/grid in a worker process (rankings_args are the get_rankings arguments without
+# the obs) and returns the stats it would have written, so only the parent process writes the files
+def get_rankings_deferred(rankings_args):
+    global deferred_writes
+    
+    deferred_writes = []
+    try:
+        get_rankings(**rankings_args, obs_cube=shared_obs[0], obs_stations=shared_obs[1])
+        return(deferred_writes)
+    finally:
+        deferred_writes = None
+
+# get_model_sums for one model/grid in a worker process, for save_rankings_batch in the parent process
+def get_model_sums_shared(rankings_args):
+    
+    return(get_model_sums(**rankings_args, obs_cube=shared_obs[0], obs_stations=shared_obs[1]))
+
+# same as get_rankings_deferred for one window of a longer span (leaderboards-backfill.py), the shared obs cube
+# covers the whole span and day is where the window's first init date is in it
+def get_window_deferred(window_args):
+    global deferred_writes
+
+    day, rankings_args = window_args
+    deferred_writes = []
+    try:
+        get_rankings(**rankings_args, obs_cube=shared_obs[0][:, day:day+rankings_args['delta']+1], obs_stations=shared_obs[1])
+        return(deferred_writes)
+    finally:
+        deferred_writes = None
+
+# saves the stats for every init date of the run to the stats store
+def write_daily_stats(model, grid, variable, input_domain, date_entry1, delta, windows, stations, checked_stations):
+    
+    # in a worker process the rows are sent back to the parent process to write
+    if deferred_writes is not None:
+        deferred_writes.append((write_daily_stats, (model, grid, variable, input_domain, date_entry1, delta, windows, stations, checked_stations)))
+        return
+    
+    save_daily_stats(model, grid, variable, input_domain, date_entry1, delta, windows, stations, checked_stations)
+
+# saves the error at every lead hour to the results store
+def write_lead_curve(model, grid, variable, input_domain, savetype, date_entry1, date_entry2, curve):
+    
+    # in a worker process the rows are sent back to the parent process to write
+    if deferred_writes is not None:
+        deferred_writes.append((write_lead_curve, (model, grid, variable, input_domain, savetype, date_entry1, date_entry2, curve)))
+        return
+    
+    save_lead_curve(model, grid, input_domain, variable, savetype, date_entry1, date_entry2, curve)
+
+def write_deferred(writes):
+    for write, args in writes:
+        write(*args)
+
+# checks the dates and reads the fcst for one station (runs on the get_rankings thread pool)
+# returns the station and its fcst (None if there aren't enough dates yet)
+def read_station(station, filepath, delta, variable, date_list, filehours, date_entry1, date_entry2):
+    
+    if check_dates(date_entry1, delta, filepath, variable, station) == False:
+        return(station, None)
+    
+    return(station, get_fcst(station, filepath, variable, date_list,filehours, date_entry1, date_entry2))    #goes to maxhour
+
+# reads the fcst for the model/grid and station averages it against the obs cube. returns the lead hour sums (None if
+# no station had data, see utl/lead_stats.py) and the stations that were checked/included
+def get_model_sums(filepath, delta, input_domain, date_entry1, date_entry2, savetype, all_stations, station_df, variable, date_list, model, grid, maxhour, gridname, filehours, obs_cube, obs_stations, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24):
     
   
     if os.path.isdir(textfile_folder +  filepath) == False:
-        os.makedirs(textfile_folder +  filepath)
+        os.makedirs(textfile_folder +  filepath, exist_ok=True) # another worker process might make it first
             
     # open the file for the current model and get all the stations from it
     model_df_name = model+gridname
     stations_in_domain = np.array(station_df.query(model_df_name+"==1")["Station ID"],dtype='str')
 
-    #these variables will contain all the fcst and obs for the stations that exist for each model
-    obs_allstations_180hr, fcst_allstations_180hr = [],[]
-    obs_allstations_120hr, fcst_allstations_120hr = [],[]
-    obs_allstations_84hr, fcst_allstations_84hr = [],[]
-    obs_allstations_60hr, fcst_allstations_60hr = [],[]
-    obs_allstations_day1, fcst_allstations_day1 = [],[]
-    obs_allstations_day2, fcst_allstations_day2 = [],[]
-    obs_allstations_day3, fcst_allstations_day3 = [],[]
-    obs_allstations_day4, fcst_allstations_day4 = [],[]
-    obs_allstations_day5, fcst_allstations_day5 = [],[]
-    obs_allstations_day6, fcst_allstations_day6 = [],[]
-    obs_allstations_day7, fcst_allstations_day7 = [],[]
+    # adds any new init dates to the fcst cube for this model/grid/variable
+    if use_fcst_cache:
+        update_fcst_cache(filepath, [station if len(station) >= 4 else "0" + station for station in stations_in_domain], date_list)
+
+    #these variables will contain the (init date, lead) fcst and obs for the stations that exist for each model
+    obs_allstations, fcst_allstations = [],[]
     
     totalstations = 0
     num_stations = 0
     
+    # the stations behind totalstations and num_stations (for the stats store)
+    checked_stations, included_stations = [], []
+    
+    # stations in the domain that have the variable
+    stations = []
     for station in stations_in_domain:
 
         if station not in all_stations:
@@ -566,13 +523,23 @@ def get_rankings(filepath, delta, input_domain, date_entry1, date_entry2, savety
         if len(station) < 4:
             station = "0" +str(station)
         
-        if check_dates(date_entry1, delta, filepath, variable, station) == False:
+        stations.append(station)
+    
+    # reads the stations on a thread pool (most of the time is spent waiting on the files). map returns them in
+    # the same order as the stations, so the stats are the same as reading them one at a time
+    with ThreadPoolExecutor(max_workers=station_workers) as pool:
+        station_fcsts = list(pool.map(lambda station: read_station(station, filepath, delta, variable, date_list, filehours, date_entry1, date_entry2), stations))
+    
+    for station, all_fcst in station_fcsts:
+        
+        if all_fcst is None:
             print("   Skipping station " + station + " (not enough dates yet)")
             continue
 
         
         # total stations that should be included in each model/grid
         totalstations = totalstations+1
+        checked_stations.append(station)
         '''
         #when using the "small" domain, only include raw data if KF data also exists at that hour
         if input_domain == "small" and variable in ["SFCTC","SFCWSPD"]:
@@ -591,82 +558,43 @@ def get_rankings(filepath, delta, input_domain, date_entry1, date_entry2, savety
         '''
         
         all_fcst_KF = False
-            
-        all_fcst = get_fcst(station, filepath, variable, date_list,filehours, date_entry1, date_entry2)    #goes to maxhour       
        
         fcst_final_all = np.array(all_fcst).T
         fcst_flat_all = fcst_final_all.flatten()
         
        
-        if variable != "PCPT24":
-            obs_flat_all = np.array(obs_df_180hr[station])
-            
-            #checks 180 hour only
-            if pd.isna(fcst_flat_all).all() == True:    
-                print("   Skipping station " + station + " (No forecast data)")
-                continue
-            
-            if pd.isna(obs_flat_all).all() == True:    
-                print("   Skipping station " + station + " (No obs data)")
-                continue
+        if pd.isna(fcst_flat_all).all() == True:    
+            print("   Skipping station " + station + " (No forecast data)")
+            continue
+        
+        if station not in obs_stations or np.isnan(obs_cube[obs_stations[station]]).all() == True:    
+            print("   Skipping station " + station + " (No obs data)")
+            continue
+        
+        # (init date, lead hour) obs at this station, a view of the cube
+        obs_station = obs_cube[obs_stations[station]]
         
         # total stations that ended up being included (doesn't count ones with no data)
         num_stations = num_stations+1
-      
-        if int(maxhour) >= 180 and variable!="PCPT24":
-            fcst_NaNs_180hr, obs_flat_180hr = trim_fcst(all_fcst,obs_df_180hr,station,0,180,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)                            
-            fcst_allstations_180hr.append(fcst_NaNs_180hr)
-            obs_allstations_180hr.append(obs_flat_180hr)
-            
-         
-        if int(maxhour) >= 168:        
-            fcst_NaNs_day7,  obs_flat_day7  = trim_fcst(all_fcst,obs_df_day7,station,144,168,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-            fcst_allstations_day7.append(fcst_NaNs_day7)
-            obs_allstations_day7.append(obs_flat_day7)
-            
-        if int(maxhour) >= 144:
-            fcst_NaNs_day6,  obs_flat_day6  = trim_fcst(all_fcst,obs_df_day6,station,120,144,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-            fcst_allstations_day6.append(fcst_NaNs_day6)
-            obs_allstations_day6.append(obs_flat_day6)
-            
-        if int(maxhour) >= 120:
-            if variable!="PCPT24":
-                fcst_NaNs_120hr, obs_flat_120hr = trim_fcst(all_fcst,obs_df_120hr,station,0,120,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-                fcst_allstations_120hr.append(fcst_NaNs_120hr)
-                obs_allstations_120hr.append(obs_flat_120hr)
-            
-            fcst_NaNs_day5,  obs_flat_day5  = trim_fcst(all_fcst,obs_df_day5,station,96,120,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-            fcst_allstations_day5.append(fcst_NaNs_day5)
-            obs_allstations_day5.append(obs_flat_day5)
-
-        if int(maxhour) >= 96:
-            fcst_NaNs_day4,  obs_flat_day4  = trim_fcst(all_fcst,obs_df_day4,station,72,96,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-            fcst_allstations_day4.append(fcst_NaNs_day4)
-            obs_allstations_day4.append(obs_flat_day4)
-            
-        if int(maxhour) >= 84 and variable!="PCPT24":            
-            fcst_NaNs_84hr,  obs_flat_84hr  = trim_fcst(all_fcst,obs_df_84hr,station,0,84,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-            fcst_allstations_84hr.append(fcst_NaNs_84hr)
-            obs_allstations_84hr.append(obs_flat_84hr)
-            
-        if int(maxhour) >= 72:
-            fcst_NaNs_day3,  obs_flat_day3  = trim_fcst(all_fcst,obs_df_day3,station,48,72,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-            fcst_allstations_day3.append(fcst_NaNs_day3)
-            obs_allstations_day3.append(obs_flat_day3)
-            
-        if variable!="PCPT24":
-            fcst_NaNs_60hr,  obs_flat_60hr  = trim_fcst(all_fcst,obs_df_60hr,station,0,60,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-            fcst_allstations_60hr.append(fcst_NaNs_60hr)
-            obs_allstations_60hr.append(obs_flat_60hr)
-                    
-        fcst_NaNs_day1,  obs_flat_day1  = trim_fcst(all_fcst,obs_df_day1,station,0,24,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-        fcst_allstations_day1.append(fcst_NaNs_day1)
-        obs_allstations_day1.append(obs_flat_day1)
-        
-        fcst_NaNs_day2,  obs_flat_day2  = trim_fcst(all_fcst,obs_df_day2,station,24,48,variable,filepath,date_list,filehours,all_fcst_KF,maxhour, delta, input_domain)  
-        fcst_allstations_day2.append(fcst_NaNs_day2)
-        obs_allstations_day2.append(obs_flat_day2)
+        included_stations.append(station)
 
+        # every lead hour at once, the time windows are put together from these (see utl/lead_stats.py)
+        fcst_leads, obs_leads = station_leads(all_fcst, obs_station, variable)
+        fcst_allstations.append(fcst_leads)
+        obs_allstations.append(obs_leads)
+
+    if num_stations == 0:
+        return({'sums': None, 'num_stations': num_stations, 'totalstations': totalstations, 'stations': included_stations, 'checked_stations': checked_stations})
+    
+    return({'sums': lead_sums(fcst_allstations, obs_allstations), 'num_stations': num_stations, 'totalstations': totalstations, \
+            'stations': included_stations, 'checked_stations': checked_stations})
+
+# saves the stats for every time window of the model/grid. model_sums is from get_model_sums, windows the
+# window_metrics for each of its model_windows (the rest of the get_rankings arguments are ignored)
+def save_model_stats(model_sums, windows, filepath, delta, input_domain, date_entry1, date_entry2, savetype, variable, model, grid, maxhour, **rankings_args):
+    
+    totalstations, num_stations = model_sums['totalstations'], model_sums['num_stations']
+    
     #sometimes theres no forecast data for a model
     if num_stations == 0:
         print("   NO FORECAST DATA FOR " + model + grid)
@@ -686,191 +614,93 @@ def get_rankings(filepath, delta, input_domain, date_entry1, date_entry2, savety
         model_not_available(model, grid, delta, input_domain, date_entry1, date_entry2, savetype, maxhour,24,24,totalstations,'day1',variable,filepath)
         
     else:
+        sums = model_sums['sums']
+        
+        for (time_domain, hour, start, end, length), window in zip(get_time_domains(variable, maxhour), windows):
+            get_statistics(delta, model, grid, input_domain, savetype, date_entry1, date_entry2, maxhour, hour, length, window, \
+                           num_stations, totalstations, time_domain, variable, filepath)
+
+        # the error at every lead hour, from the same sums
+        write_lead_curve(model, grid, variable, input_domain, savetype, date_entry1, date_entry2, lead_curve(sums, variable, maxhour))
+
+        if use_stats_store:
+            daily_windows = {}
+            for time_domain, hour, start, end, length in get_time_domains(variable, maxhour):
+                leads = lead_range(start, end, variable, maxhour)
+                daily_windows[time_domain] = (sums['fcst'][:,leads], sums['obs'][:,leads])
+            write_daily_stats(model, grid, variable, input_domain, date_entry1, delta, daily_windows, model_sums['stations'], model_sums['checked_stations'])
+
+def get_rankings(obs_cube, obs_stations, **rankings_args):
     
-        if variable!="PCPT24":
-            get_statistics(delta, model, grid, input_domain, savetype, date_entry1, date_entry2,maxhour,180,180,fcst_allstations_180hr,obs_allstations_180hr,num_stations,totalstations,'180hr',variable,filepath)
-            get_statistics(delta,model, grid, input_domain, savetype, date_entry1, date_entry2,maxhour,120,120,fcst_allstations_120hr,obs_allstations_120hr,num_stations,totalstations,'120hr',variable,filepath)
-            get_statistics(delta,model, grid, input_domain, savetype, date_entry1, date_entry2,maxhour,84,84,fcst_allstations_84hr,obs_allstations_84hr,num_stations,totalstations,'84hr',variable,filepath)
-            get_statistics(delta,model,grid, input_domain, savetype, date_entry1, date_entry2,maxhour,60,60,fcst_allstations_60hr,obs_allstations_60hr,num_stations,totalstations,'60hr',variable,filepath)
+    model_sums = get_model_sums(**rankings_args, obs_cube=obs_cube, obs_stations=obs_stations)
+    
+    windows = []
+    if model_sums['sums'] is not None:
+        windows = window_metrics([(model_sums['sums'], leads) for leads in model_windows(rankings_args['variable'], rankings_args['maxhour'])])
+    
+    save_model_stats(model_sums, windows, **rankings_args)
 
-                
-        get_statistics(delta,model, grid, input_domain, savetype, date_entry1, date_entry2,maxhour,168,24,fcst_allstations_day7,obs_allstations_day7,num_stations,totalstations,'day7',variable,filepath)
-        get_statistics(delta,model, grid, input_domain, savetype, date_entry1, date_entry2,maxhour,144,24,fcst_allstations_day6,obs_allstations_day6,num_stations,totalstations,'day6',variable,filepath)
-        get_statistics(delta,model, grid, input_domain, savetype, date_entry1, date_entry2,maxhour,120,24,fcst_allstations_day5,obs_allstations_day5,num_stations,totalstations,'day5',variable,filepath)
-        get_statistics(delta,model, grid, input_domain, savetype, date_entry1, date_entry2,maxhour,96,24,fcst_allstations_day4,obs_allstations_day4,num_stations,totalstations,'day4',variable,filepath)
-        get_statistics(delta,model, grid, input_domain, savetype, date_entry1, date_entry2,maxhour,72,24,fcst_allstations_day3,obs_allstations_day3,num_stations,totalstations,'day3',variable,filepath) 
-        get_statistics(delta,model,grid, input_domain, savetype, date_entry1, date_entry2,maxhour,48,24,fcst_allstations_day2,obs_allstations_day2,num_stations,totalstations,'day2',variable,filepath)
-        get_statistics(delta,model,grid, input_domain, savetype, date_entry1, date_entry2,maxhour,24,24,fcst_allstations_day1,obs_allstations_day1,num_stations,totalstations,'day1',variable,filepath)
+# saves the stats for every model/grid in rankings_args (all_model_sums is get_model_sums for each), with the
+# stats for every time window of every model/grid worked out in one window_metrics call
+def save_rankings_batch(rankings_args, all_model_sums):
+    
+    batch = []
+    for args, model_sums in zip(rankings_args, all_model_sums):
+        if model_sums['sums'] is not None:
+            batch = batch + [(model_sums['sums'], leads) for leads in model_windows(args['variable'], args['maxhour'])]
+    
+    windows = iter(window_metrics(batch))
+    for args, model_sums in zip(rankings_args, all_model_sums):
+        num_windows = 0 if model_sums['sums'] is None else len(model_windows(args['variable'], args['maxhour']))
+        save_model_stats(model_sums, [next(windows) for _ in range(num_windows)], **args)
+
+# get_rankings for every model/grid in rankings_args (which all use the same obs), see save_rankings_batch
+def get_rankings_batch(rankings_args, obs_cube, obs_stations):
+    
+    save_rankings_batch(rankings_args, [get_model_sums(**args, obs_cube=obs_cube, obs_stations=obs_stations) for args in rankings_args])
 
 def PCPT_obs_df_6(date_list_obs, delta, input_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6,\
                   stations_with_PCPT24, all_stations, start_date, end_date):
 
-    # get the hourly precip values
-    obs_df_60hr_1,obs_df_84hr_1,obs_df_120hr_1,obs_df_180hr_1,obs_df_day1_1,obs_df_day2_1,obs_df_day3_1,obs_df_day4_1,obs_df_day5_1,obs_df_day6_1,obs_df_day7_1 = get_all_obs(delta, \
-        stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, all_stations, "PCPTOT", \
-    start_date, end_date, date_list_obs)
-    
-    # grab the extra hour on the last outlook day
-    obs_df_60hr_1 = obs_df_60hr_1.append(obs_df_180hr_1.iloc[60],ignore_index=True)
-    obs_df_84hr_1 = obs_df_84hr_1.append(obs_df_180hr_1.iloc[84],ignore_index=True)
-    obs_df_120hr_1 = obs_df_120hr_1.append(obs_df_180hr_1.iloc[ 120],ignore_index=True)
-    obs_df_day1_1 = obs_df_day1_1.append(obs_df_180hr_1.iloc[24],ignore_index=True)
-    obs_df_day2_1 = obs_df_day2_1.append(obs_df_180hr_1.iloc[48],ignore_index=True)
-    obs_df_day3_1 = obs_df_day3_1.append(obs_df_180hr_1.iloc[72],ignore_index=True)
-    obs_df_day4_1 = obs_df_day4_1.append(obs_df_180hr_1.iloc[96],ignore_index=True)
-    obs_df_day5_1 = obs_df_day5_1.append(obs_df_180hr_1.iloc[120],ignore_index=True)
-    obs_df_day6_1 = obs_df_day6_1.append(obs_df_180hr_1.iloc[144],ignore_index=True)
-    obs_df_day7_1 = obs_df_day7_1.append(obs_df_180hr_1.iloc[168],ignore_index=True)
-    
-      
-    # remove the first hour (0 UTC)
-    obs_df_60hr_1 = obs_df_60hr_1.iloc[1:].reset_index(drop=True)
-    obs_df_84hr_1 = obs_df_84hr_1.iloc[1:].reset_index(drop=True)
-    obs_df_120hr_1 = obs_df_120hr_1.iloc[1:].reset_index(drop=True)
-    obs_df_180hr_1 = obs_df_180hr_1.iloc[1:-5].reset_index(drop=True)
-    obs_df_day1_1 = obs_df_day1_1.iloc[1:].reset_index(drop=True)
-    obs_df_day2_1 = obs_df_day2_1.iloc[1:].reset_index(drop=True)
-    obs_df_day3_1 = obs_df_day3_1.iloc[1:].reset_index(drop=True)
-    obs_df_day4_1 = obs_df_day4_1.iloc[1:].reset_index(drop=True)
-    obs_df_day5_1 = obs_df_day5_1.iloc[1:].reset_index(drop=True)
-    obs_df_day6_1 = obs_df_day6_1.iloc[1:].reset_index(drop=True)
-    obs_df_day7_1 = obs_df_day7_1.iloc[1:].reset_index(drop=True)
-    
+    # get the hourly precip values (only for stations that don't already have 6-hr accumulations)
+    stations_hourly = [st for st in stations_with_PCPTOT if st not in stations_with_PCPT6]
+    obs_hourly_1, obs_stations_1 = get_precip_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, \
+        all_stations, "PCPTOT", start_date, end_date, date_list_obs, stations_hourly)
     
     # sum every 6 hours (1-6 UTC, 7-12 UTC etc). report NaN if any of the 6 hours is missing
-    obs_df_60hr_1_trimmed = obs_df_60hr_1.groupby(obs_df_60hr_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_84hr_1_trimmed = obs_df_84hr_1.groupby(obs_df_84hr_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_120hr_1_trimmed = obs_df_120hr_1.groupby(obs_df_120hr_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_180hr_1_trimmed = obs_df_180hr_1.groupby(obs_df_180hr_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day1_1_trimmed = obs_df_day1_1.groupby(obs_df_day1_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day2_1_trimmed = obs_df_day2_1.groupby(obs_df_day2_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day3_1_trimmed = obs_df_day3_1.groupby(obs_df_day3_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day4_1_trimmed = obs_df_day4_1.groupby(obs_df_day4_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day5_1_trimmed = obs_df_day5_1.groupby(obs_df_day5_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day6_1_trimmed = obs_df_day6_1.groupby(obs_df_day6_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day7_1_trimmed = obs_df_day7_1.groupby(obs_df_day7_1.index // 6).apply(pd.DataFrame.sum,skipna=False)
-
+    obs_hourly_1 = accumulate(obs_hourly_1, 6)
 
     #grab the 6-hr accum precip values
-    obs_df_60hr_6,obs_df_84hr_6,obs_df_120hr_6,obs_df_180hr_6,obs_df_day1_6,obs_df_day2_6,obs_df_day3_6,obs_df_day4_6,obs_df_day5_6,\
-        obs_df_day6_6,obs_df_day7_6 = get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, \
-                                                  stations_with_PCPT24, all_stations, "PCPT6", start_date, end_date, date_list_obs)
-        
-    # grab the extra hour on the last outlook day
-    obs_df_60hr_6 = obs_df_60hr_6.append(obs_df_180hr_6.iloc[60],ignore_index=True)
-    obs_df_84hr_6 = obs_df_84hr_6.append(obs_df_180hr_6.iloc[84],ignore_index=True)
-    obs_df_120hr_6 = obs_df_120hr_6.append(obs_df_180hr_6.iloc[120],ignore_index=True)
-    obs_df_day1_6 = obs_df_day1_6.append(obs_df_180hr_6.iloc[24],ignore_index=True)
-    obs_df_day2_6 = obs_df_day2_6.append(obs_df_180hr_6.iloc[48],ignore_index=True)
-    obs_df_day3_6 = obs_df_day3_6.append(obs_df_180hr_6.iloc[72],ignore_index=True)
-    obs_df_day4_6 = obs_df_day4_6.append(obs_df_180hr_6.iloc[96],ignore_index=True)
-    obs_df_day5_6 = obs_df_day5_6.append(obs_df_180hr_6.iloc[120],ignore_index=True)
-    obs_df_day6_6 = obs_df_day6_6.append(obs_df_180hr_6.iloc[144],ignore_index=True)
-    obs_df_day7_6 = obs_df_day7_6.append(obs_df_180hr_6.iloc[168],ignore_index=True)
-    
-    
-    # remove all values except the ones every 6 hours (6 UTC, 12 UTC, etc. (skipping the first))
-    obs_df_60hr_6_trimmed = obs_df_60hr_6.iloc[::6, :][1:].reset_index(drop=True) #grabs every 6 hours (skipping hour 0)
-    obs_df_84hr_6_trimmed = obs_df_84hr_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_120hr_6_trimmed = obs_df_120hr_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_180hr_6_trimmed = obs_df_180hr_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_day1_6_trimmed = obs_df_day1_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_day2_6_trimmed = obs_df_day2_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_day3_6_trimmed = obs_df_day3_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_day4_6_trimmed = obs_df_day4_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_day5_6_trimmed = obs_df_day5_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_day6_6_trimmed = obs_df_day6_6.iloc[::6, :][1:].reset_index(drop=True)
-    obs_df_day7_6_trimmed = obs_df_day7_6.iloc[::6, :][1:].reset_index(drop=True)
-    
+    obs_hourly_6, obs_stations_6 = get_precip_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, \
+        all_stations, "PCPT6", start_date, end_date, date_list_obs, stations_with_PCPT6)
     
     #combine the obs from manually accumulating 6 hours from hourly, and the pre-calculated 6 hours
-    obs_df_60hr_all = pd.concat([obs_df_60hr_1_trimmed, obs_df_60hr_6_trimmed],axis=1)
-    obs_df_84hr_all = pd.concat([obs_df_84hr_1_trimmed, obs_df_84hr_6_trimmed],axis=1)
-    obs_df_120hr_all = pd.concat([obs_df_120hr_1_trimmed, obs_df_120hr_6_trimmed],axis=1)
-    obs_df_180hr_all = pd.concat([obs_df_180hr_1_trimmed, obs_df_180hr_6_trimmed],axis=1)
-    obs_df_day1_all = pd.concat([obs_df_day1_1_trimmed, obs_df_day1_6_trimmed],axis=1)
-    obs_df_day2_all = pd.concat([obs_df_day2_1_trimmed, obs_df_day2_6_trimmed],axis=1)
-    obs_df_day3_all = pd.concat([obs_df_day3_1_trimmed, obs_df_day3_6_trimmed],axis=1)
-    obs_df_day4_all = pd.concat([obs_df_day4_1_trimmed, obs_df_day4_6_trimmed],axis=1)
-    obs_df_day5_all = pd.concat([obs_df_day5_1_trimmed, obs_df_day5_6_trimmed],axis=1)
-    obs_df_day6_all = pd.concat([obs_df_day6_1_trimmed, obs_df_day6_6_trimmed],axis=1)
-    obs_df_day7_all = pd.concat([obs_df_day7_1_trimmed, obs_df_day7_6_trimmed],axis=1)
-
-    return(obs_df_60hr_all,obs_df_84hr_all,obs_df_120hr_all,obs_df_180hr_all,obs_df_day1_all,obs_df_day2_all,obs_df_day3_all,obs_df_day4_all,\
-           obs_df_day5_all,obs_df_day6_all,obs_df_day7_all)
+    return(combine_accum_obs(obs_hourly_1, obs_stations_1, obs_hourly_6, obs_stations_6, delta))
 
 def PCPT_obs_df_24(date_list_obs, delta, input_variable, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, \
                    stations_with_PCPT24,all_stations,start_date, end_date):
     
-    # get the hourly precip values
-    _,_,_,obs_df_180hr_1,obs_df_day1_1,obs_df_day2_1,obs_df_day3_1,obs_df_day4_1,obs_df_day5_1,obs_df_day6_1,obs_df_day7_1 = \
-        get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, \
-                    all_stations, "PCPTOT", start_date, end_date, date_list_obs)
-            
-    # grab the extra hour on the last outlook day
-    obs_df_day1_1 = obs_df_day1_1.append(obs_df_180hr_1.iloc[180*delta + 24],ignore_index=True)
-    obs_df_day2_1 = obs_df_day2_1.append(obs_df_180hr_1.iloc[180*delta + 48],ignore_index=True)
-    obs_df_day3_1 = obs_df_day3_1.append(obs_df_180hr_1.iloc[180*delta + 72],ignore_index=True)
-    obs_df_day4_1 = obs_df_day4_1.append(obs_df_180hr_1.iloc[180*delta + 96],ignore_index=True)
-    obs_df_day5_1 = obs_df_day5_1.append(obs_df_180hr_1.iloc[180*delta + 120],ignore_index=True)
-    obs_df_day6_1 = obs_df_day6_1.append(obs_df_180hr_1.iloc[180*delta + 144],ignore_index=True)
-    obs_df_day7_1 = obs_df_day7_1.append(obs_df_180hr_1.iloc[180*delta + 168],ignore_index=True)
-    
-    
-    # remove the first hour (0 UTC)
-    obs_df_day1_1 = obs_df_day1_1.iloc[1:].reset_index(drop=True)
-    obs_df_day2_1 = obs_df_day2_1.iloc[1:].reset_index(drop=True)
-    obs_df_day3_1 = obs_df_day3_1.iloc[1:].reset_index(drop=True)
-    obs_df_day4_1 = obs_df_day4_1.iloc[1:].reset_index(drop=True)
-    obs_df_day5_1 = obs_df_day5_1.iloc[1:].reset_index(drop=True)
-    obs_df_day6_1 = obs_df_day6_1.iloc[1:].reset_index(drop=True)
-    obs_df_day7_1 = obs_df_day7_1.iloc[1:].reset_index(drop=True)
-  
+    # get the hourly precip values (only for stations that don't already have 24-hr accumulations)
+    stations_hourly = [st for st in stations_with_PCPTOT if st not in stations_with_PCPT24]
+    obs_hourly_1, obs_stations_1 = get_precip_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, \
+        all_stations, "PCPTOT", start_date, end_date, date_list_obs, stations_hourly)
     
-    # sum every 6 hours (1-6 UTC, 7-12 UTC etc). report NaN if any of the 6 hours is missing
-    obs_df_day1_1_trimmed = obs_df_day1_1.groupby(obs_df_day1_1.index // 24).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day2_1_trimmed = obs_df_day2_1.groupby(obs_df_day2_1.index // 24).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day3_1_trimmed = obs_df_day3_1.groupby(obs_df_day3_1.index // 24).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day4_1_trimmed = obs_df_day4_1.groupby(obs_df_day4_1.index // 24).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day5_1_trimmed = obs_df_day5_1.groupby(obs_df_day5_1.index // 24).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day6_1_trimmed = obs_df_day6_1.groupby(obs_df_day6_1.index // 24).apply(pd.DataFrame.sum,skipna=False)
-    obs_df_day7_1_trimmed = obs_df_day7_1.groupby(obs_df_day7_1.index // 24).apply(pd.DataFrame.sum,skipna=False)
-
+    # sum every 24 hours (1-24 UTC). report NaN if any of the 24 hours is missing
+    obs_hourly_1 = accumulate(obs_hourly_1, 24)
      
-    #grab the 6-hr accum precip values
-    _,_,_,obs_df_180hr_24,obs_df_day1_24,obs_df_day2_24,obs_df_day3_24,obs_df_day4_24,obs_df_day5_24,obs_df_day6_24,obs_df_day7_24 = \
-        get_all_obs(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, \
-                    all_stations, "PCPT24", start_date, end_date, date_list_obs)
-        
-    
-    # grab the extra hour on the last outlook day
-    obs_df_day1_24 = obs_df_day1_24.append(obs_df_180hr_24.iloc[24],ignore_index=True)
-    obs_df_day2_24 = obs_df_day2_24.append(obs_df_180hr_24.iloc[48],ignore_index=True)
-    obs_df_day3_24 = obs_df_day3_24.append(obs_df_180hr_24.iloc[72],ignore_index=True)
-    obs_df_day4_24 = obs_df_day4_24.append(obs_df_180hr_24.iloc[96],ignore_index=True)
-    obs_df_day5_24 = obs_df_day5_24.append(obs_df_180hr_24.iloc[120],ignore_index=True)
-    obs_df_day6_24 = obs_df_day6_24.append(obs_df_180hr_24.iloc[144],ignore_index=True)
-    obs_df_day7_24 = obs_df_day7_24.append(obs_df_180hr_24.iloc[168],ignore_index=True)
-    
-    # remove all values except the ones every 24 hours (24 (0) UTC, etc. (skipping the first))
-    obs_df_day1_24_trimmed = obs_df_day1_24.iloc[::24, :][1:].reset_index(drop=True)
-    obs_df_day2_24_trimmed = obs_df_day2_24.iloc[::24, :][1:].reset_index(drop=True)
-    obs_df_day3_24_trimmed = obs_df_day3_24.iloc[::24, :][1:].reset_index(drop=True)
-    obs_df_day4_24_trimmed = obs_df_day4_24.iloc[::24, :][1:].reset_index(drop=True)
-    obs_df_day5_24_trimmed = obs_df_day5_24.iloc[::24, :][1:].reset_index(drop=True)
-    obs_df_day6_24_trimmed = obs_df_day6_24.iloc[::24, :][1:].reset_index(drop=True)
-    obs_df_day7_24_trimmed = obs_df_day7_24.iloc[::24, :][1:].reset_index(drop=True)
+    #grab the 24-hr accum precip values
+    obs_hourly_24, obs_stations_24 = get_precip_hourly(delta, stations_with_SFCTC, stations_with_SFCWSPD, stations_with_PCPTOT, stations_with_PCPT6, stations_with_PCPT24, \
+        all_stations, "PCPT24", start_date, end_date, date_list_obs, stations_with_PCPT24)
     
-    #combine the obs from manually accumulating 6 hours from hourly, and the pre-calculated 6 hours
-    obs_df_day1_all = pd.concat([obs_df_day1_1_trimmed, obs_df_day1_24_trimmed],axis=1)
-    obs_df_day2_all = pd.concat([obs_df_day2_1_trimmed, obs_df_day2_24_trimmed],axis=1)
-    obs_df_day3_all = pd.concat([obs_df_day3_1_trimmed, obs_df_day3_24_trimmed],axis=1)
-    obs_df_day4_all = pd.concat([obs_df_day4_1_trimmed, obs_df_day4_24_trimmed],axis=1)
-    obs_df_day5_all = pd.concat([obs_df_day5_1_trimmed, obs_df_day5_24_trimmed],axis=1)
-    obs_df_day6_all = pd.concat([obs_df_day6_1_trimmed, obs_df_day6_24_trimmed],axis=1)
-    obs_df_day7_all = pd.concat([obs_df_day7_1_trimmed, obs_df_day7_24_trimmed],axis=1)
+    #combine the obs from manually accumulating 24 hours from hourly, and the pre-calculated 24 hours
+    return(combine_accum_obs(obs_hourly_1, obs_stations_1, obs_hourly_24, obs_stations_24, delta))
 
-    obs_df_60hr,obs_df_84hr,obs_df_120hr,obs_df_180hr = [],[],[],[]
+# stacks the accumulations from hourly obs on top of the pre-calculated ones and returns the obs cube
+# the value at each lead hour is the accumulation over the hours before it (only every 6th/24th hour is used)
+def combine_accum_obs(obs_hourly_1, obs_stations_1, obs_hourly_accum, obs_stations_accum, delta):
     
-    return(obs_df_60hr,obs_df_84hr,obs_df_120hr,obs_df_180hr,obs_df_day1_all,obs_df_day2_all,obs_df_day3_all,obs_df_day4_all,obs_df_day5_all,obs_df_day6_all,obs_df_day7_all)
-     
+    obs_stations = dict(obs_stations_1)
+    for station in obs_stations_accum:
+        obs_stations[station] = obs_stations_accum[station] + len(obs_hourly_1)
+    
+    return(make_obs_cube(np.concatenate([obs_hourly_1, obs_hourly_accum]), delta+1), obs_stations)
@@ -0,0 +1,151 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Stats for every lead hour, so the time windows (60hr, 84hr, 120hr, 180hr and day1-day7) are put together by
+adding up the lead hours in them instead of cutting the fcst and obs up again for every window. The "leads" are
+the lead hours 0-179 (the value at each hour), or the 6/24 hour accumulation periods for PCPT6/PCPT24 (hours 1-6,
+7-12 etc, labelled by their last hour).
+
+For every lead the (init date, lead) fcst and obs are station averaged and rounded to one decimal (same as
+get_statistics always did), then the count, sum of the errors, absolute errors and squared errors are added up in
+tenths as integers, so a window is exactly the sum of its lead hours. The same sums give the error curve for
+every lead hour. The correlations and sd ratio can't be added up, so they're worked out from the window's pairs
+for every window at once (utl/metrics.py).
+"""
+import math
+import numpy as np
+from utl.obs_cube import lead_hours, obs_values
+from utl.metrics import continuous_metrics, metric_names, pad_rows
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# time windows (name, lead hour the model needs to go out to, first and last lead hour, values per init date)
+time_domains = [('180hr', 180, 0, 180, 180), ('120hr', 120, 0, 120, 120), ('84hr', 84, 0, 84, 84), ('60hr', 60, 0, 60, 60), \
+                ('day7', 168, 144, 168, 24), ('day6', 144, 120, 144, 24), ('day5', 120, 96, 120, 24), ('day4', 96, 72, 96, 24), \
+                ('day3', 72, 48, 72, 24), ('day2', 48, 24, 48, 24), ('day1', 24, 0, 24, 24)]
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+def accum_hours(variable):
+
+    if variable == "PCPT6":
+        return(6)
+    elif variable == "PCPT24":
+        return(24)
+
+    return(1)
+
+# the time windows that have stats for the model/grid (PCPT24 only has the day windows)
+def get_time_domains(variable, maxhour):
+
+    return([time_domain for time_domain in time_domains if int(maxhour) >= time_domain[1] and not (variable == "PCPT24" and "hr" in time_domain[0])])
+
+# (init date, lead) fcst and obs at one station, with the fcst NaN wherever there is no obs
+# all_fcst is the (init date, lead hour) fcst from get_fcst, obs_station the station's slice of the obs cube
+def station_leads(all_fcst, obs_station, variable):
+
+    hours = accum_hours(variable)
+    num_leads = (lead_hours-1)//hours
+
+    if hours > 1:
+        # sums every 6 (or 24) hours skipping the first hour (1-6, 7-12 etc), NaN if any hour is missing
+        fcst = np.reshape(all_fcst[:,1:num_leads*hours+1], (len(all_fcst), num_leads, hours)).sum(axis=-1)
+
+        # the obs are already accumulated, so take the value at the end of each period (hours 6, 12 etc)
+        obs = obs_values(obs_station[:,hours:num_leads*hours+1:hours])
+    else:
+        fcst = np.array(all_fcst[:,:num_leads], dtype=np.float64)
+        obs = obs_values(obs_station[:,:num_leads])
+
+    fcst[np.isnan(obs)] = np.nan
+
+    return(fcst, obs)
+
+# leads from lead hour start to end (as a slice of the lead axis)
+def lead_range(start, end, variable, maxhour):
+
+    hours = accum_hours(variable)
+
+    # the last accumulation period doesn't exist for the fcst at the maxhour
+    if hours > 1 and int(end) == int(maxhour):
+        end = end - hours
+
+    return(slice(start//hours, max(start, end)//hours))
+
+# the leads in each time window the model/grid has stats for (same order as get_time_domains)
+def model_windows(variable, maxhour):
+
+    return([lead_range(start, end, variable, maxhour) for _, _, start, end, _ in get_time_domains(variable, maxhour)])
+
+# station averages every (init date, lead) and adds up the count and errors for each lead
+# fcst_allstations/obs_allstations are the station_leads for every station
+def lead_sums(fcst_allstations, obs_allstations):
+
+    fcst_avg = np.nanmean(fcst_allstations, axis=0)
+    obs_avg = np.nanmean(obs_allstations, axis=0)
+
+    valid = ~np.isnan(fcst_avg)
+
+    # rounds each forecast and obs to one decimal
+    fcst_rounded = np.where(valid, np.round(fcst_avg, 1), np.nan)
+    obs_rounded = np.where(valid, np.round(obs_avg, 1), np.nan)
+
+    error = np.where(valid, np.round(obs_rounded*10) - np.round(fcst_rounded*10), 0).astype(np.int64)
+
+    return({'fcst': fcst_rounded, 'obs': obs_rounded, 'count': valid.sum(axis=0), 'sum_err': error.sum(axis=0), \
+            'sum_abs': np.abs(error).sum(axis=0), 'sum_sq': (error**2).sum(axis=0)})
+
+# {count, bias, MAE, RMSE, pearson, spearman, sd_ratio} for each window, windows is [(lead_sums, leads)] with the
+# leads as a slice (they can be from different model/grids). the correlations and sd ratio for every window come
+# from one call to continuous_metrics (the pairs init date by init date, same as they used to be), the rest are
+# the exact sums over the window's leads
+def window_metrics(windows):
+
+    fcst = pad_rows([sums['fcst'][:,leads].flatten() for sums, leads in windows])
+    obs = pad_rows([sums['obs'][:,leads].flatten() for sums, leads in windows])
+    metrics = continuous_metrics(fcst, obs)
+
+    window_list = []
+    for i, (sums, leads) in enumerate(windows):
+        window = {name: metrics[name][i] for name in metric_names}
+
+        count = int(sums['count'][leads].sum())
+        window['count'] = count
+        if count > 0:
+            window['bias'] = -int(sums['sum_err'][leads].sum())/10/count
+            window['MAE'] = int(sums['sum_abs'][leads].sum())/10/count
+            window['RMSE'] = math.sqrt(int(sums['sum_sq'][leads].sum())/100/count)
+
+        window_list.append(window)
+
+    return(window_list)
+
+# [(lead hour, count, bias, MAE, RMSE)] for every lead the model has (fcst - obs for the bias)
+# the lead hours are 0 based like the windows, so an hourly variable goes from 0 (the value at the init time) to
+# maxhour-1 (0-179 for a 180 hour model, the same hours the 180hr window has always used), not 1-180
+def lead_curve(sums, variable, maxhour):
+
+    hours = accum_hours(variable)
+
+    # hours before the maxhour (for PCPT6/PCPT24 the periods that end before it, same as the windows)
+    num_leads = int(maxhour) if hours == 1 else (int(maxhour)-1)//hours
+
+    curve = []
+    for lead in range(min(num_leads, len(sums['count']))):
+        count = int(sums['count'][lead])
+        if count == 0:
+            continue
+
+        # the value at hour h (or the accumulation ending at it)
+        lead_hour = lead if hours == 1 else (lead+1)*hours
+        curve.append((lead_hour, count, -int(sums['sum_err'][lead])/10/count, int(sums['sum_abs'][lead])/10/count, \
+                      math.sqrt(int(sums['sum_sq'][lead])/100/count)))
+
+    return(curve)
@@ -0,0 +1,116 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+The continuous stats for many sets of fcst/obs pairs at once. fcst and obs are (rows, samples) arrays, one row for
+each model/time window etc, with NaN wherever there isn't a pair (rows with fewer pairs are padded with NaN). The
+NaNs are masked once and every stat is worked out for every row together, in place of dropping the NaNs one value
+at a time and calling sklearn/scipy for each stat of each row (see testing/benchmark_metrics.py).
+
+The spearman correlation ranks the pairs in each row the same way scipy.stats.spearmanr does (ties get the
+average rank) and takes the pearson correlation of the ranks. The ranks of every row come from counting the valid
+values (not the NaN padding) into levels all at once, so nothing is sorted row by row (see
+testing/benchmark_spearman.py).
+"""
+import numpy as np
+import warnings
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# stats returned by continuous_metrics
+metric_names = ['count', 'bias', 'MAE', 'RMSE', 'pearson', 'spearman', 'sd_ratio']
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# average rank (starting at 1) of every valid value in each row, NaN for the others. every value is swapped for its
+# level among all the values (its tenths when they're all rounded to one decimal, like the station averages, or
+# its position among the sorted values) and each row's values are counted into the levels, so the number below
+# any value is a cumulative sum and every row is ranked at once. tied values get the middle rank of the tie
+def rank_rows(values, valid):
+
+    num_rows = len(values)
+    valid_values = values[valid]
+
+    tenths = np.round(valid_values*10)
+    if len(valid_values) > 0 and np.array_equal(tenths/10, valid_values):
+        level_index = (tenths - tenths.min()).astype(np.int64)
+        num_levels = int(level_index.max()) + 1
+    else:
+        levels, level_index = np.unique(valid_values, return_inverse=True)
+        level_index, num_levels = level_index.ravel(), max(len(levels), 1)
+
+    row_index = np.broadcast_to(np.arange(num_rows)[:,None], np.shape(values))[valid]
+    keys = row_index*num_levels + level_index
+
+    # number of values in each row before each level (rows start after all the values of the rows before them)
+    num_valid = np.sum(valid, axis=1)
+    row_start = np.cumsum(num_valid) - num_valid
+
+    if num_rows*num_levels <= 10*len(keys) + num_rows:
+        counts = np.bincount(keys, minlength=num_rows*num_levels)
+        before = np.cumsum(counts) - counts - np.repeat(row_start, num_levels)
+        key_ranks = (before + (counts + 1)/2)[keys]
+    else:
+        # too many levels to count into, the keys are sorted instead
+        unique_keys, key_index, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        before = np.cumsum(counts) - counts - row_start[unique_keys // num_levels]
+        key_ranks = (before + (counts + 1)/2)[key_index.ravel()]
+
+    ranks = np.full(np.shape(values), np.nan)
+    ranks[valid] = key_ranks
+
+    return(ranks)
+
+# difference from the row mean of the valid values (0 where not valid)
+def anomalies(values, valid, count):
+
+    return(np.where(valid, values - np.where(valid, values, 0).sum(axis=1, keepdims=True)/count[:,None], 0))
+
+# pearson correlation of each row of x and y (only where valid)
+def correlate_rows(x, y, valid, count):
+
+    x_anom, y_anom = anomalies(x, valid, count), anomalies(y, valid, count)
+
+    return(np.sum(x_anom*y_anom, axis=1)/np.sqrt(np.sum(x_anom**2, axis=1)*np.sum(y_anom**2, axis=1)))
+
+# {stat: array with one value for each row} for the metric_names (NaN for rows with no pairs)
+def continuous_metrics(fcst, obs):
+
+    fcst = np.atleast_2d(np.asarray(fcst, dtype=np.float64))
+    obs = np.atleast_2d(np.asarray(obs, dtype=np.float64))
+
+    valid = ~np.isnan(fcst) & ~np.isnan(obs)
+    count = valid.sum(axis=1)
+
+    # rows with no pairs (or no variance) give NaN instead of a warning
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        error = np.where(valid, fcst - obs, 0)
+        metrics = {'count': count, 'bias': error.sum(axis=1)/count, 'MAE': np.abs(error).sum(axis=1)/count, \
+                   'RMSE': np.sqrt((error**2).sum(axis=1)/count)}
+
+        metrics['pearson'] = correlate_rows(fcst, obs, valid, count)
+        metrics['spearman'] = correlate_rows(rank_rows(fcst, valid), rank_rows(obs, valid), valid, count)
+
+        metrics['sd_ratio'] = np.sqrt(np.sum(anomalies(fcst, valid, count)**2, axis=1)/np.sum(anomalies(obs, valid, count)**2, axis=1))
+
+    for name in ['pearson', 'spearman', 'sd_ratio']:
+        metrics[name][count < 2] = np.nan
+
+    return(metrics)
+
+# (rows, samples) array from a list of 1D arrays of different lengths, padded with NaN
+def pad_rows(rows):
+
+    padded = np.full((len(rows), max([len(row) for row in rows] + [1])), np.nan)
+    for i, row in enumerate(rows):
+        padded[i,:len(row)] = row
+
+    return(padded)
@@ -0,0 +1,217 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Archive of the hourly obs for each variable, so the scripts don't have to open hundreds of station sqlite
+files every run. Each variable folder has one .npz chunk per month (YYYYMM.npz) holding a station x hour
+float32 array (hour 0 is 00 UTC on the first of the month) and the station IDs of the rows, plus an
+index.json with the last date that had data, the last date that was checked and the modified time of the
+sqlite file when it was read for every station.
+
+Only the days from the last date with data onwards are read from the sqlite files when the archive is
+updated, so obs that come in late still get picked up. A station whose sqlite file has changed since it was
+last read is read again from first_date, even if it was already checked up to the end date (the end date can
+be in the future for the latest runs), so edits to obs that are already archived get picked up too. The hours
+that are read replace what the archive had for them, and a chunk is only saved if something in it changed.
+The -999 missing values are turned into NaNs.
+"""
+import os
+import json
+import fcntl
+import numpy as np
+from utl.sql_reader import read_obs
+from utl.align import obs_hour_slots, to_datetime64
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#location where obs files are (all sql databases should be in this directory)
+obs_filepath = "/verification/Observations/"
+
+#location of the archive (one folder for each variable)
+archive_filepath = "/verification/Cache/Observations/"
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# when the obs collection started (YYMMDD), new stations are read from here
+first_date = '211001'
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# loaded chunks for this process, keyed by path (reloaded if the file changes)
+_loaded_chunks = {}
+
+def read_index(folder):
+
+    if not os.path.isfile(folder + 'index.json'):
+        return({'stations': {}})
+
+    with open(folder + 'index.json') as f:
+        return(json.load(f))
+
+# writes to a temp file first so readers never see a half written file
+def write_index(folder, index):
+
+    with open(folder + 'index.json.tmp', 'w') as f:
+        json.dump(index, f)
+
+    os.replace(folder + 'index.json.tmp', folder + 'index.json')
+
+# the months (numpy datetime64[M]) from date1 to date2 (YYYYMMDD)
+def month_range(date1, date2):
+
+    return(np.arange(to_datetime64(date1).astype('datetime64[M]'), to_datetime64(date2).astype('datetime64[M]') + 1))
+
+def chunk_path(folder, month):
+
+    return(folder + str(month).replace('-', '') + '.npz')
+
+# returns (stations, station x hour obs) for the month, empty if there is no chunk yet
+def load_chunk(folder, month):
+
+    path = chunk_path(folder, month)
+    if not os.path.isfile(path):
+        hours = int(((month + 1).astype('datetime64[D]') - month.astype('datetime64[D]')).astype(np.int64))*24
+        return(np.array([], dtype=str), np.full((0, hours), np.nan, dtype=np.float32))
+
+    mtime = os.path.getmtime(path)
+    if path not in _loaded_chunks or _loaded_chunks[path][0] != mtime:
+        with np.load(path) as chunk:
+            _loaded_chunks[path] = (mtime, chunk['stations'], chunk['obs'])
+
+    return(_loaded_chunks[path][1], _loaded_chunks[path][2])
+
+def save_chunk(folder, month, stations, obs):
+
+    path = chunk_path(folder, month)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, stations=stations, obs=obs)
+
+    os.replace(path + '.tmp', path)
+
+# reads any obs up to end_date (YYMMDD) that aren't in the archive yet for the given stations
+def update_obs_archive(variable, stations, end_date):
+
+    folder = archive_filepath + variable + '/'
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    # one writer at a time for each variable
+    lock = open(folder + '.lock', 'w')
+    fcntl.flock(lock, fcntl.LOCK_EX)
+
+    try:
+        index = read_index(folder)
+        last_date = int("20" + str(end_date))
+
+        # {month: [(station, first hour read, last hour read + 1, hours in the month, vals)]}
+        new_obs = {}
+
+        for station in stations:
+            entry = index['stations'].get(station, {'last_date': int("20" + first_date), 'checked_date': 0})
+            sql_path = obs_filepath + variable + '/' + station + '.sqlite'
+            if not os.path.isfile(sql_path):
+                continue
+
+            # taken before reading, so obs added while it's being read get picked up next time
+            mtime = os.path.getmtime(sql_path)
+            if entry['checked_date'] >= last_date and entry.get('mtime') == mtime:
+                continue
+
+            # a file that has changed (or that hasn't been read before) is read again from the start
+            date1 = entry['last_date'] if entry.get('mtime') == mtime else int("20" + first_date)
+            dates, times, vals = read_obs(sql_path, date1, last_date)
+            vals[vals == -999] = np.nan
+
+            months = to_datetime64(dates).astype('datetime64[M]')
+            for month in month_range(date1, last_date):
+                in_month = months == month
+                if not in_month.any() and not os.path.isfile(chunk_path(folder, month)):
+                    continue
+
+                month_start = month.astype('datetime64[D]')
+                month_days = int(((month + 1).astype('datetime64[D]') - month_start).astype(np.int64))
+                hour1 = max(0, int((to_datetime64(date1) - month_start).astype(np.int64))*24)
+                hour2 = min(month_days*24, int((to_datetime64(last_date) - month_start).astype(np.int64) + 1)*24)
+
+                hours = obs_hour_slots(dates[in_month], times[in_month], str(month).replace('-', '')[2:] + '01', month_days)
+                new_obs.setdefault(month, []).append((station, hour1, hour2, hours, vals[in_month]))
+
+            if len(dates) > 0:
+                entry['last_date'] = max(entry['last_date'], int(dates.max()))
+            entry['checked_date'] = max(entry['checked_date'], last_date)
+            entry['mtime'] = mtime
+            index['stations'][station] = entry
+
+        for month in new_obs:
+            old_stations, old_obs = load_chunk(folder, month)
+            rows = {station: row for row, station in enumerate(old_stations)}
+
+            # stations only get a row once they have obs in the month
+            added = [station for station, _, _, _, vals in new_obs[month] if station not in rows and len(vals) > 0]
+            chunk_stations = np.concatenate([old_stations, np.array(added, dtype=str)])
+            chunk_obs = np.concatenate([old_obs, np.full((len(added), np.shape(old_obs)[1]), np.nan, dtype=np.float32)])
+            rows = {station: row for row, station in enumerate(chunk_stations)}
+
+            for station, hour1, hour2, hours, vals in new_obs[month]:
+                if station not in rows:
+                    continue
+
+                inside = (hours >= 0) & (hours < np.shape(chunk_obs)[1])
+                chunk_obs[rows[station], hour1:hour2] = np.nan
+                chunk_obs[rows[station], hours[inside]] = vals[inside]
+
+            if len(added) > 0 or not np.array_equal(chunk_obs, old_obs, equal_nan=True):
+                save_chunk(folder, month, chunk_stations, chunk_obs)
+
+        write_index(folder, index)
+
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+# whether the station has been checked up to end_date (YYYYMMDD) and its sqlite file hasn't changed since
+def is_covered(variable, station, index, end_date):
+
+    if station not in index['stations'] or index['stations'][station]['checked_date'] < end_date:
+        return(False)
+
+    sql_path = obs_filepath + variable + '/' + station + '.sqlite'
+    return(os.path.isfile(sql_path) and index['stations'][station].get('mtime') == os.path.getmtime(sql_path))
+
+# reads num_hours of hourly obs for the stations starting at 00 UTC on start_date (YYMMDD)
+# returns a station x hour float32 array (NaN where there is no data) and whether each station has been
+# checked up to the last hour with nothing new since (the ones that haven't need to be read from the sqlite files)
+def read_obs_archive(variable, stations, start_date, num_hours):
+
+    folder = archive_filepath + variable + '/'
+    index = read_index(folder)
+
+    start = to_datetime64(int("20" + str(start_date)))
+    end = start + np.timedelta64((num_hours-1)//24, 'D')
+    end_date = int(str(end).replace('-', ''))
+
+    obs = np.full((len(stations), num_hours), np.nan, dtype=np.float32)
+    covered = np.array([is_covered(variable, station, index, end_date) for station in stations], dtype=bool)
+
+    for month in month_range(int("20" + str(start_date)), end_date):
+        chunk_stations, chunk_obs = load_chunk(folder, month)
+        rows = {station: row for row, station in enumerate(chunk_stations)}
+
+        # hours of the month inside the range
+        offset = int((month.astype('datetime64[D]') - start).astype(np.int64))*24
+        hour1 = max(0, -offset)
+        hour2 = min(np.shape(chunk_obs)[1], num_hours - offset)
+
+        for i, station in enumerate(stations):
+            if station in rows:
+                obs[i, offset+hour1:offset+hour2] = chunk_obs[rows[station], hour1:hour2]
+
+    return(obs, covered)
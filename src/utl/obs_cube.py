@@ -0,0 +1,61 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+The obs used to be copied into eleven dataframes (one for each time window: 60hr, 84hr, ... day7). They now
+live in one float32 cube indexed by (station, init date, lead hour), where every init date is a strided view
+into the same hourly obs, so neither the cube nor the time windows (cube[:, :, start:end]) copy any data.
+
+Lead hour 0 is 00 UTC on the init date and the cube goes out to lead hour 180 (the extra hour at the end is
+needed for the precip accumulations).
+"""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# lead hours 0-180
+lead_hours = 181
+
+# obs are saved with at most two decimals, used to undo the float32 rounding
+obs_decimals = 2
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# makes the (station, init date, lead hour) cube from the hourly obs (station x hour, starting at 00 UTC
+# on the first init date). This is a view, so it is read only
+def make_obs_cube(obs_hourly, num_days):
+
+    obs_hourly = np.ascontiguousarray(obs_hourly, dtype=np.float32)
+    num_stations, num_hours = np.shape(obs_hourly)
+
+    if num_hours < (num_days-1)*24 + lead_hours:
+        raise Exception("Not enough hourly obs (" + str(num_hours) + ") for " + str(num_days) + " init dates out to hour " + str(lead_hours-1))
+
+    station_stride, hour_stride = obs_hourly.strides
+
+    return(as_strided(obs_hourly, shape=(num_stations, num_days, lead_hours), strides=(station_stride, 24*hour_stride, hour_stride), writeable=False))
+
+# accumulation over the previous n hours at every hour (the value at hour 6 is hours 1-6)
+# NaN if any of the hours is missing (same as summing with skipna=False)
+def accumulate(obs_hourly, hours):
+
+    obs_hourly = np.asarray(obs_hourly, dtype=np.float64)
+    num_hours = np.shape(obs_hourly)[-1]
+
+    accum = np.full(np.shape(obs_hourly), np.nan)
+    if num_hours >= hours:
+        accum[..., hours-1:] = sum(obs_hourly[..., i:num_hours-hours+1+i] for i in range(hours))
+
+    return(accum)
+
+# float64 copy of a piece of the cube with the original obs values
+def obs_values(obs):
+
+    return(np.round(np.asarray(obs, dtype=np.float64), obs_decimals))
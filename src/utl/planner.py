@@ -0,0 +1,121 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Works out which get_rankings runs (one model/grid, variable and domain for a date range, which saves the results
+for every time window) actually need to be done, before any fcst or obs are read. A run is skipped when the
+results store (utl/results_store.py) already has every time window for it, unless one of the saved results was
+incomplete (a station had no fcst or obs data, or there were no pairs at all) and the fcst or obs files have
+changed since it was saved, so the missing data might be there now. A complete result can't change, so it is
+never redone.
+
+The mtimes of the files come from the catalog (utl/catalog.py), so they are only as new as the last
+update-catalog.py run.
+"""
+import numpy as np
+from utl.catalog import obs_filepath, newest_mtime, station_rows
+from utl.results_store import window_results
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# time windows and the lead hour they go out to
+time_domains = [('180hr',180), ('120hr',120), ('84hr',84), ('60hr',60), ('day7',168), ('day6',144), ('day5',120), \
+                ('day4',96), ('day3',72), ('day2',48), ('day1',24)]
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# the time windows get_rankings saves a result for
+def expected_windows(variable, maxhour):
+
+    return([time_domain for time_domain, hour in time_domains if int(maxhour) >= hour and not (variable == "PCPT24" and "hr" in time_domain)])
+
+# whether every station had data and there were pairs ("count/total" for both, the pairs total is per init date
+# so the count can't be compared to it)
+def is_complete(result):
+
+    num_pairs = str(result['len_fcst']).split("/")[0]
+    num_stations, total_stations = str(result['numstations']).split("/")
+
+    return(int(num_pairs) > 0 and int(num_stations) == int(total_stations))
+
+# folders of the files the run reads (the fcst and the obs for the variable)
+def input_folders(filepath, variable):
+
+    obs_variable = variable[:-3] if "_KF" in variable else variable
+    folders = [filepath, obs_filepath + obs_variable + '/']
+
+    # PCPT6 and PCPT24 also use the hourly precip obs
+    if variable in ["PCPT6", "PCPT24"]:
+        folders.append(obs_filepath + 'PCPTOT/')
+
+    return(folders)
+
+# why the run has to be done, or None if its results are already saved
+def run_reason(table, args):
+
+    results = window_results(table, args['model'], args['grid'], args['input_domain'], args['variable'], args['savetype'], \
+                             args['date_entry1'], args['date_entry2'])
+
+    missing = [time_domain for time_domain in expected_windows(args['variable'], args['maxhour']) if time_domain not in results]
+    if len(missing) > 0:
+        return("no results for " + ",".join(missing))
+
+    # results imported from the text files don't have a saved time, so they're left as they are
+    saved = [result['saved'] for result in results.values() if not is_complete(result) and result['saved'] is not None]
+    if len(saved) == 0:
+        return(None)
+
+    mtimes = [mtime for mtime in [newest_mtime(folder) for folder in input_folders(args['filepath'], args['variable'])] if mtime is not None]
+    if len(mtimes) > 0 and max(mtimes) > min(saved):
+        return("incomplete results and the files have changed since")
+
+    return(None)
+
+# estimated number of fcst files and rows the run reads (from the catalog)
+def run_cost(args):
+
+    stations = np.array(args['station_df'].query(args['model'] + args['gridname'] + "==1")["Station ID"], dtype='str')
+    rows = station_rows(args['filepath'])
+
+    num_files, num_rows = 0, 0
+    for station in stations:
+        if station not in args['all_stations']:
+            continue
+
+        if len(station) < 4:
+            station = "0" + station
+
+        if station in rows and rows[station][0] > 0:
+            num_dates, station_num_rows = rows[station]
+            num_files = num_files + 1
+            num_rows = num_rows + station_num_rows/num_dates*(args['delta']+1)
+
+    return(num_files, int(num_rows))
+
+# [(get_rankings arguments, reason to run it or None)] for each run
+def plan_rankings(table, rankings_args):
+
+    return([(args, run_reason(table, args)) for args in rankings_args])
+
+# prints each run in the plan and the estimated cost of the ones that will be done
+def print_plan(plan):
+
+    total_files, total_rows, num_runs = 0, 0, 0
+    for args, reason in plan:
+        name = args['model'] + args['gridname'] + " " + args['variable'] + " (" + args['input_domain'] + ")"
+
+        if reason is None:
+            print("   skip " + name + ": already saved")
+            continue
+
+        num_files, num_rows = run_cost(args)
+        total_files, total_rows, num_runs = total_files + num_files, total_rows + num_rows, num_runs + 1
+        print("   run  " + name + ": " + reason + " (" + str(num_files) + " fcst files, ~" + str(num_rows) + " rows)")
+
+    print(str(num_runs) + "/" + str(len(plan)) + " runs to do, reading " + str(total_files) + " fcst files (~" + str(total_rows) + " rows)")
@@ -0,0 +1,398 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Quality control of the hourly obs as masks over whole (station x hour) arrays, in place of checking the obs one
+value at a time. Each check sets a bit in a uint8 array of flags:
+    - SENTINEL: the -999 missing value
+    - BOUNDS: outside the physical bounds (the records for Canada)
+    - SPIKE: jumps away from both the hour before and the hour after by more than the spike limit (up and back
+      down, or down and back up)
+    - FLATLINE: the same value for flatline_hours or more in a row (a stuck sensor). calm winds don't count
+    - STEP: the average over the next step_hours is more than the step limit away from the average over the
+      step_hours before (a sensor that was moved or swapped)
+The scripts each pick which checks take obs out (obs_checks in utl/funcs.py etc). The flags for an hour only
+depend on the obs up to context_hours on either side of it.
+
+The flags for the obs archive (utl/obs_archive.py) are worked out for a whole monthly chunk at once and saved in
+the QC folder with the qc_version and the modified times of the chunk and the months on either side of it (the
+checks look across the month boundaries). They're only worked out again when one of those
+changes or the qc_version goes up, so every script reads the same flags for an hour no matter which dates it
+reads.
+
+update-qc-flags.py also keeps the flags in an indexed sqlite table, one row for each (variable, station, valid
+hour) that has a flag. Each day it only checks the hours since the last obs it checked at each station (plus the
+context_hours before them, which the new obs can change), so the whole history is only gone through the first
+time (or when the qc_version goes up). read_qc_flags reads the table for the stations it's up to date for and
+only works out the monthly flags for the rest.
+"""
+import os
+import sqlite3
+import numpy as np
+from utl.obs_archive import archive_filepath, first_date, chunk_path, load_chunk, month_range, read_obs_archive
+from utl.align import to_datetime64
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#location of the saved flags (one folder for each variable, same months as the obs archive)
+qc_filepath = "/verification/Cache/QC/"
+
+#the flag table kept up to date by update-qc-flags.py
+qc_flags_file = "/verification/Cache/qc_flags.sqlite"
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# goes up whenever the checks or limits below change, so the saved flags get worked out again
+qc_version = 2
+
+# flag bits
+SENTINEL = 1
+BOUNDS = 2
+SPIKE = 4
+FLATLINE = 8
+STEP = 16
+ALL_CHECKS = SENTINEL | BOUNDS | SPIKE | FLATLINE | STEP
+
+missing_value = -999
+
+# thresholds for discluding erroneous data
+precip_threshold = 250 #recorded at Buffalo Gap 1961 https://www.canada.ca/en/environment-climate-change/services/water-overview/quantity/floods/events-prairie-provinces.html
+wind_threshold = 400 #recorded Edmonton, AB 1987 http://wayback.archive-it.org/7084/20170925152846/https://www.ec.gc.ca/meteo-weather/default.asp?lang=En&n=6A4A3AC5-1#tab5
+temp_min = -63 #recorded in Snag, YT 1947 http://wayback.archive-it.org/7084/20170925152846/https://www.ec.gc.ca/meteo-weather/default.asp?lang=En&n=6A4A3AC5-1#tab5
+temp_max = 49.6 #recorded in Lytton, BC 2021 https://www.canada.ca/en/environment-climate-change/services/top-ten-weather-stories/2021.html#toc2
+
+# (lower, upper) physical bounds, None for no bound
+physical_bounds = {'SFCTC': (temp_min, temp_max), 'SFCWSPD': (None, wind_threshold), 'PCPTOT': (None, precip_threshold)}
+
+# largest change in one hour that isn't a spike (C, km/hr). precip isn't checked, it really does come and go
+spike_limits = {'SFCTC': 10, 'SFCWSPD': 60}
+
+# hours in a row with the same value that count as a stuck sensor
+flatline_hours = {'SFCTC': 24, 'SFCWSPD': 24}
+
+# change between the averages of the step_hours before and after an hour that counts as a step (C, km/hr)
+step_limits = {'SFCTC': 8, 'SFCWSPD': 40}
+step_hours = 6
+
+# hours on either side that the flags for an hour depend on
+context_hours = max(list(flatline_hours.values()) + [step_hours, 1])
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# flags read this process ({path: (source, stations, flags)})
+_loaded_flags = {}
+
+# KF variables are the same as raw for obs
+def qc_variable(variable):
+
+    return(variable[:-3] if variable.endswith("_KF") else variable)
+
+def sentinel_mask(values):
+
+    return(np.asarray(values) == missing_value)
+
+def bounds_mask(obs, variable):
+
+    lower, upper = physical_bounds.get(qc_variable(variable), (None, None))
+
+    mask = np.zeros(np.shape(obs), dtype=bool)
+    if lower is not None:
+        mask |= obs < lower
+    if upper is not None:
+        mask |= obs > upper
+
+    return(mask)
+
+def spike_mask(obs, variable):
+
+    limit = spike_limits.get(qc_variable(variable))
+
+    mask = np.zeros(np.shape(obs), dtype=bool)
+    if limit is None or np.shape(obs)[-1] < 3:
+        return(mask)
+
+    # change from the hour before and to the hour after (NaN next to a missing hour, which is never a spike)
+    rise = obs[..., 1:-1] - obs[..., :-2]
+    fall = obs[..., 1:-1] - obs[..., 2:]
+    mask[..., 1:-1] = (np.abs(rise) > limit) & (np.abs(fall) > limit) & (np.sign(rise) == np.sign(fall))
+
+    return(mask)
+
+def flatline_mask(obs, variable):
+
+    hours = flatline_hours.get(qc_variable(variable))
+
+    mask = np.zeros(np.shape(obs), dtype=bool)
+    if hours is None or np.size(obs) == 0:
+        return(mask)
+
+    # a new run starts wherever the value changes (or is missing) and at the start of every row, the runs of all
+    # the rows are numbered at once and counted with one bincount
+    same = np.zeros(np.shape(obs), dtype=bool)
+    same[..., 1:] = obs[..., 1:] == obs[..., :-1]
+
+    run = np.cumsum(~same.ravel()) - 1
+    mask = (np.bincount(run)[run] >= hours).reshape(np.shape(obs)) & ~np.isnan(obs)
+
+    # calm winds can last all day
+    if qc_variable(variable) == 'SFCWSPD':
+        mask &= obs != 0
+
+    return(mask)
+
+def step_mask(obs, variable):
+
+    limit = step_limits.get(qc_variable(variable))
+    num_hours = np.shape(obs)[-1]
+
+    mask = np.zeros(np.shape(obs), dtype=bool)
+    if limit is None or num_hours < 2*step_hours:
+        return(mask)
+
+    # average over every step_hours window (added up from shifted slices rather than a running sum, so the
+    # rounding is the same however much history there is), only full windows are compared
+    valid = ~np.isnan(obs)
+    values = np.where(valid, obs, 0)
+    window_mean = sum(values[..., i:num_hours-step_hours+1+i] for i in range(step_hours))/step_hours
+    full = sum(valid[..., i:num_hours-step_hours+1+i].astype(np.int64) for i in range(step_hours)) == step_hours
+
+    # the windows ending just before and starting at each hour
+    before, after = slice(0, num_hours - 2*step_hours + 1), slice(step_hours, None)
+    mask[..., step_hours:num_hours - step_hours + 1] = full[..., before] & full[..., after] & \
+                                                        (np.abs(window_mean[..., after] - window_mean[..., before]) > limit)
+
+    return(mask)
+
+# flags for the obs (station x hour, or one station's hours). the -999 values are only flagged as SENTINEL, the
+# other checks treat them as missing
+def qc_flags(obs, variable, checks=ALL_CHECKS):
+
+    obs = np.array(obs, dtype=np.float64)
+
+    flags = np.zeros(np.shape(obs), dtype=np.uint8)
+    if checks & SENTINEL:
+        flags[sentinel_mask(obs)] |= SENTINEL
+    obs[sentinel_mask(obs)] = np.nan
+
+    with np.errstate(invalid='ignore'):
+        for bit, mask in [(BOUNDS, bounds_mask), (SPIKE, spike_mask), (FLATLINE, flatline_mask), (STEP, step_mask)]:
+            if checks & bit:
+                flags[mask(obs, variable)] |= bit
+
+    return(flags)
+
+# copy of the obs with NaN wherever one of the checks is flagged
+def remove_flagged(obs, flags, checks):
+
+    obs = np.array(obs)
+    obs[(flags & checks) != 0] = np.nan
+
+    return(obs)
+
+def flags_path(variable, month):
+
+    return(qc_filepath + variable + '/' + str(month).replace('-', '') + '.npz')
+
+# modified times of the chunks the flags for the month depend on (0 where there isn't one)
+def flags_source(folder, month):
+
+    paths = [chunk_path(folder, month + offset) for offset in [-1, 0, 1]]
+    return(np.array([os.path.getmtime(path) if os.path.isfile(path) else 0 for path in paths]))
+
+# obs for the stations from the chunk (hours is a slice of the month), NaN for stations that aren't in it
+def chunk_rows(folder, month, stations, hours):
+
+    chunk_stations, chunk_obs = load_chunk(folder, month)
+    rows = {station: row for row, station in enumerate(chunk_stations)}
+
+    obs = np.full((len(stations), len(range(np.shape(chunk_obs)[1])[hours])), np.nan)
+    for i, station in enumerate(stations):
+        if station in rows:
+            obs[i] = chunk_obs[rows[station], hours]
+
+    return(obs)
+
+# (stations, station x hour flags) for the month of the obs archive, worked out again only if the saved ones
+# are out of date
+def chunk_flags(variable, month):
+
+    folder = archive_filepath + variable + '/'
+    path = flags_path(variable, month)
+    source = np.append(flags_source(folder, month), qc_version)
+
+    if path in _loaded_flags and np.array_equal(_loaded_flags[path][0], source):
+        return(_loaded_flags[path][1], _loaded_flags[path][2])
+
+    if os.path.isfile(path):
+        with np.load(path) as saved:
+            if np.array_equal(saved['source'], source):
+                _loaded_flags[path] = (source, saved['stations'], saved['flags'])
+                return(_loaded_flags[path][1], _loaded_flags[path][2])
+
+    stations, obs = load_chunk(folder, month)
+    if len(stations) == 0:
+        return(stations, np.zeros(np.shape(obs), dtype=np.uint8))
+
+    # the end of the month before and the start of the month after, so the checks look across the boundaries
+    before = chunk_rows(folder, month - 1, stations, slice(-context_hours, None))
+    after = chunk_rows(folder, month + 1, stations, slice(0, context_hours))
+
+    flags = qc_flags(np.concatenate([before, obs, after], axis=1), variable)
+    flags = flags[:, np.shape(before)[1]:np.shape(before)[1] + np.shape(obs)[1]]
+
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # writes to a temp file first so readers never see a half written file
+    with open(path + '.' + str(os.getpid()) + '.tmp', 'wb') as f:
+        np.savez(f, stations=stations, flags=flags, source=source)
+    os.replace(path + '.' + str(os.getpid()) + '.tmp', path)
+
+    _loaded_flags[path] = (source, stations, flags)
+    return(stations, flags)
+
+# YYYYMMDDHH of num_hours from the start hour (numpy datetime64[h])
+def hour_numbers(start, num_hours):
+
+    hours = start + np.arange(num_hours)
+    days, months = hours.astype('datetime64[D]'), hours.astype('datetime64[M]')
+
+    return((months.astype(np.int64)//12 + 1970)*1000000 + (months.astype(np.int64)%12 + 1)*10000 + \
+           ((days - months.astype('datetime64[D]')).astype(np.int64) + 1)*100 + (hours - days).astype(np.int64))
+
+# numpy datetime64[h] of a YYYYMMDDHH
+def hour_datetime(hour_number):
+
+    return(to_datetime64(hour_number // 100).astype('datetime64[h]') + int(hour_number % 100))
+
+def connect_flags():
+
+    if not os.path.isdir(os.path.dirname(qc_flags_file)):
+        os.makedirs(os.path.dirname(qc_flags_file))
+
+    sql_con = sqlite3.connect(qc_flags_file, timeout=60)
+    sql_con.execute("CREATE TABLE IF NOT EXISTS qc_flags (variable, station, valid_hour INTEGER, flags INTEGER, \
+                     PRIMARY KEY (variable, station, valid_hour)) WITHOUT ROWID")
+    sql_con.execute("CREATE INDEX IF NOT EXISTS qc_flags_hour ON qc_flags (variable, valid_hour)")
+
+    # the last hour checked at each station and the qc_version it was checked with
+    sql_con.execute("CREATE TABLE IF NOT EXISTS qc_checked (variable, station, checked_hour INTEGER, version INTEGER, \
+                     PRIMARY KEY (variable, station))")
+
+    return(sql_con)
+
+# checks the archive obs up to 23 UTC on end_date (YYMMDD) that haven't been checked yet for the stations and
+# saves the flags. each station is checked from context_hours before the first hour after the last obs that was
+# checked there (everything for stations that are new or were checked with an older qc_version). returns the
+# number of hours read and the number of flags saved
+def update_flag_table(variable, stations, end_date):
+
+    sql_con = connect_flags()
+    checked = {station: hour for station, hour in sql_con.execute("SELECT station, checked_hour FROM qc_checked \
+                                                                   WHERE variable = ? AND version = ?", (variable, qc_version))}
+
+    first_hour = to_datetime64(int("20" + first_date)).astype('datetime64[h]')
+    end_hour = (to_datetime64(int("20" + str(end_date))) + 1).astype('datetime64[h]') - 1
+
+    # the flags from here on can change with the new obs, they need context_hours before them to be worked out
+    rewrite_from = {station: max(first_hour, hour_datetime(checked[station]) + 1 - context_hours) if station in checked else first_hour \
+                    for station in stations}
+
+    start = (min(rewrite_from.values()) - context_hours).astype('datetime64[D]') if len(stations) > 0 else end_hour
+    if start > end_hour:
+        sql_con.close()
+        return(0, 0)
+
+    start = max(start, first_hour.astype('datetime64[D]'))
+    num_hours = int((end_hour - start.astype('datetime64[h]')).astype(np.int64)) + 1
+
+    obs, _ = read_obs_archive(variable, stations, str(start).replace('-', '')[2:], num_hours)
+    flags = qc_flags(obs, variable)
+    hours = hour_numbers(start.astype('datetime64[h]'), num_hours)
+
+    flag_rows, checked_rows = [], []
+    for i, station in enumerate(stations):
+        first = int(np.searchsorted(hours, hour_numbers(rewrite_from[station], 1)[0]))
+        sql_con.execute("DELETE FROM qc_flags WHERE variable = ? AND station = ? AND valid_hour >= ?", (variable, station, int(hours[first])))
+
+        flagged = np.nonzero(flags[i, first:])[0] + first
+        flag_rows.extend((variable, station, int(hours[j]), int(flags[i, j])) for j in flagged)
+
+        # up to the last obs (obs that come in late for the hours after it get checked next time), stations
+        # with no obs at all are done
+        with_obs = np.nonzero(~np.isnan(obs[i]))[0]
+        if len(with_obs) > 0:
+            checked_rows.append((variable, station, int(hours[with_obs[-1]]), qc_version))
+        elif station not in checked:
+            checked_rows.append((variable, station, int(hours[-1]), qc_version))
+
+    sql_con.executemany("INSERT OR REPLACE INTO qc_flags VALUES (?,?,?,?)", flag_rows)
+    sql_con.executemany("INSERT OR REPLACE INTO qc_checked VALUES (?,?,?,?)", checked_rows)
+    sql_con.commit()
+    sql_con.close()
+
+    return(num_hours, len(flag_rows))
+
+# flags from the flag table for num_hours starting at 00 UTC on start_date (YYMMDD), and whether the table is up
+# to date for each station (checked far enough past the last hour that its flags won't change)
+def read_flag_table(variable, stations, start_date, num_hours):
+
+    flags = np.zeros((len(stations), num_hours), dtype=np.uint8)
+    covered = np.zeros(len(stations), dtype=bool)
+    if not os.path.isfile(qc_flags_file):
+        return(flags, covered)
+
+    hours = hour_numbers(to_datetime64(int("20" + str(start_date))).astype('datetime64[h]'), num_hours)
+    last_needed = hour_numbers(hour_datetime(int(hours[-1])) + context_hours, 1)[0]
+
+    sql_con = sqlite3.connect(qc_flags_file, timeout=60)
+    checked = {station: hour for station, hour in sql_con.execute("SELECT station, checked_hour FROM qc_checked \
+                                                                   WHERE variable = ? AND version = ?", (variable, qc_version))}
+    rows = sql_con.execute("SELECT station, valid_hour, flags FROM qc_flags WHERE variable = ? AND valid_hour BETWEEN ? AND ?", \
+                           (variable, int(hours[0]), int(hours[-1]))).fetchall()
+    sql_con.close()
+
+    station_rows = {station: i for i, station in enumerate(stations)}
+    rows = [row for row in rows if row[0] in station_rows]
+    if len(rows) > 0:
+        row_index = np.array([station_rows[row[0]] for row in rows])
+        flags[row_index, np.searchsorted(hours, [row[1] for row in rows])] = [row[2] for row in rows]
+
+    covered = np.array([checked.get(station, 0) >= last_needed for station in stations], dtype=bool)
+
+    return(flags, covered)
+
+# flags for num_hours of the archive obs for the stations starting at 00 UTC on start_date (YYMMDD), lined up
+# with read_obs_archive (0 where there are no obs). from the flag table where it's up to date, otherwise the
+# flags of each month of the archive
+def read_qc_flags(variable, stations, start_date, num_hours):
+
+    flags, covered = read_flag_table(variable, stations, start_date, num_hours)
+    if covered.all():
+        return(flags)
+
+    start = to_datetime64(int("20" + str(start_date)))
+    end = start + np.timedelta64((num_hours-1)//24, 'D')
+
+    for month in month_range(int("20" + str(start_date)), int(str(end).replace('-', ''))):
+        chunk_stations, month_flags = chunk_flags(variable, month)
+        rows = {station: row for row, station in enumerate(chunk_stations)}
+
+        # hours of the month inside the range
+        offset = int((month.astype('datetime64[D]') - start).astype(np.int64))*24
+        hour1 = max(0, -offset)
+        hour2 = min(np.shape(month_flags)[1], num_hours - offset)
+
+        for i, station in enumerate(stations):
+            if station in rows and not covered[i]:
+                flags[i, offset+hour1:offset+hour2] = month_flags[rows[station], hour1:hour2]
+
+    return(flags)
@@ -0,0 +1,318 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Store of the weekly/monthly results, in place of appending to the MAE_/RMSE_/spcorr_/CAT_ text files (which
+had to be read in full every time a line was added, and scanned line by line by the plotting scripts). There
+is one table for the continuous stats (MAE, RMSE, spearman correlation, and the bias, pearson correlation and
+sd ratio which aren't in the text files) and one for the categorical stats (the 2x2 stats, and the 3 category
+HSS and Gerrity score which aren't in the text files), both
+with one row for each (model, grid, domain, variable, savetype, time window, start date, end date). Saving a
+result that is already there replaces it. Each row has the time it was saved (NULL for rows imported from the
+text files), so the planner (utl/planner.py) can tell if the inputs have changed since.
+
+The lead_curve table has the error at every lead hour for each model/grid/domain/variable and date range (see
+utl/lead_stats.py). Its lead_hour is 0 based, the same as the windows: 0 (the init time) to 179 for the hourly
+variables of a 180 hour model, and the last hour of each period (6, 12 etc) for PCPT6/PCPT24. The threshold_curve table has the 2x2 table and stats at every threshold of the categorical
+threshold sweep for each model/grid/domain/variable, time window and date range (see utl/contingency.py). Neither
+is written to any text files.
+
+The text files for the website are written from the store by export_textfiles, the runs only rewrite the files
+for the results they saved themselves. The store is the only copy of the results, so the history from before
+it has to be added once with import_textfiles (export-results.py --import) before the first run rewrites any
+files.
+
+Each process opens (and adds any missing tables/columns to) the store once and keeps the connection.
+"""
+import os
+import math
+import time
+import sqlite3
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#the results database
+results_file = "/verification/Statistics/results.sqlite"
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+key_columns = ['model', 'grid', 'domain', 'variable', 'savetype', 'time_domain', 'start_date', 'end_date']
+
+# stats columns for each table, and the text files they're written to ({file prefix: columns on each line})
+tables = {'continuous': {'columns': ['MAE', 'RMSE', 'spcorr', 'bias', 'pearson', 'sd_ratio'],
+                         'files': {'MAE_': ['MAE'], 'RMSE_': ['RMSE'], 'spcorr_': ['spcorr']}},
+          'categorical': {'columns': ['TN', 'FN', 'FP', 'TP', 'POD', 'POFD', 'PSS', 'HSS', 'CSI', 'GSS', 'multi_HSS', 'Gerrity'],
+                          'files': {'CAT_': ['TN', 'FN', 'FP', 'TP', 'POD', 'POFD', 'PSS', 'HSS', 'CSI', 'GSS']}}}
+
+# columns after the stats in both tables
+info_columns = ['len_fcst', 'numstations', 'saved']
+
+# columns for each threshold in the threshold_curve table
+threshold_columns = ['threshold', 'count', 'hits', 'misses', 'false_alarms', 'correct_negatives', 'POD', 'POFD', 'SR', 'CSI', 'bias']
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# connection to the store for each process, keyed by (pid, results file) (a forked worker opens its own)
+_connections = {}
+
+# (model, grid, domain, variable, savetype, time_domain) of the results saved by this process, for each table
+_saved_keys = {table: set() for table in tables}
+
+# the connection to the store for this process (makes the tables and adds any missing columns the first time)
+def connect_results():
+
+    if (os.getpid(), results_file) in _connections:
+        return(_connections[(os.getpid(), results_file)])
+
+    if not os.path.isdir(os.path.dirname(results_file)):
+        os.makedirs(os.path.dirname(results_file))
+
+    sql_con = sqlite3.connect(results_file, timeout=60)
+    for table in tables:
+        columns = key_columns + tables[table]['columns'] + info_columns
+        sql_con.execute("CREATE TABLE IF NOT EXISTS " + table + " (" + ", ".join(columns) + ", PRIMARY KEY (" + ", ".join(key_columns) + "))")
+
+        # stores made before a column was added get it (NULL for the rows already there)
+        existing = [row[1] for row in sql_con.execute("PRAGMA table_info(" + table + ")")]
+        for column in columns:
+            if column not in existing:
+                sql_con.execute("ALTER TABLE " + table + " ADD COLUMN " + column)
+    sql_con.execute("CREATE TABLE IF NOT EXISTS lead_curve (model, grid, domain, variable, savetype, start_date, end_date, lead_hour, count, bias, MAE, RMSE, \
+                     PRIMARY KEY (model, grid, domain, variable, savetype, start_date, end_date, lead_hour))")
+    sql_con.execute("CREATE TABLE IF NOT EXISTS threshold_curve (" + ", ".join(key_columns + threshold_columns) + ", \
+                     PRIMARY KEY (" + ", ".join(key_columns) + ", threshold))")
+    sql_con.commit()
+
+    _connections[(os.getpid(), results_file)] = sql_con
+
+    return(sql_con)
+
+# ENS only has one grid, so its results are saved without one
+def key_grid(model, grid):
+
+    if "ENS" in model:
+        return('')
+
+    return(grid)
+
+# saves (or replaces) the results. stats is {column: value} for the table's stats columns, NaN for missing stats
+def save_results(table, model, grid, domain, variable, savetype, time_domain, start_date, end_date, stats, len_fcst, numstations):
+
+    columns = key_columns + tables[table]['columns'] + info_columns
+    row = [model, key_grid(model, grid), domain, variable, savetype, time_domain, str(start_date), str(end_date)] + \
+          [float(stats[column]) for column in tables[table]['columns']] + [len_fcst, numstations, time.time()]
+
+    sql_con = connect_results()
+    sql_con.execute("INSERT OR REPLACE INTO " + table + " (" + ", ".join(columns) + ") VALUES (" + ",".join("?"*len(row)) + ")", row)
+    sql_con.commit()
+
+    _saved_keys[table].add(tuple(row[:len(key_columns)-2]))
+
+# the (model, grid, domain, variable, savetype, time_domain) keys of the results this process has saved that match
+# the filters (None matches everything)
+def saved_keys(table, models=None, domains=None, variables=None, savetypes=None):
+
+    return(sorted(key for key in _saved_keys[table] if (models is None or key[0] in models) and (domains is None or key[2] in domains) and \
+                  (variables is None or key[3] in variables) and (savetypes is None or key[4] in savetypes)))
+
+# the results for the model/grid/domain/variable/savetype/time window, in order of start date
+# (only the ones for start_date/end_date if they're given). each result is a dictionary of the columns
+def read_results(table, model, grid, domain, variable, savetype, time_domain, start_date=None, end_date=None):
+
+    sql_query = "SELECT * FROM " + table + " WHERE model = ? AND grid = ? AND domain = ? AND variable = ? AND savetype = ? AND time_domain = ?"
+    params = [model, key_grid(model, grid), domain, variable, savetype, time_domain]
+    if start_date is not None:
+        sql_query = sql_query + " AND start_date = ? AND end_date = ?"
+        params = params + [str(start_date), str(end_date)]
+
+    sql_con = connect_results()
+    cursor = sql_con.execute(sql_query + " ORDER BY start_date, end_date", params)
+    columns = [description[0] for description in cursor.description]
+    rows = cursor.fetchall()
+
+    # sqlite saves NaN as NULL
+    return([{column: (math.nan if value is None else value) for column, value in zip(columns, row)} for row in rows])
+
+# saves (or replaces) the error curve for the date range. curve is [(lead hour, count, bias, MAE, RMSE)]
+def save_lead_curve(model, grid, domain, variable, savetype, start_date, end_date, curve):
+
+    key = [model, key_grid(model, grid), domain, variable, savetype, str(start_date), str(end_date)]
+
+    sql_con = connect_results()
+    sql_con.execute("DELETE FROM lead_curve WHERE model = ? AND grid = ? AND domain = ? AND variable = ? AND savetype = ? AND start_date = ? AND end_date = ?", key)
+    sql_con.executemany("INSERT INTO lead_curve VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", [key + list(row) for row in curve])
+    sql_con.commit()
+
+# the error curve for the date range, [(lead hour, count, bias, MAE, RMSE)] in order of lead hour
+def read_lead_curve(model, grid, domain, variable, savetype, start_date, end_date):
+
+    sql_con = connect_results()
+    curve = sql_con.execute("SELECT lead_hour, count, bias, MAE, RMSE FROM lead_curve WHERE model = ? AND grid = ? AND domain = ? AND variable = ? \
+                             AND savetype = ? AND start_date = ? AND end_date = ? ORDER BY lead_hour", \
+                            (model, key_grid(model, grid), domain, variable, savetype, str(start_date), str(end_date))).fetchall()
+
+    return(curve)
+
+# saves (or replaces) the threshold sweep for the time window and date range. curve is a row of the
+# threshold_columns for each threshold
+def save_threshold_curve(model, grid, domain, variable, savetype, time_domain, start_date, end_date, curve):
+
+    key = [model, key_grid(model, grid), domain, variable, savetype, time_domain, str(start_date), str(end_date)]
+
+    sql_con = connect_results()
+    sql_con.execute("DELETE FROM threshold_curve WHERE model = ? AND grid = ? AND domain = ? AND variable = ? AND savetype = ? AND time_domain = ? \
+                     AND start_date = ? AND end_date = ?", key)
+    sql_con.executemany("INSERT INTO threshold_curve VALUES (" + ",".join("?"*(len(key) + len(threshold_columns))) + ")", \
+                        [key + [None if isinstance(value, float) and math.isnan(value) else value for value in row] for row in curve])
+    sql_con.commit()
+
+# the threshold sweep for the time window and date range, [{column: value}] for the threshold_columns in order of
+# threshold (NaN for the stats that couldn't be worked out)
+def read_threshold_curve(model, grid, domain, variable, savetype, time_domain, start_date, end_date):
+
+    sql_con = connect_results()
+    rows = sql_con.execute("SELECT " + ", ".join(threshold_columns) + " FROM threshold_curve WHERE model = ? AND grid = ? AND domain = ? \
+                            AND variable = ? AND savetype = ? AND time_domain = ? AND start_date = ? AND end_date = ? ORDER BY threshold", \
+                           (model, key_grid(model, grid), domain, variable, savetype, time_domain, str(start_date), str(end_date))).fetchall()
+
+    return([{column: (math.nan if value is None else value) for column, value in zip(threshold_columns, row)} for row in rows])
+
+# the results for every time window of the model/grid/domain/variable/savetype/date range ({time_domain: result})
+def window_results(table, model, grid, domain, variable, savetype, start_date, end_date):
+
+    sql_con = connect_results()
+    cursor = sql_con.execute("SELECT time_domain, len_fcst, numstations, saved FROM " + table + " WHERE model = ? AND grid = ? AND domain = ? \
+                              AND variable = ? AND savetype = ? AND start_date = ? AND end_date = ?", \
+                             (model, key_grid(model, grid), domain, variable, savetype, str(start_date), str(end_date)))
+    results = {row[0]: {'len_fcst': row[1], 'numstations': row[2], 'saved': row[3]} for row in cursor.fetchall()}
+
+    return(results)
+
+# path of a stats text file (ENS only has one grid, and its not saved in a g folder)
+def textfile_path(textfile_folder, prefix, model, grid, domain, variable, savetype, time_domain):
+
+    if "ENS" in model:
+        modelpath = model + '/'
+    else:
+        modelpath = model + '/' + grid + '/'
+
+    return(textfile_folder + modelpath + domain + '/' + variable + '/' + prefix + savetype + "_" + variable + "_" + time_domain + "_" + domain + ".txt")
+
+# reads the lines of an existing text file as results ({(start date, end date): {column: value}})
+def read_textfile(path, file_columns):
+
+    results = {}
+    if not os.path.isfile(path):
+        return(results)
+
+    with open(path) as f:
+        for line in f:
+            values = line.split()
+            if len(values) != 4 + len(file_columns):
+                continue
+
+            result = {column: float(value) for column, value in zip(file_columns, values[2:-2])}
+            result['len_fcst'], result['numstations'] = values[-2], values[-1]
+            results[(values[0], values[1])] = result
+
+    return(results)
+
+# adds the lines of the text files for the key that aren't in the store yet (for import_textfiles) (the first text file for the table
+# has the len_fcst and numstations, the stats are put together from all of them, NULL for the ones that aren't
+# in any text file)
+def import_key(sql_con, textfile_folder, table, key):
+
+    model, grid, domain, variable, savetype, time_domain = key
+
+    imported = {}
+    for prefix, file_columns in tables[table]['files'].items():
+        path = textfile_path(textfile_folder, prefix, model, grid, domain, variable, savetype, time_domain)
+        for dates, result in read_textfile(path, file_columns).items():
+            imported.setdefault(dates, {}).update(result)
+
+    stored = set(sql_con.execute("SELECT start_date, end_date FROM " + table + " WHERE model = ? AND grid = ? AND domain = ? AND variable = ? \
+                                  AND savetype = ? AND time_domain = ?", key).fetchall())
+
+    file_columns = [column for columns in tables[table]['files'].values() for column in columns]
+
+    rows = []
+    for (start_date, end_date), result in imported.items():
+        if (start_date, end_date) in stored or any(column not in result for column in file_columns):
+            continue
+        rows.append(list(key) + [start_date, end_date] + [result.get(column) for column in tables[table]['columns']] + [result['len_fcst'], result['numstations'], None])
+
+    columns = key_columns + tables[table]['columns'] + info_columns
+    sql_con.executemany("INSERT OR IGNORE INTO " + table + " (" + ", ".join(columns) + ") VALUES (" + ",".join("?"*len(columns)) + ")", rows)
+
+    return(len(rows))
+
+def write_textfile(path, results, file_columns):
+
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with open(path + '.tmp', 'w') as f:
+        for result in results:
+            f.write(str(result['start_date']) + " " + str(result['end_date']) + "   ")
+            for column in file_columns:
+                f.write("%3.3f   " % (result[column]))
+            f.write(result['len_fcst'] + "   ")
+            f.write(result['numstations'] + "\n")
+
+    os.replace(path + '.tmp', path)
+
+# rewrites the text files for the website from the store for the (model, grid, domain, variable, savetype,
+# time_domain) keys, every key in the table if keys is None
+def export_textfiles(textfile_folder, table, keys=None):
+
+    if keys is None:
+        keys = connect_results().execute("SELECT DISTINCT model, grid, domain, variable, savetype, time_domain FROM " + table).fetchall()
+
+    for key in keys:
+        results = read_results(table, *key)
+        for prefix, file_columns in tables[table]['files'].items():
+            write_textfile(textfile_path(textfile_folder, prefix, *key), results, file_columns)
+
+    return(len(keys))
+
+# adds every existing text file under textfile_folder to the store (only needed once, for the history from
+# before the store)
+def import_textfiles(textfile_folder, table):
+
+    prefixes = list(tables[table]['files'])
+
+    keys = set()
+    for folder, _, files in os.walk(textfile_folder):
+        for name in files:
+            prefix = [prefix for prefix in prefixes if name.startswith(prefix)]
+            if not name.endswith(".txt") or len(prefix) == 0:
+                continue
+
+            # <model>/<grid>/<domain>/<variable>/<prefix><savetype>_<variable>_<time_domain>_<domain>.txt (ENS has no grid folder)
+            folders = os.path.relpath(folder, textfile_folder).split('/')
+            if len(folders) < 3:
+                continue
+            model, domain, variable = folders[0], folders[-2], folders[-1]
+            grid = folders[1] if len(folders) == 4 else ''
+
+            name = name[len(prefix[0]):-len("_" + domain + ".txt")]
+            time_domain = name.split('_')[-1]
+            savetype = name[:-len("_" + variable + "_" + time_domain)]
+
+            keys.add((model, grid, domain, variable, savetype, time_domain))
+
+    sql_con = connect_results()
+    num_rows = 0
+    for key in sorted(keys):
+        num_rows = num_rows + import_key(sql_con, textfile_folder, table, key)
+    sql_con.commit()
+
+    return(len(keys), num_rows)
@@ -0,0 +1,157 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Shared read only connections to the station sqlite files. A run used to open a new connection for every
+query (and never close them), with the same file often opened twice (check_dates then get_fcst). The
+connections are now kept open, keyed by path, and the least recently used one is dropped once there are more
+than max_open. A connection that is dropped (or closed with close_connection) while another thread is still
+querying it is only closed once that query is done.
+
+Files are opened in URI read only mode with mmap_size set. The collection job appends to the files every day,
+so they are only opened as immutable (no locking or change checks) when immutable is turned on, for runs that
+are known not to overlap the collection (leaderboards-backfill.py --immutable). Every query is timed so the
+slow stations can be found with print_query_times().
+"""
+import time
+import sqlite3
+import threading
+from urllib.parse import quote
+from collections import OrderedDict
+
+###########################################################
+### -------------------- INPUTS -- ------------------------
+###########################################################
+
+# most connections to keep open at once
+max_open = 256
+
+# bytes of each file to memory map
+mmap_size = 268435456 # 256 MB
+
+# skip locking and change checks (only safe if nothing writes to the files while the run is reading them)
+immutable = False
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+_connections = OrderedDict()
+_forked_connections = []
+_lock = threading.Lock()
+
+# {connection: number of queries running on it}, and the connections to close once they aren't being used
+_in_use = {}
+_dropped = set()
+
+# {path: [number of queries, total seconds]}
+query_times = {}
+
+def open_connection(sql_path):
+
+    uri = "file:" + quote(sql_path) + "?mode=ro"
+    if immutable:
+        uri = uri + "&immutable=1"
+
+    sql_con = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    sql_con.execute("PRAGMA mmap_size=" + str(int(mmap_size)))
+
+    return(sql_con)
+
+# closes the connection, or leaves it for the last query running on it to close (call with _lock held)
+def drop_connection(sql_con):
+
+    if _in_use.get(sql_con, 0) > 0:
+        _dropped.add(sql_con)
+    else:
+        sql_con.close()
+
+# the open connection for the file (opens it if it isn't already), counted as in use until it's released
+def get_connection(sql_path):
+
+    with _lock:
+        if sql_path in _connections:
+            _connections.move_to_end(sql_path)
+            sql_con = _connections[sql_path]
+        else:
+            sql_con = open_connection(sql_path)
+            _connections[sql_path] = sql_con
+
+            while len(_connections) > max_open:
+                _, old_con = _connections.popitem(last=False)
+                drop_connection(old_con)
+
+        _in_use[sql_con] = _in_use.get(sql_con, 0) + 1
+
+    return(sql_con)
+
+def release_connection(sql_con):
+
+    with _lock:
+        _in_use[sql_con] = _in_use[sql_con] - 1
+        if _in_use[sql_con] == 0:
+            del _in_use[sql_con]
+            if sql_con in _dropped:
+                _dropped.remove(sql_con)
+                sql_con.close()
+
+# runs the query on the file and returns all the rows
+def query(sql_path, sql_query, params=()):
+
+    start = time.time()
+
+    sql_con = get_connection(sql_path)
+    try:
+        cursor = sql_con.cursor()
+        cursor.execute(sql_query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        release_connection(sql_con)
+
+    seconds = time.time() - start
+    with _lock:
+        times = query_times.setdefault(sql_path, [0, 0.0])
+        times[0] = times[0] + 1
+        times[1] = times[1] + seconds
+
+    return(rows)
+
+# closes the connection for the file (needed before reading a file that has changed during the run)
+def close_connection(sql_path):
+
+    with _lock:
+        if sql_path in _connections:
+            drop_connection(_connections.pop(sql_path))
+
+def close_all():
+
+    with _lock:
+        while len(_connections) > 0:
+            _, sql_con = _connections.popitem()
+            drop_connection(sql_con)
+
+# drops the connections without closing them, for a forked process (sqlite handles opened before a fork can't
+# be used or closed in the child)
+def forget_connections():
+    global _lock
+
+    # kept so they're never garbage collected (which would close them)
+    _forked_connections.extend(list(_connections.values()) + list(_dropped))
+    _connections.clear()
+    _in_use.clear()
+    _dropped.clear()
+    _lock = threading.Lock()
+
+# prints the files with the most total query time
+def print_query_times(num_files=10):
+
+    with _lock:
+        slowest = sorted(query_times.items(), key=lambda item: item[1][1], reverse=True)[:num_files]
+        total = sum(times[1] for times in query_times.values())
+
+    print("Query time: %.2f s over %d files" % (total, len(query_times)))
+    for sql_path, (num_queries, seconds) in slowest:
+        print("    %8.3f s  %4d queries  %s" % (seconds, num_queries, sql_path))
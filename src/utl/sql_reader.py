@@ -0,0 +1,51 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Reads the 'All' table of the obs and fcst sqlite files straight into numpy arrays. This replaces the
+pd.read_sql_query + row by row datetime loops that used to be in get_all_obs, get_fcst, meteograms.py
+and qc/data_distribution.py (which were most of the run time on the monthly large domain runs).
+
+Obs tables are (Date, Time, Val) and fcst tables are (Date, Offset, Val):
+    - Date is YYYYMMDD
+    - Time is HHMM (UTC)
+    - Offset is the forecast hour
+
+Lining the rows up in time is done in utl/align.py.
+"""
+import numpy as np
+from utl.sql_pool import query
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+# runs the query (on the shared connection for the file) and returns the rows as a 2D float array (one column for
+# each selected column)
+# NULLs come back as NaNs
+def read_columns(sql_path, columns, date1=None, date2=None):
+
+    sql_query = "SELECT " + ", ".join(columns) + " from 'All'"
+    if date1 is not None and date2 is not None:
+        rows = query(sql_path, sql_query + " WHERE Date BETWEEN ? AND ?", (int(date1), int(date2)))
+    else:
+        rows = query(sql_path, sql_query)
+
+    return(np.array(rows, dtype=np.float64).reshape(-1, len(columns)))
+
+# obs table as typed arrays: dates (YYYYMMDD), times (HHMM), vals
+# date1 and date2 are YYYYMMDD (leave both out to read the whole table)
+def read_obs(sql_path, date1=None, date2=None):
+
+    data = read_columns(sql_path, ["Date", "Time", "Val"], date1, date2)
+
+    return(data[:,0].astype(np.int64), data[:,1].astype(np.int64), data[:,2])
+
+# fcst table as typed arrays: dates (YYYYMMDD), offsets (forecast hour), vals
+def read_fcst(sql_path, date1=None, date2=None):
+
+    data = read_columns(sql_path, ["Date", "Offset", "Val"], date1, date2)
+
+    return(data[:,0].astype(np.int64), data[:,1].astype(np.int64), data[:,2])
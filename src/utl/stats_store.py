@@ -0,0 +1,130 @@
+#!/usr/bin python
+
+"""
+Created in 2023
+@author: Reagan McKinney
+
+Store of the stats for every init date, so the stats for any date range (weekly, monthly, seasonal etc) can be
+put together without reading the fcst or obs again. get_rankings saves one row for each
+(model, grid, variable, domain, time window, init date) with:
+    - the number of fcst/obs pairs, the sum of the absolute errors and the sum of the squared errors
+    - the pairs themselves (station averaged and rounded to one decimal, saved as int32 tenths) for the
+      correlations and sd ratio, which can't be added up day by day
+    - the stations that were included and the stations that were checked in the run the row came from
+
+The pairs are the same ones get_statistics uses (station averaged over every station in the run, then rounded),
+so a date range that matches a run gives the same MAE, RMSE and correlation as the run.
+"""
+import os
+import math
+import sqlite3
+import numpy as np
+from utl.metrics import continuous_metrics
+from utl.align import date_lookup
+
+###########################################################
+### -------------------- FILEPATHS ------------------------
+###########################################################
+
+#the stats database
+stats_file = "/verification/Cache/daily_stats.sqlite"
+
+###########################################################
+### -------------------- FUNCTIONS ------------------------
+###########################################################
+
+def connect_store():
+
+    if not os.path.isdir(os.path.dirname(stats_file)):
+        os.makedirs(os.path.dirname(stats_file))
+
+    sql_con = sqlite3.connect(stats_file, timeout=60)
+    sql_con.execute("CREATE TABLE IF NOT EXISTS daily_stats (model TEXT, grid TEXT, variable TEXT, domain TEXT, time_domain TEXT, \
+                     init_date INTEGER, count INTEGER, sum_abs REAL, sum_sq REAL, pairs BLOB, stations TEXT, checked_stations TEXT, \
+                     PRIMARY KEY (model, grid, variable, domain, time_domain, init_date))")
+
+    return(sql_con)
+
+# number of values for each init date in the time window (same as the length in get_statistics)
+def window_length(time_domain, variable):
+
+    if "hr" in time_domain:
+        length = int(time_domain[:-2])
+    else:
+        length = 24
+
+    if variable == "PCPT6":
+        length = int(length/6)
+    elif variable == "PCPT24":
+        length = int(length/24)
+
+    return(length)
+
+# (count, sum of absolute errors, sum of squared errors, pairs) for each init date
+# fcst/obs are the station averaged and rounded (init date, lead) values for the window from utl/lead_stats.py
+def daily_sums(fcst, obs):
+
+    sums = []
+    for day in range(len(fcst)):
+        valid = ~np.isnan(fcst[day])
+
+        # the errors are added up in tenths as integers, so the sums don't depend on the order they're added in
+        pairs = np.round(np.stack([fcst[day][valid], obs[day][valid]])*10).astype(np.int32)
+        error = (pairs[1] - pairs[0]).astype(np.int64)
+
+        sums.append((int(np.sum(valid)), int(np.sum(np.abs(error)))/10, int(np.sum(error**2))/100, pairs.tobytes()))
+
+    return(sums)
+
+# saves the rows for every init date of the run. windows is {time_domain: (fcst, obs)} (see daily_sums)
+def save_daily_stats(model, grid, variable, domain, start_date, delta, windows, stations, checked_stations):
+
+    init_dates = date_lookup(str(start_date), delta+1)
+
+    rows = []
+    for time_domain, (fcst, obs) in windows.items():
+        for init_date, (count, sum_abs, sum_sq, pairs) in zip(init_dates, daily_sums(fcst, obs)):
+            rows.append((model, grid, variable, domain, time_domain, int(init_date), count, sum_abs, sum_sq, pairs, \
+                         ",".join(stations), ",".join(checked_stations)))
+
+    sql_con = connect_store()
+    sql_con.executemany("INSERT OR REPLACE INTO daily_stats VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+    sql_con.commit()
+    sql_con.close()
+
+# puts the stats together for the init dates from start_date to end_date (YYMMDD)
+# returns None if there are no rows for the model/grid/variable/domain/time window in the date range
+def read_window_stats(model, grid, variable, domain, time_domain, start_date, end_date):
+
+    sql_con = connect_store()
+    rows = sql_con.execute("SELECT count, sum_abs, sum_sq, pairs, stations, checked_stations FROM daily_stats WHERE model = ? AND grid = ? \
+                            AND variable = ? AND domain = ? AND time_domain = ? AND init_date BETWEEN ? AND ?", \
+                           (model, grid, variable, domain, time_domain, int("20" + str(start_date)), int("20" + str(end_date)))).fetchall()
+    sql_con.close()
+
+    if len(rows) == 0:
+        return(None)
+
+    count = sum(row[0] for row in rows)
+    stations = set(station for row in rows for station in row[4].split(",") if station != "")
+    checked_stations = set(station for row in rows for station in row[5].split(",") if station != "")
+
+    window_stats = {'count': count, 'length': window_length(time_domain, variable), 'num_days': len(rows), \
+                    'num_stations': len(stations), 'total_stations': len(checked_stations)}
+
+    if count == 0:
+        return(window_stats)
+
+    pairs = np.concatenate([np.frombuffer(row[3], dtype=np.int32).reshape(2, -1) for row in rows], axis=1)/10
+
+    # added up in tenths as integers (same as utl/lead_stats.py), so the MAE rounds the same as the run's
+    window_stats['MAE'] = sum(round(row[1]*10) for row in rows)/10/count
+    window_stats['RMSE'] = math.sqrt(sum(round(row[2]*100) for row in rows)/100/count)
+
+    # the correlations, bias and sd ratio from the pairs (fcst, obs)
+    metrics = continuous_metrics(pairs[0], pairs[1])
+    window_stats['corr'] = metrics['spearman'][0]
+    for name in ['bias', 'pearson', 'sd_ratio']:
+        window_stats[name] = metrics[name][0]
+
+    return(window_stats)